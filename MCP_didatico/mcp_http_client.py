@@ -7,68 +7,111 @@ Demonstra como consumir ferramentas MCP através de transporte HTTP.
 """
 
 import asyncio
-from langchain_mcp_adapters.client import MultiServerMCPClient
-from langchain_openai import AzureChatOpenAI
-from pydantic import SecretStr
-from langgraph.prebuilt import create_react_agent
 import os
+import sys
 from dotenv import load_dotenv
+from langchain_core.messages import RemoveMessage
+from langgraph.graph.message import REMOVE_ALL_MESSAGES
+
+# Permite importar o pacote infra/ da raiz do repositório
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from infra.agent_callbacks import TracingCallback, TurnTimingCallback
+from infra.agent_runtime import AgentRuntime
+from infra.checkpointer import SQLiteCheckpointer, session_id
+from infra.llm import create_chat_model
+from infra.memory import OUTPUT_TOOL, ConversationMemory
+from infra.mcp_calls import TracingInterceptor
+from infra.response_cache import ResponseCache, file_version, tool_trace_from_messages
+from infra.server_pool import WarmServerPool
+from infra.streaming import print_agent_stream
+from infra.tool_selection import ToolSelector
+from infra.tracing import get_tracer
+
+# Rastreamento dos turnos (TRACE_EXPORTER=console|file para exportar)
+tracer = get_tracer("mcp-http-client")
 
 load_dotenv()
 
-# Configuração do Azure OpenAI
-azure_endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
-azure_api_key = os.getenv("AZURE_OPENAI_API_KEY")
-azure_deployment = os.getenv("AZURE_OPENAI_CHAT_DEPLOYMENT_NAME") or os.getenv("AZURE_MODEL_NAME")
-azure_api_version = os.getenv("OPENAI_API_VERSION")
-
-# Configuração do cliente MCP
-client = MultiServerMCPClient(
-    {
-        # "math_server": {
-        #     "url": "http://localhost:8001/mcp",
-        #     "transport": "streamable_http",  # Usa transporte HTTP streamable para MCP
-        # },
-        # "duckduckgo": {
-        #     "command": "docker",
-        #     "args": ["run", "-i", "--rm", "mcp/duckduckgo"],  # Docker run command: -i enables interactive mode (stdin), --rm removes container after exit
-        #     "transport": "stdio"
-        # },
-        "SQLite": {
-            "command": "docker",
-            "args": [
-                "run",
-                "-i",
-                "--rm",
-                "-v",
-                # Maps a local directory from host machine to container for SQLite database persistence
-                "C:\\Users\\lzandrade.TOPAZ\\Documents\\GitHub\\MCP\\MCP_didatico:/local-directory",
-                "mcp/sqlite",
-                "--db-path",
-                "/local-directory/db.sqlite"
-            ],
-            "transport": "stdio",
-            "name": "SQLite",
-            "description": "Banco de dados SQLite para armazenar informações"
-        }
+# Configuração dos servidores MCP
+CONNECTIONS = {
+    # "math_server": {
+    #     "url": "http://localhost:8001/mcp",
+    #     "transport": "streamable_http",  # Usa transporte HTTP streamable para MCP
+    # },
+    # "duckduckgo": {
+    #     "command": "docker",
+    #     "args": ["run", "-i", "--rm", "mcp/duckduckgo"],  # Docker run command: -i enables interactive mode (stdin), --rm removes container after exit
+    #     "transport": "stdio"
+    # },
+    "SQLite": {
+        "command": "docker",
+        "args": [
+            "run",
+            "-i",
+            "--rm",
+            "-v",
+            # Maps a local directory from host machine to container for SQLite database persistence
+            "C:\\Users\\lzandrade.TOPAZ\\Documents\\GitHub\\MCP\\MCP_didatico:/local-directory",
+            "mcp/sqlite",
+            "--db-path",
+            "/local-directory/db.sqlite"
+        ],
+        "transport": "stdio",
+        "name": "SQLite",
+        "description": "Banco de dados SQLite para armazenar informações"
     }
-)
+}
+
+# Configuração do modelo LLM (LLM_BACKEND=azure|scripted|replay)
+model = create_chat_model()
 
-# Configuração do modelo LLM
-model = AzureChatOpenAI(
-    azure_endpoint=azure_endpoint,
-    azure_deployment=azure_deployment,
-    api_key=SecretStr(azure_api_key) if azure_api_key else None,
-    api_version=azure_api_version,
+# Estado das conversas em disco (CHECKPOINT=0 desativa): sobrevive a quedas e
+# pode ser retomado com AGENT_SESSION=<id>
+checkpointer = SQLiteCheckpointer.from_env(".checkpoints.sqlite")
+
+# Containers/processos dos servidores stdio já iniciados (MCP_WARM_INSTANCES
+# por servidor): o `docker run` sai do caminho da conexão
+server_pool = WarmServerPool.from_env(CONNECTIONS)
+
+# Histórico da sessão com resumo dos turnos antigos (contexto limitado); as
+# saídas grandes guardadas fora do contexto voltam pela ferramenta resolve_output
+memory = ConversationMemory.from_env(model)
+
+# Sessões MCP (o container Docker), ferramentas e grafo do agente criados uma
+# única vez e reaproveitados em todas as perguntas
+runtime = AgentRuntime(
+    CONNECTIONS,
+    model,
+    # Propaga o trace (cabeçalho traceparent) nas chamadas às ferramentas
+    tool_interceptors=[TracingInterceptor(tracer)],
+    server_pool=server_pool,
+    # Com TOOL_SELECTION=1, cada chamada ao LLM leva só as ferramentas
+    # relevantes (find_tools busca as demais), ao custo do cache de prompt
+    tool_selection=lambda tools: ToolSelector.from_env(tools, always=(OUTPUT_TOOL,)),
+    local_tools=[memory.resolve_tool()],
+    checkpointer=checkpointer,
 )
 
-async def test_mcp_connection():
+# Cache de respostas por versão do db.sqlite montado no container (RESPONSE_CACHE=0 desativa)
+DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "db.sqlite")
+response_cache = ResponseCache.from_env("mcp_http_client", ".response_cache.sqlite")
+# Ferramentas que alteram o banco: a resposta não é guardada e o cache é limpo
+MUTATING_TOOLS = {"write_query", "create_table"}
+
+async def test_mcp_connection(refresh: bool = False):
     """Testa a conexão com o servidor MCP via HTTP"""
     print("🔍 Testando conexão com servidor MCP via HTTP...")
     
     try:
-        # Obtém as ferramentas disponíveis
-        tools = await client.get_tools()
+        # Abre as sessões na primeira vez; ao reconectar, devolve a instância ao
+        # pool e pega outra já pronta
+        if refresh:
+            await runtime.close()
+            await runtime.start()
+        else:
+            await runtime.start()
+        tools = runtime.tools
         
         print(f"✅ Conexão estabelecida com sucesso!")
         print(f"🔧 Ferramentas descobertas: {len(tools)}")
@@ -88,13 +131,10 @@ async def create_llm_agent():
     print("\n🤖 Criando agente LLM com ferramentas MCP...")
     
     try:
-        # Obtém as ferramentas do servidor MCP
-        tools = await client.get_tools()
+        # Reaproveita as sessões, as ferramentas e o grafo já compilados
+        agent = await runtime.get_agent()
         
-        # Cria o agente React
-        agent = create_react_agent(model, tools)
-        
-        print(f"✅ Agente criado com {len(tools)} ferramentas MCP")
+        print(f"✅ Agente criado com {len(runtime.tools)} ferramentas MCP")
         return agent
         
     except Exception as e:
@@ -114,6 +154,16 @@ async def interactive_chat():
         print("❌ Não foi possível criar o agente")
         return
     
+    timing = TurnTimingCallback("mcp_http_client")
+    tracing = TracingCallback(tracer)
+    thread = {"configurable": {"thread_id": session_id()}}
+    # Cada chat começa do estado salvo da sessão (ou do zero, sem checkpointer)
+    saved = await agent.aget_state(thread) if checkpointer else None
+    memory.restore(saved.values.get("messages", []) if saved else [])
+    if checkpointer:
+        print(f"💾 Sessão {thread['configurable']['thread_id']} ({len(memory.turns)} turnos recentes"
+              f"{', com resumo' if memory.summary else ''}); AGENT_SESSION=<id> retoma uma sessão\n")
+    
     while True:
         try:
             user_input = input("🧑 Você: ").strip()
@@ -127,9 +177,40 @@ async def interactive_chat():
                 
             print("🤖 LLM: ", end="")
             
-            response = await agent.ainvoke({"messages": [user_input]})
-            answer = response["messages"][-1].content
-            print(answer + "\n")
+            data_version = file_version(DB_PATH)
+            # Com histórico, a resposta depende da conversa: o contexto entra no escopo
+            scope = f"{data_version}:{memory.fingerprint()}"
+            cached = response_cache.get(user_input, scope) if response_cache else None
+            if cached:
+                print(cached.answer)
+                print(cached.format() + "\n")
+                memory.add_exchange(user_input, cached.answer)
+                continue
+            
+            messages = memory.context(user_input)
+            
+            timing.start_turn()
+            with tracer.span("agent.turn", attributes={"category": "agent"}):
+                # Tokens e chamadas de ferramenta aparecem à medida que chegam
+                # (o grafo só é recompilado se o servidor avisar list_changed)
+                agent = await runtime.get_agent()
+                # O estado salvo passa a ser exatamente o contexto compactado
+                inputs = [RemoveMessage(id=REMOVE_ALL_MESSAGES), *messages] if checkpointer else messages
+                final = await print_agent_stream(
+                    agent, {"messages": inputs}, config={**thread, "callbacks": [timing, tracing]}
+                )
+            answer = final["answer"]
+            print(timing.finish_turn().format() + "\n")
+            
+            turn = final["state"]["messages"][len(messages) - 1:]
+            memory.add_turn(turn)
+            
+            if response_cache:
+                steps = tool_trace_from_messages(turn)
+                if any(step["tool"] in MUTATING_TOOLS for step in steps):
+                    response_cache.invalidate()
+                elif file_version(DB_PATH) == data_version:
+                    response_cache.put(user_input, answer, steps, scope)
             
         except KeyboardInterrupt:
             print("\n👋 Chat interrompido pelo usuário")
@@ -162,7 +243,7 @@ async def main():
         if choice == "1":
             await interactive_chat()
         elif choice == "2":
-            await test_mcp_connection()
+            await test_mcp_connection(refresh=True)
         elif choice == "3":
             print("👋 Encerrando cliente MCP...")
             break
@@ -172,9 +253,19 @@ async def main():
         if choice in ["1", "2"]:
             input("\nPressione Enter para continuar...")
 
+async def run():
+    """Executa o menu e fecha as sessões MCP ao sair"""
+    # Os containers sobem em paralelo enquanto o resto inicializa
+    await server_pool.start()
+    try:
+        await main()
+    finally:
+        await runtime.close()
+        await server_pool.close()
+
 if __name__ == "__main__":
     try:
-        asyncio.run(main())
+        asyncio.run(run())
     except KeyboardInterrupt:
         print("\n👋 Cliente MCP encerrado pelo usuário")
     except Exception as e:
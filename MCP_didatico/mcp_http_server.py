@@ -6,14 +6,102 @@ Este servidor implementa o protocolo MCP (Model Context Protocol) completo
 via transporte HTTP, permitindo que clientes MCP se conectem via HTTP.
 """
 
-from fastmcp import FastMCP
+from fastmcp import Context, FastMCP
+import json
+import os
+import sys
 import uvicorn
-from typing import Any
+from typing import Any, Optional
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+
+# Permite importar o pacote infra/ da raiz do repositório
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from infra.instrumentation import instrument_tool
+from infra.jobs import DONE, FAILED, JobQueue, Progress
+from infra.metrics import CONTENT_TYPE, REGISTRY, ToolMetrics, render_metrics
+from infra.payloads import binary_result
+from infra.serve import serve
+from infra.tracing import get_tracer
+from infra.warmup import READINESS
 
 # Cria o servidor MCP
 server = FastMCP("Math Server")
 
+# Métricas por ferramenta (contagem, erros e histogramas de latência)
+tool_metrics = ToolMetrics(REGISTRY, "mcp_server")
+
+# Spans por ferramenta, filhos do trace recebido no _meta ou no cabeçalho HTTP
+tracer = get_tracer("mcp-math-http-server")
+
+# power e factorial podem gerar inteiros enormes: acima deste tamanho vão em
+# binário para clientes que pedirem `acceptBinary` no _meta (infra/payloads.py)
+BINARY_MIN_BYTES = int(os.getenv("MCP_BINARY_MIN_BYTES", "4096"))
+
+# Cálculos longos viram jobs: submit_job devolve o id na hora e um pool
+# limitado executa (JOB_WORKERS, JOB_MAX_QUEUED, JOB_RESULT_TTL)
+jobs = JobQueue.from_env()
+
+# Quanto job_result pode segurar a requisição esperando o job terminar
+JOB_MAX_WAIT = float(os.getenv("JOB_MAX_WAIT", "30"))
+
+# Os jobs vivem na memória do worker que os aceitou. Com MCP_WORKERS > 1 cada
+# requisição stateless cai em qualquer worker, e job_status/job_result/
+# cancel_job não achariam o job: as ferramentas de jobs ficam desligadas
+JOBS_ENABLED = int(os.getenv("MCP_WORKERS", "1")) <= 1
+JOB_TOOLS = ("submit_job", "job_status", "job_result", "cancel_job")
+JOBS_DISABLED_ERROR = "Jobs desativados com MCP_WORKERS > 1 (o estado fica no worker que aceitou o job)"
+
+# Ferramentas locais: não há o que aquecer, o servidor está pronto ao subir
+READINESS.mark_ready()
+
+@server.custom_route("/metrics", methods=["GET"])
+async def metrics(request: Request) -> Response:
+    """Expõe as métricas no formato do Prometheus (somadas entre os workers)"""
+    return Response(render_metrics(), media_type=CONTENT_TYPE)
+
+@server.custom_route("/healthz", methods=["GET"])
+async def healthz(request: Request) -> Response:
+    """Liveness: o processo está de pé"""
+    return JSONResponse({"status": "ok"})
+
+@server.custom_route("/readyz", methods=["GET"])
+async def readyz(request: Request) -> Response:
+    """Readiness: as ferramentas são locais, então o servidor está pronto ao subir"""
+    return JSONResponse(READINESS.snapshot(), status_code=200 if READINESS.ready else 503)
+
+@server.custom_route("/jobs/{job_id}", methods=["GET"])
+async def job_snapshot(request: Request) -> Response:
+    """Estado de um job (sem o resultado)"""
+    if not JOBS_ENABLED:
+        return JSONResponse({"error": JOBS_DISABLED_ERROR}, status_code=404)
+    try:
+        job = jobs.get(request.path_params["job_id"])
+    except KeyError as e:
+        return JSONResponse({"error": e.args[0]}, status_code=404)
+    return JSONResponse(job.snapshot())
+
+@server.custom_route("/jobs/{job_id}/events", methods=["GET"])
+async def job_events(request: Request) -> Response:
+    """Progresso do job como Server-Sent Events, até ele terminar"""
+    if not JOBS_ENABLED:
+        return JSONResponse({"error": JOBS_DISABLED_ERROR}, status_code=404)
+    job_id = request.path_params["job_id"]
+    try:
+        jobs.get(job_id)
+    except KeyError as e:
+        return JSONResponse({"error": e.args[0]}, status_code=404)
+
+    async def stream():
+        async for job in jobs.events(job_id):
+            event = job.status if job.done else "progress"
+            yield f"event: {event}\ndata: {json.dumps(job.snapshot())}\n\n"
+
+    return StreamingResponse(stream(), media_type="text/event-stream")
+
 @server.tool()
+@instrument_tool(tool_metrics, tracer)
 def add(a: int, b: int) -> int:
     """Soma dois números inteiros.
     
@@ -27,6 +115,7 @@ def add(a: int, b: int) -> int:
     return a + b
 
 @server.tool()
+@instrument_tool(tool_metrics, tracer)
 def subtract(a: int, b: int) -> int:
     """Subtrai dois números inteiros.
     
@@ -40,6 +129,7 @@ def subtract(a: int, b: int) -> int:
     return a - b
 
 @server.tool()
+@instrument_tool(tool_metrics, tracer)
 def multiply(a: int, b: int) -> int:
     """Multiplica dois números inteiros.
     
@@ -53,6 +143,7 @@ def multiply(a: int, b: int) -> int:
     return a * b
 
 @server.tool()
+@instrument_tool(tool_metrics, tracer)
 def divide(a: int, b: int) -> float:
     """Divide dois números inteiros.
     
@@ -70,7 +161,9 @@ def divide(a: int, b: int) -> float:
         raise ValueError("Divisão por zero não é permitida")
     return a / b
 
-@server.tool()
+@server.tool(output_schema=None)
+@binary_result(BINARY_MIN_BYTES)
+@instrument_tool(tool_metrics, tracer)
 def power(base: int, exponent: int) -> int:
     """Calcula a potência de um número.
     
@@ -83,7 +176,23 @@ def power(base: int, exponent: int) -> int:
     """
     return base ** exponent
 
-@server.tool()
+def compute_factorial(n: int, progress: Optional[Progress] = None) -> int:
+    """Fatorial com avisos de progresso a cada 1% das multiplicações"""
+    if n < 0:
+        raise ValueError("Fatorial não é definido para números negativos")
+    if n == 0 or n == 1:
+        return 1
+    step = max(n // 100, 1)
+    result = 1
+    for i in range(2, n + 1):
+        result *= i
+        if progress is not None and i % step == 0:
+            progress(i, n)
+    return result
+
+@server.tool(output_schema=None)
+@binary_result(BINARY_MIN_BYTES)
+@instrument_tool(tool_metrics, tracer)
 def factorial(n: int) -> int:
     """Calcula o fatorial de um número.
     
@@ -96,15 +205,120 @@ def factorial(n: int) -> int:
     Raises:
         ValueError: Se n for negativo
     """
-    if n < 0:
-        raise ValueError("Fatorial não é definido para números negativos")
-    if n == 0 or n == 1:
-        return 1
-    result = 1
-    for i in range(2, n + 1):
-        result *= i
+    return compute_factorial(n)
+
+# Em processo filho: cancel_job e JOB_TIMEOUT matam a conta no meio (power
+# é uma única operação que segura o GIL e nunca chegaria a um progress)
+@jobs.task("factorial", process=True)
+def factorial_job(n: int, progress: Progress) -> int:
+    return compute_factorial(n, progress)
+
+@jobs.task("power", process=True)
+def power_job(base: int, exponent: int, progress: Progress) -> int:
+    # Uma única operação: o progresso só marca o início e o fim
+    progress(0, 1)
+    result = base ** exponent
+    progress(1, 1)
     return result
 
+@server.tool()
+@instrument_tool(tool_metrics, tracer)
+def submit_job(tool: str, arguments: dict) -> dict:
+    """Inicia um cálculo longo (factorial ou power) em segundo plano.
+    
+    Use para números grandes: a resposta volta na hora com o job_id, e o
+    resultado é obtido depois com job_result.
+    
+    Args:
+        tool: Nome do cálculo ("factorial" ou "power")
+        arguments: Argumentos do cálculo, ex.: {"n": 50000}
+        
+    Returns:
+        Estado do job (job_id, status, progress, total)
+    """
+    try:
+        return jobs.submit(tool, arguments).snapshot()
+    except KeyError as e:
+        raise ValueError(e.args[0])
+
+@server.tool()
+@instrument_tool(tool_metrics, tracer)
+def job_status(job_id: str) -> dict:
+    """Consulta o estado e o progresso de um job.
+    
+    Args:
+        job_id: Id devolvido por submit_job
+        
+    Returns:
+        Estado do job (queued, running, done, failed ou cancelled) e progresso
+    """
+    try:
+        return jobs.get(job_id).snapshot()
+    except KeyError as e:
+        raise ValueError(e.args[0])
+
+@server.tool(output_schema=None)
+@binary_result(BINARY_MIN_BYTES)
+@instrument_tool(tool_metrics, tracer)
+async def job_result(job_id: str, ctx: Context, wait_seconds: float = 0.0) -> Any:
+    """Obtém o resultado de um job, esperando até wait_seconds por ele.
+    
+    Enquanto espera, o progresso é enviado como notificação MCP de progresso.
+    
+    Args:
+        job_id: Id devolvido por submit_job
+        wait_seconds: Quanto esperar o job terminar (limitado pelo servidor)
+        
+    Returns:
+        O resultado, se o job terminou; senão o estado atual do job
+        
+    Raises:
+        ValueError: Se o job falhou ou não existe
+    """
+    async def report(job):
+        if job.total:
+            await ctx.report_progress(job.progress, job.total, job.message)
+
+    try:
+        job = await jobs.wait(job_id, min(max(wait_seconds, 0.0), JOB_MAX_WAIT), on_progress=report)
+    except KeyError as e:
+        raise ValueError(e.args[0])
+    if job.status == DONE:
+        return job.result
+    if job.status == FAILED:
+        raise ValueError(f"Job {job_id} falhou: {job.error}")
+    return job.snapshot()
+
+@server.tool()
+@instrument_tool(tool_metrics, tracer)
+def cancel_job(job_id: str) -> dict:
+    """Cancela um job na fila ou em execução.
+    
+    Args:
+        job_id: Id devolvido por submit_job
+        
+    Returns:
+        Estado do job após o pedido de cancelamento
+    """
+    try:
+        return jobs.cancel(job_id).snapshot()
+    except KeyError as e:
+        raise ValueError(e.args[0])
+
+if not JOBS_ENABLED:
+    for _name in JOB_TOOLS:
+        server.remove_tool(_name)
+
+def create_app():
+    """Aplicação ASGI sem estado de sessão, para rodar com vários workers
+
+    Com `stateless_http`, cada requisição MCP é independente, então qualquer
+    worker pode atendê-la (o id de sessão não precisa voltar ao mesmo processo).
+    A exceção são os jobs, que guardam estado no worker: com vários workers as
+    ferramentas de jobs não são publicadas.
+    """
+    return server.http_app(stateless_http=True)
+
 def main():
     """Inicia o servidor MCP via HTTP"""
     print("🚀 Iniciando Servidor MCP via HTTP...")
@@ -117,13 +331,34 @@ def main():
     print("   • divide - Divide dois números")
     print("   • power - Calcula potência")
     print("   • factorial - Calcula fatorial")
+    if JOBS_ENABLED:
+        print("   • submit_job / job_status / job_result / cancel_job - Cálculos longos em segundo plano")
+    else:
+        print("   ⚠️ Jobs desativados: MCP_WORKERS > 1 (use um único worker para cálculos longos)")
     print("\n📍 Servidor rodando em: http://localhost:8001")
     print("📚 Documentação MCP: http://localhost:8001/docs")
+    print("📊 Métricas Prometheus: http://localhost:8001/metrics")
+    if JOBS_ENABLED:
+        print("⏳ Progresso de jobs (SSE): http://localhost:8001/jobs/<job_id>/events")
     print("\n🔗 Para conectar um cliente MCP:")
     print("   URL: http://localhost:8001")
     print("   Transporte: HTTP")
     print("\n⚡ Pressione Ctrl+C para parar o servidor")
     
+    workers = int(os.getenv("MCP_WORKERS", "1"))
+    if workers > 1:
+        # Um processo por núcleo (MCP_REUSE_PORT=1 usa um socket por worker)
+        code = serve(
+            "mcp_http_server:create_app",
+            host="0.0.0.0",
+            port=8001,
+            workers=workers,
+            reuse_port=os.getenv("MCP_REUSE_PORT") == "1",
+            app_dir=os.path.dirname(os.path.abspath(__file__)),
+            factory=True,
+        )
+        sys.exit(code)
+    
     # Usa o método run() do FastMCP com transporte HTTP
     server.run(
         transport="http",
@@ -0,0 +1,309 @@
+"""
+Espelho colunar do Chinook para perguntas de agregação
+
+"Receita por gênero", "vendas por país e ano": o agente escreve um GROUP BY
+com três ou quatro JOINs, e o SQLite os executa linha a linha a cada
+pergunta. `ColumnarMirror` carrega uma vez a tabela fato no grão de
+`InvoiceLine` (já juntada com `Invoice`, `Track`, `Album`, `Artist`, `Genre`,
+`MediaType` e `Customer`) em arrays NumPy:
+
+- medidas (`revenue`, `quantity`, `unit_price`, `milliseconds`, `bytes`)
+  como float64/int64;
+- dimensões com codificação de dicionário: um array int32 de códigos mais a
+  lista de valores distintos (`genre`, `country`, `year`...).
+
+`group_aggregate` filtra com máscaras booleanas e agrupa combinando os códigos
+das dimensões em uma chave inteira. Com poucas combinações possíveis a chave
+indexa os grupos diretamente (`bincount`), sem ordenação; com muitas, passa
+por `np.unique`. A tabela é recarregada quando a versão do arquivo muda.
+
+    mirror = ColumnarMirror("Chinook.db")
+    mirror.group_aggregate(["genre"], ["sum(revenue)", "count(*)"], {"year": 2013}, limit=5)
+
+O NumPy é opcional: sem ele, `from_env` devolve None e o agente segue só com
+o SQL.
+"""
+
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+from typing import Any, Dict, List, Optional, Sequence
+
+# Permite importar o pacote infra/ da raiz do repositório
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from infra.response_cache import file_version
+
+# Uma linha por item de fatura, com as dimensões já resolvidas
+_FACTS = """
+SELECT il.InvoiceId, il.UnitPrice * il.Quantity, il.Quantity, il.UnitPrice, t.Milliseconds, t.Bytes,
+       COALESCE(g.Name, ''), COALESCE(mt.Name, ''), COALESCE(ar.Name, ''), COALESCE(al.Title, ''),
+       t.Name, i.BillingCountry, COALESCE(i.BillingCity, ''), c.FirstName || ' ' || c.LastName,
+       CAST(strftime('%Y', i.InvoiceDate) AS INTEGER), CAST(strftime('%m', i.InvoiceDate) AS INTEGER)
+  FROM InvoiceLine il
+  JOIN Invoice i ON i.InvoiceId = il.InvoiceId
+  JOIN Track t ON t.TrackId = il.TrackId
+  LEFT JOIN Album al ON al.AlbumId = t.AlbumId
+  LEFT JOIN Artist ar ON ar.ArtistId = al.ArtistId
+  LEFT JOIN Genre g ON g.GenreId = t.GenreId
+  LEFT JOIN MediaType mt ON mt.MediaTypeId = t.MediaTypeId
+  LEFT JOIN Customer c ON c.CustomerId = i.CustomerId
+"""
+
+# Nome -> posição na consulta acima
+MEASURES = {"revenue": 1, "quantity": 2, "unit_price": 3, "milliseconds": 4, "bytes": 5}
+DIMENSIONS = {
+    "invoice": 0, "genre": 6, "media_type": 7, "artist": 8, "album": 9, "track": 10,
+    "country": 11, "city": 12, "customer": 13, "year": 14, "month": 15,
+}
+
+FUNCTIONS = ("sum", "avg", "min", "max", "count", "count_distinct")
+
+# Acima disso a chave combinada não indexa um array denso: agrupa com np.unique
+_DENSE_GROUPS = 1 << 20
+
+_MEASURE_SPEC = re.compile(r"^\s*(\w+)\s*\(\s*([\w*]+)\s*\)\s*$")
+_COMPARISONS = {">": "greater", ">=": "greater_equal", "<": "less", "<=": "less_equal", "!=": "not_equal"}
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+class ColumnarMirror:
+    """Tabela fato do Chinook em colunas NumPy, recarregada quando o arquivo muda"""
+
+    def __init__(self, source: str):
+        import numpy
+
+        self.np = numpy
+        self.source = source
+        self.version: Optional[str] = None
+        self.rows = 0
+        self.measures: Dict[str, Any] = {}
+        self.codes: Dict[str, Any] = {}
+        self.values: Dict[str, List[Any]] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, source: str) -> Optional["ColumnarMirror"]:
+        """Cria o espelho (ANALYTICS_MIRROR=0 desativa; exige NumPy)"""
+        if os.getenv("ANALYTICS_MIRROR", "1") == "0":
+            return None
+        try:
+            return cls(source)
+        except ImportError:
+            return None
+
+    def refresh(self) -> bool:
+        """Recarrega as colunas se o banco mudou desde a última carga"""
+        version = file_version(self.source)
+        if version == self.version:
+            return False
+        with self._lock:
+            if version != self.version:
+                self._load(version)
+        return True
+
+    def _load(self, version: str) -> None:
+        np = self.np
+        connection = sqlite3.connect(f"file:{self.source}?mode=ro", uri=True)
+        try:
+            columns = list(zip(*connection.execute(_FACTS).fetchall()))
+        finally:
+            connection.close()
+        rows = len(columns[0]) if columns else 0
+        measures, codes, values = {}, {}, {}
+        for name, position in MEASURES.items():
+            data = columns[position] if rows else ()
+            dtype = np.float64 if name in ("revenue", "unit_price") else np.int64
+            measures[name] = np.asarray(data, dtype=dtype)
+        for name, position in DIMENSIONS.items():
+            # Codificação de dicionário: valores distintos ordenados + códigos int32
+            distinct, inverse = np.unique(np.asarray(columns[position] if rows else (), dtype=object), return_inverse=True)
+            codes[name] = inverse.astype(np.int32)
+            values[name] = distinct.tolist()
+        self.measures, self.codes, self.values = measures, codes, values
+        self.rows, self.version = rows, version
+
+    # --- Consulta ---
+
+    def _mask(self, filters: Dict[str, Any]):
+        np = self.np
+        mask = np.ones(self.rows, dtype=bool)
+        for name, condition in (filters or {}).items():
+            if name in MEASURES:
+                column = self.measures[name]
+            elif name in DIMENSIONS:
+                column = None
+            else:
+                raise ValueError(f"Filtro desconhecido: {name}")
+            if isinstance(condition, dict):
+                # {"year": {">=": 2010}}: comparações sobre os valores (medidas ou dimensões numéricas)
+                numeric = column is not None or all(_is_number(v) for v in self.values[name])
+                for operator, operand in condition.items():
+                    if operator not in _COMPARISONS:
+                        raise ValueError(f"Operador desconhecido: {operator} (use {', '.join(_COMPARISONS)})")
+                    if not numeric and operator == "!=":
+                        # Diferença em dimensão de texto: mesma regra da igualdade
+                        accepted = np.array(
+                            [str(v).casefold() != str(operand).casefold() for v in self.values[name]], dtype=bool
+                        )
+                        mask &= accepted[self.codes[name]]
+                        continue
+                    if not numeric:
+                        raise ValueError(f"{name} é texto: use igualdade, lista de valores ou != (não {operator})")
+                    if not _is_number(operand):
+                        raise ValueError(f"Comparação {name} {operator} exige um número, não {operand!r}")
+                    compare = getattr(np, _COMPARISONS[operator])
+                    if column is not None:
+                        mask &= compare(column, operand)
+                    else:
+                        accepted = np.array([compare(v, operand) for v in self.values[name]], dtype=bool)
+                        mask &= accepted[self.codes[name]]
+                continue
+            wanted = condition if isinstance(condition, list) else [condition]
+            if column is not None:
+                mask &= np.isin(column, wanted)
+                continue
+            # Igualdade em dimensão: compara códigos, não textos
+            lookup = {str(v).casefold(): i for i, v in enumerate(self.values[name])}
+            wanted_codes = [lookup[str(v).casefold()] for v in wanted if str(v).casefold() in lookup]
+            mask &= np.isin(self.codes[name], np.asarray(wanted_codes, dtype=np.int32))
+        return mask
+
+    def _groups(self, group_by: Sequence[str], mask):
+        """Índice do grupo de cada linha selecionada e os códigos de cada grupo"""
+        np = self.np
+        selected = np.flatnonzero(mask)
+        if not group_by:
+            return np.zeros(len(selected), dtype=np.int64), 1 if len(selected) else 0, [[]], selected
+        sizes = [max(len(self.values[name]), 1) for name in group_by]
+        key = np.zeros(len(selected), dtype=np.int64)
+        for name, size in zip(group_by, sizes):
+            key = key * size + self.codes[name][selected]
+        total = int(np.prod(sizes, dtype=np.float64))
+        if total >= 2 ** 62:
+            raise ValueError("Combinação de dimensões grande demais para agrupar de uma vez")
+        if total <= _DENSE_GROUPS:
+            # Chave densa: presença por bincount, sem ordenar as linhas
+            present = np.flatnonzero(np.bincount(key, minlength=total))
+            remap = np.full(total, -1, dtype=np.int64)
+            remap[present] = np.arange(len(present))
+            group_keys, inverse = present, remap[key]
+        else:
+            group_keys, inverse = np.unique(key, return_inverse=True)
+        # Decompõe a chave combinada de volta nos códigos de cada dimensão
+        decoded, rest = [], group_keys.copy()
+        for size in reversed(sizes):
+            decoded.append(rest % size)
+            rest //= size
+        decoded.reverse()
+        return inverse, len(group_keys), decoded, selected
+
+    def _aggregate(self, function: str, column: str, inverse, groups: int, selected):
+        np = self.np
+        if function == "count" and column == "*":
+            return np.bincount(inverse, minlength=groups)
+        if function in ("count", "count_distinct") and column in DIMENSIONS:
+            values = self.codes[column][selected]
+        elif column in MEASURES:
+            values = self.measures[column][selected]
+        else:
+            raise ValueError(f"Coluna desconhecida para {function}: {column}")
+        if function == "count":
+            return np.bincount(inverse, minlength=groups)
+        if function == "count_distinct":
+            if not len(values):
+                return np.zeros(groups, dtype=np.int64)
+            pairs = np.unique(np.stack([inverse, values.astype(np.int64)]), axis=1)
+            return np.bincount(pairs[0], minlength=groups)
+        # bincount com pesos e o acumulador com ±inf são float: medidas inteiras
+        # (quantity, milliseconds, bytes) somam em int64 e voltam a int em min/max
+        integer = np.issubdtype(values.dtype, np.integer)
+        if function == "sum" and integer:
+            sums = np.zeros(groups, dtype=np.int64)
+            np.add.at(sums, inverse, values)
+            return sums
+        if function in ("sum", "avg"):
+            sums = np.bincount(inverse, weights=values, minlength=groups)
+            if function == "sum":
+                return sums
+            return sums / np.maximum(np.bincount(inverse, minlength=groups), 1)
+        out = np.full(groups, np.inf if function == "min" else -np.inf)
+        (np.minimum if function == "min" else np.maximum).at(out, inverse, values)
+        # Todo grupo tem ao menos uma linha, então não sobra ±inf para converter
+        return out.astype(np.int64) if integer else out
+
+    def group_aggregate(
+        self,
+        group_by: Sequence[str],
+        measures: Sequence[str],
+        filters: Optional[Dict[str, Any]] = None,
+        order_by: Optional[str] = None,
+        descending: bool = True,
+        limit: int = 20,
+    ) -> List[Dict[str, Any]]:
+        """Agrega `measures` (ex.: "sum(revenue)") por `group_by`, com `filters` opcionais"""
+        np = self.np
+        unknown = [name for name in group_by if name not in DIMENSIONS]
+        if unknown:
+            raise ValueError(f"Dimensões desconhecidas: {', '.join(unknown)} (use {', '.join(DIMENSIONS)})")
+        specs = []
+        for measure in measures or ["count(*)"]:
+            match = _MEASURE_SPEC.match(measure)
+            if match is None or match.group(1).lower() not in FUNCTIONS:
+                raise ValueError(f"Medida inválida: {measure} (use {', '.join(FUNCTIONS)} sobre {', '.join(MEASURES)})")
+            specs.append((measure.replace(" ", ""), match.group(1).lower(), match.group(2)))
+        self.refresh()
+        with self._lock:
+            inverse, groups, decoded, selected = self._groups(group_by, self._mask(filters or {}))
+            results = {label: self._aggregate(fn, column, inverse, groups, selected) for label, fn, column in specs}
+            dimensions = {name: [self.values[name][c] for c in codes.tolist()] for name, codes in zip(group_by, decoded)}
+        sort_label = (order_by or specs[0][0]).replace(" ", "")
+        if sort_label in results:
+            order = np.argsort(results[sort_label], kind="stable")
+        elif sort_label in dimensions:
+            order = np.argsort(np.asarray(dimensions[sort_label], dtype=object), kind="stable")
+        else:
+            raise ValueError(f"order_by deve ser uma das dimensões ou medidas pedidas: {sort_label}")
+        if descending:
+            order = order[::-1]
+        rows = []
+        for index in order[:limit].tolist():
+            row = {name: dimensions[name][index] for name in group_by}
+            for label, values in results.items():
+                value = values[index].item()
+                row[label] = round(value, 4) if isinstance(value, float) else value
+            rows.append(row)
+        return rows
+
+    def as_tool(self):
+        """Ferramenta `group_aggregate` para o agente (LangChain)"""
+        from langchain_core.tools import StructuredTool
+
+        def group_aggregate(
+            group_by: List[str],
+            measures: List[str],
+            filters: Optional[Dict[str, Any]] = None,
+            order_by: str = "",
+            limit: int = 20,
+        ) -> str:
+            rows = self.group_aggregate(group_by, measures, filters, order_by or None, limit=limit)
+            return json.dumps(rows, ensure_ascii=False)
+
+        return StructuredTool.from_function(
+            group_aggregate,
+            description=(
+                "Agrega as vendas (um registro por item de fatura) sem escrever SQL. "
+                f"group_by: lista de {', '.join(DIMENSIONS)}. "
+                f"measures: lista como 'sum(revenue)', 'count(*)', 'avg(unit_price)', "
+                f"'count_distinct(invoice)' ({', '.join(FUNCTIONS)} sobre {', '.join(MEASURES)}). "
+                "filters: objeto, ex.: {\"country\": \"Brazil\", \"year\": {\">=\": 2011}}; "
+                "listas filtram por vários valores; >, >=, <, <= só em medidas, year e month. Ordena pela primeira medida (ou order_by), "
+                "decrescente. Prefira esta ferramenta para receita ou vendas por gênero, país, ano etc."
+            ),
+        )
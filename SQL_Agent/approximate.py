@@ -0,0 +1,493 @@
+"""
+Respostas aproximadas para tabelas grandes
+
+Em produção, o equivalente a `InvoiceLine`/`PlaylistTrack` tem ordens de
+grandeza mais linhas que o Chinook, e COUNT DISTINCT ou percentis exatos
+levam segundos. `ApproximateStats` mantém, por tabela:
+
+- uma amostra de reservatório de `sample_size` linhas (Algoritmo R), que
+  responde COUNT/SUM/AVG com filtros e percentis filtrados;
+- um HyperLogLog por coluna (COUNT DISTINCT, erro padrão 1,04/√m);
+- um t-digest por coluna numérica (percentis sem filtro).
+
+Toda resposta traz o intervalo de confiança de 95% (`low`, `high`), o
+método usado e quantas linhas a tabela e a amostra têm. Se a tabela cabe
+inteira na amostra, a resposta é exata.
+
+Os esboços são atualizados de forma incremental: quando o arquivo muda, só
+as linhas com `rowid` acima do último lido são processadas, então o custo de
+cada pergunta não depende do tamanho da tabela. HyperLogLog e t-digest não
+aceitam remoções: depois de UPDATE/DELETE, recrie com `rebuild()` (ou
+`python approximate.py --rebuild`).
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import random
+import sqlite3
+import sys
+import threading
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# Permite importar o pacote infra/ da raiz do repositório
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from infra.response_cache import file_version
+
+AGGREGATES = ("count", "count_distinct", "sum", "avg", "quantile")
+
+# Quantil da normal para 95% de confiança
+_Z95 = 1.959964
+
+# Linhas lidas por vez ao atualizar os esboços
+_BATCH = 10000
+
+
+class HyperLogLog:
+    """Contagem aproximada de valores distintos em 2^p registradores de um byte"""
+
+    def __init__(self, p: int = 12):
+        self.p = p
+        self.m = 1 << p
+        self.registers = bytearray(self.m)
+
+    def add(self, value: Any) -> None:
+        digest = hashlib.blake2b(repr(value).encode("utf-8"), digest_size=8).digest()
+        x = int.from_bytes(digest, "little")
+        index = x >> (64 - self.p)
+        rest = x & ((1 << (64 - self.p)) - 1)
+        rank = (64 - self.p) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    @property
+    def relative_error(self) -> float:
+        return 1.04 / math.sqrt(self.m)
+
+    def estimate(self) -> float:
+        m = self.m
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Faixa pequena: contagem linear é mais precisa
+            estimate = m * math.log(m / zeros)
+        return estimate
+
+
+class TDigest:
+    """Esboço de quantis por centróides (t-digest com fusão)"""
+
+    def __init__(self, delta: float = 200.0, buffer_size: int = 2000):
+        self.delta = delta
+        self.buffer_size = buffer_size
+        self.centroids: List[Tuple[float, float]] = []
+        self.buffer: List[float] = []
+        self.count = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float) -> None:
+        self.buffer.append(value)
+        self.count += 1
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        if len(self.buffer) >= self.buffer_size:
+            self._compress()
+
+    def _compress(self) -> None:
+        if not self.buffer:
+            return
+        items = sorted(self.centroids + [(v, 1.0) for v in self.buffer])
+        self.buffer = []
+        merged: List[Tuple[float, float]] = []
+        cumulative = 0.0
+        mean, weight = items[0]
+        for next_mean, next_weight in items[1:]:
+            q = (cumulative + (weight + next_weight) / 2) / self.count
+            # Centróides pequenos nas pontas, grandes no meio
+            limit = max(1.0, 4 * self.count * q * (1 - q) / self.delta)
+            if weight + next_weight <= limit:
+                mean = (mean * weight + next_mean * next_weight) / (weight + next_weight)
+                weight += next_weight
+            else:
+                merged.append((mean, weight))
+                cumulative += weight
+                mean, weight = next_mean, next_weight
+        merged.append((mean, weight))
+        self.centroids = merged
+
+    def _value_at(self, rank: float) -> float:
+        """Valor interpolado na posição `rank` (0..count) entre os centros dos centróides"""
+        if rank <= 0:
+            return self.min
+        if rank >= self.count:
+            return self.max
+        previous_center, previous_mean = 0.0, self.min
+        cumulative = 0.0
+        for mean, weight in self.centroids:
+            center = cumulative + weight / 2
+            if rank < center:
+                span = center - previous_center
+                fraction = (rank - previous_center) / span if span else 0.0
+                return previous_mean + fraction * (mean - previous_mean)
+            previous_center, previous_mean = center, mean
+            cumulative += weight
+        span = self.count - previous_center
+        fraction = (rank - previous_center) / span if span else 0.0
+        return previous_mean + fraction * (self.max - previous_mean)
+
+    def quantile(self, q: float) -> Tuple[float, float, float]:
+        """(estimativa, mínimo, máximo): a incerteza é meio centróide para cada lado"""
+        self._compress()
+        rank = q * self.count
+        cumulative, weight = 0.0, 1.0
+        for mean, weight in self.centroids:
+            if cumulative + weight >= rank:
+                break
+            cumulative += weight
+        return self._value_at(rank), self._value_at(rank - weight / 2), self._value_at(rank + weight / 2)
+
+
+class TableSketch:
+    """Amostra, HyperLogLogs e t-digests de uma tabela"""
+
+    def __init__(self, table: str, sample_size: int, seed: int = 0):
+        self.table = table
+        self.sample_size = sample_size
+        self.columns: List[str] = []
+        self.sample: List[tuple] = []
+        self.rows = 0
+        self.last_rowid = 0
+        self.distinct: Dict[str, HyperLogLog] = {}
+        self.digests: Dict[str, TDigest] = {}
+        self._random = random.Random(seed)
+
+    def add_rows(self, rows: Sequence[tuple]) -> None:
+        for row in rows:
+            self.rows += 1
+            # Algoritmo R: cada linha fica na amostra com probabilidade k/n
+            if len(self.sample) < self.sample_size:
+                self.sample.append(row)
+            else:
+                slot = self._random.randrange(self.rows)
+                if slot < self.sample_size:
+                    self.sample[slot] = row
+            for name, value in zip(self.columns, row):
+                if value is None:
+                    continue
+                self.distinct[name].add(value)
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    digest = self.digests.get(name)
+                    if digest is None:
+                        digest = self.digests[name] = TDigest()
+                    digest.add(float(value))
+
+    @property
+    def exact(self) -> bool:
+        return len(self.sample) == self.rows
+
+
+def _bounds(estimate: float, error: float, exact: bool, floor: Optional[float] = None) -> Dict[str, Any]:
+    low, high = (estimate, estimate) if exact else (estimate - error, estimate + error)
+    if floor is not None:
+        low = max(low, floor)
+    return {"estimate": round(estimate, 4), "low": round(low, 4), "high": round(high, 4)}
+
+
+class ApproximateStats:
+    """Esboços das tabelas grandes, atualizados com as linhas novas do banco"""
+
+    def __init__(
+        self,
+        source: str,
+        tables: Sequence[str] = ("InvoiceLine", "PlaylistTrack", "Invoice", "Track"),
+        sample_size: int = 10000,
+        hll_precision: int = 12,
+    ):
+        self.source = source
+        self.tables = list(tables)
+        self.sample_size = sample_size
+        self.hll_precision = hll_precision
+        self.version: Optional[str] = None
+        self.sketches: Dict[str, TableSketch] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, source: str) -> Optional["ApproximateStats"]:
+        """Configurado por APPROXIMATE_QUERIES (0 desativa), APPROX_TABLES e APPROX_SAMPLE_SIZE"""
+        if os.getenv("APPROXIMATE_QUERIES", "1") == "0":
+            return None
+        tables = [t.strip() for t in os.getenv("APPROX_TABLES", "").split(",") if t.strip()]
+        kwargs = {"tables": tables} if tables else {}
+        return cls(source, sample_size=int(os.getenv("APPROX_SAMPLE_SIZE", "10000")), **kwargs)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(f"file:{self.source}?mode=ro", uri=True)
+
+    def rebuild(self) -> None:
+        """Descarta os esboços e relê as tabelas inteiras"""
+        with self._lock:
+            self.sketches = {}
+            self.version = None
+        self.refresh()
+
+    def refresh(self) -> bool:
+        """Processa as linhas acrescentadas desde a última leitura (se o arquivo mudou)"""
+        version = file_version(self.source)
+        if version == self.version:
+            return False
+        with self._lock:
+            if version == self.version:
+                return False
+            connection = self._connect()
+            try:
+                for table in self.tables:
+                    self._update(connection, table)
+            finally:
+                connection.close()
+            self.version = version
+        return True
+
+    def _update(self, connection: sqlite3.Connection, table: str) -> None:
+        sketch = self.sketches.get(table)
+        if sketch is None:
+            sketch = self.sketches[table] = TableSketch(table, self.sample_size)
+            sketch.columns = [row[1] for row in connection.execute(f'PRAGMA table_info("{table}")')]
+            sketch.distinct = {name: HyperLogLog(self.hll_precision) for name in sketch.columns}
+        cursor = connection.execute(
+            f'SELECT rowid, * FROM "{table}" WHERE rowid > ? ORDER BY rowid', (sketch.last_rowid,)
+        )
+        while True:
+            rows = cursor.fetchmany(_BATCH)
+            if not rows:
+                break
+            sketch.add_rows([row[1:] for row in rows])
+            sketch.last_rowid = rows[-1][0]
+
+    # --- Consultas ---
+
+    def _sketch(self, table: str) -> TableSketch:
+        matches = [name for name in self.sketches if name.lower() == table.lower()]
+        if not matches:
+            raise ValueError(f"Tabela sem esboço: {table} (disponíveis: {', '.join(self.tables)})")
+        return self.sketches[matches[0]]
+
+    def _column(self, sketch: TableSketch, column: str) -> int:
+        for index, name in enumerate(sketch.columns):
+            if name.lower() == column.lower():
+                return index
+        raise ValueError(f"Coluna desconhecida em {sketch.table}: {column} ({', '.join(sketch.columns)})")
+
+    def _numeric(self, sketch: TableSketch, column: str) -> int:
+        index = self._column(sketch, column)
+        if sketch.columns[index] not in sketch.digests:
+            raise ValueError(f"Coluna sem valores numéricos: {column} (sum/avg/quantile precisam de números)")
+        return index
+
+    @staticmethod
+    def _key(value: Any) -> str:
+        """Forma comparável de um valor: números pelo valor (1, 1.0 e "1" casam), texto sem caixa"""
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            return str(value).casefold()
+        if not math.isfinite(number):
+            return str(value).casefold()
+        return str(int(number)) if number.is_integer() else repr(number)
+
+    def _checks(self, sketch: TableSketch, filters: Optional[Dict[str, Any]]) -> List[Tuple[int, set]]:
+        """Filtros de igualdade validados: (coluna, valores aceitos)"""
+        checks = []
+        for column, wanted in (filters or {}).items():
+            accepted = wanted if isinstance(wanted, list) else [wanted]
+            if not accepted or any(isinstance(v, (dict, list)) for v in accepted):
+                raise ValueError(
+                    f"Filtro não suportado em {column}: {json.dumps(wanted, ensure_ascii=False)} "
+                    "(só igualdade: um valor ou uma lista de valores)"
+                )
+            checks.append((self._column(sketch, column), {self._key(v) for v in accepted}))
+        return checks
+
+    def _matching(self, sketch: TableSketch, filters: Optional[Dict[str, Any]]) -> List[tuple]:
+        if not filters:
+            return sketch.sample
+        checks = self._checks(sketch, filters)
+        return [row for row in sketch.sample if all(self._key(row[i]) in values for i, values in checks)]
+
+    def query(
+        self,
+        table: str,
+        aggregate: str,
+        column: str = "*",
+        quantile: float = 0.5,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """Resposta aproximada com intervalo de 95% (`low`, `high`)"""
+        if aggregate not in AGGREGATES:
+            raise ValueError(f"Agregação desconhecida: {aggregate} (use {', '.join(AGGREGATES)})")
+        self.refresh()
+        with self._lock:
+            sketch = self._sketch(table)
+            # Filtros e colunas inválidos viram erro, nunca uma estimativa 0 com intervalo [0, 0]
+            self._checks(sketch, filters)
+            if aggregate in ("sum", "avg"):
+                self._numeric(sketch, column)
+            rows, size = sketch.rows, len(sketch.sample)
+            answer: Dict[str, Any] = {"table": sketch.table, "aggregate": aggregate, "rows": rows,
+                                      "sample": size, "exact": sketch.exact, "confidence": 0.95}
+            if aggregate == "count_distinct":
+                answer.update(self._count_distinct(sketch, column, filters))
+            elif aggregate == "quantile":
+                answer.update(self._quantile(sketch, column, quantile, filters))
+            else:
+                answer.update(self._estimate(sketch, aggregate, column, filters))
+        answer["column"] = column
+        return answer
+
+    def _count_distinct(self, sketch: TableSketch, column: str, filters) -> Dict[str, Any]:
+        if filters:
+            raise ValueError("count_distinct não aceita filtros (o HyperLogLog cobre a tabela inteira)")
+        hll = sketch.distinct[sketch.columns[self._column(sketch, column)]]
+        estimate = hll.estimate()
+        if sketch.exact:
+            index = self._column(sketch, column)
+            exact = len({row[index] for row in sketch.sample if row[index] is not None})
+            return {**_bounds(exact, 0, True), "method": "exact"}
+        error = _Z95 * hll.relative_error * estimate
+        return {**_bounds(estimate, error, False, floor=0), "method": f"hyperloglog(p={hll.p})"}
+
+    def _quantile(self, sketch: TableSketch, column: str, q: float, filters) -> Dict[str, Any]:
+        if not 0 <= q <= 1:
+            raise ValueError("quantile deve estar entre 0 e 1")
+        index = self._numeric(sketch, column)
+        name = sketch.columns[index]
+        if not filters and not sketch.exact:
+            digest = sketch.digests[name]
+            estimate, low, high = digest.quantile(q)
+            return {"estimate": round(estimate, 4), "low": round(low, 4), "high": round(high, 4),
+                    "quantile": q, "method": "t-digest"}
+        values = sorted(
+            row[index] for row in self._matching(sketch, filters)
+            if isinstance(row[index], (int, float)) and not isinstance(row[index], bool)
+        )
+        if not values:
+            raise ValueError("Nenhuma linha numérica na amostra para esse filtro")
+        m = len(values)
+        position = q * (m - 1)
+        estimate = values[int(position)] + (position - int(position)) * (values[min(int(position) + 1, m - 1)] - values[int(position)])
+        if sketch.exact:
+            return {**_bounds(estimate, 0, True), "quantile": q, "method": "exact"}
+        # Intervalo pelas estatísticas de ordem (aproximação binomial)
+        spread = _Z95 * math.sqrt(m * q * (1 - q))
+        low = values[max(int(math.floor(q * m - spread)), 0)]
+        high = values[min(int(math.ceil(q * m + spread)), m - 1)]
+        return {"estimate": round(estimate, 4), "low": round(low, 4), "high": round(high, 4),
+                "quantile": q, "method": "sample"}
+
+    def _estimate(self, sketch: TableSketch, aggregate: str, column: str, filters) -> Dict[str, Any]:
+        population, sample = sketch.rows, sketch.sample
+        k = len(sample)
+        if not k:
+            return {**_bounds(0.0, 0.0, True), "method": "exact"}
+        matching = set(map(id, self._matching(sketch, filters))) if filters else None
+        if aggregate == "count":
+            values = [1.0 if matching is None or id(row) in matching else 0.0 for row in sample]
+        else:
+            index = self._column(sketch, column)
+            values = [
+                float(row[index]) if (matching is None or id(row) in matching) and isinstance(row[index], (int, float)) else None
+                for row in sample
+            ]
+            if aggregate == "avg":
+                values = [v for v in values if v is not None]
+                if not values:
+                    raise ValueError("Nenhuma linha na amostra para esse filtro")
+            else:
+                values = [v if v is not None else 0.0 for v in values]
+        n = len(values)
+        mean = sum(values) / n
+        variance = sum((v - mean) ** 2 for v in values) / (n - 1) if n > 1 else 0.0
+        # Correção para população finita: amostra grande em relação à tabela erra menos
+        fpc = math.sqrt(max(population - k, 0) / (population - 1)) if population > 1 else 0.0
+        standard_error = math.sqrt(variance / n) * fpc
+        method = "exact" if sketch.exact else f"reservoir(k={k})"
+        if aggregate == "avg":
+            return {**_bounds(mean, _Z95 * standard_error, sketch.exact), "method": method}
+        estimate = mean * population
+        error = _Z95 * standard_error * population
+        answer = {**_bounds(estimate, error, sketch.exact, floor=0 if aggregate == "count" else None), "method": method}
+        if sketch.exact or matching is None or 0 < len(matching) < k:
+            return answer
+        # Nenhuma (ou toda) linha da amostra casou: a variância da amostra é zero, mas a
+        # tabela ainda pode ter até ~3/k das linhas do outro lado (regra de três, 95%)
+        margin = population * min(1.0, 3 / k)
+        if not matching and aggregate == "count":
+            answer["high"] = round(margin, 4)
+        elif not matching:
+            digest = sketch.digests[sketch.columns[self._column(sketch, column)]]
+            answer["low"] = round(margin * min(digest.min, 0.0), 4)
+            answer["high"] = round(margin * max(digest.max, 0.0), 4)
+        elif aggregate == "count":
+            answer["low"] = round(population - margin, 4)
+        else:
+            return answer
+        answer["method"] = f"{method}+rule_of_three"
+        return answer
+
+    def as_tool(self):
+        """Ferramenta `approximate_query` para o agente (LangChain)"""
+        from langchain_core.tools import StructuredTool
+
+        def approximate_query(
+            table: str,
+            aggregate: str,
+            column: str = "*",
+            quantile: float = 0.5,
+            filters: Optional[Dict[str, Any]] = None,
+        ) -> str:
+            return json.dumps(self.query(table, aggregate, column, quantile, filters), ensure_ascii=False)
+
+        return StructuredTool.from_function(
+            approximate_query,
+            description=(
+                "Resposta APROXIMADA e instantânea para tabelas grandes "
+                f"({', '.join(self.tables)}): aggregate = {', '.join(AGGREGATES)}. "
+                "count_distinct usa HyperLogLog; quantile (0..1) usa t-digest ou a amostra; "
+                "count/sum/avg usam uma amostra e aceitam filters de igualdade "
+                "(ex.: {\"GenreId\": 1} ou {\"GenreId\": [1, 2]}; comparações como > não são aceitas). Devolve estimate com o intervalo de 95% (low, high). "
+                "Use só quando a pergunta aceitar aproximação, e informe a margem na resposta."
+            ),
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Esboços para respostas aproximadas")
+    parser.add_argument("table", nargs="?")
+    parser.add_argument("aggregate", nargs="?", choices=AGGREGATES)
+    parser.add_argument("column", nargs="?", default="*")
+    parser.add_argument("--source", default="Chinook.db")
+    parser.add_argument("--quantile", type=float, default=0.5)
+    parser.add_argument("--filters", default="", help="JSON, ex.: '{\"GenreId\": 1}'")
+    parser.add_argument("--sample-size", type=int, default=int(os.getenv("APPROX_SAMPLE_SIZE", "10000")))
+    parser.add_argument("--rebuild", action="store_true", help="Relê as tabelas inteiras")
+    args = parser.parse_args()
+
+    stats = ApproximateStats(args.source, sample_size=args.sample_size)
+    if args.rebuild:
+        stats.rebuild()
+        for sketch in stats.sketches.values():
+            print(f"📐 {sketch.table}: {sketch.rows} linhas, amostra de {len(sketch.sample)}")
+    if args.table and args.aggregate:
+        filters = json.loads(args.filters) if args.filters else None
+        print(json.dumps(stats.query(args.table, args.aggregate, args.column, args.quantile, filters), ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+"""
+Busca textual no catálogo do Chinook (FTS5)
+
+Perguntas como "Quais são os álbuns do artista Queen?" levam o agente a
+escrever `LIKE '%queen%'` sobre `Artist`, `Album` e `Track` (varredura
+completa), e um nome digitado errado custa mais iterações. `CatalogSearch`
+mantém um banco auxiliar com os nomes de artistas, álbuns, faixas,
+compositores e gêneros em dois índices FTS5:
+
+- `words` (unicode61, sem acentos): busca por palavras e prefixos ("que" →
+  "Queen"), ordenada por bm25 com peso maior para o nome;
+- `grams` (trigram): candidatos por trigramas em comum, para nomes com erro
+  de digitação ("Led Zepelin" → "Led Zeppelin"), ordenados por similaridade.
+
+O SQLite não deixa gatilhos de um banco escreverem em outro, então o índice é
+reconstruído quando a versão do arquivo de origem muda (verificada a cada
+busca) ou pelo comando:
+
+    python catalog_search.py --rebuild
+    python catalog_search.py "led zepelin"
+"""
+
+import argparse
+import difflib
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import unicodedata
+from typing import Any, Dict, List, Optional, Sequence
+
+# Permite importar o pacote infra/ da raiz do repositório
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from infra.response_cache import file_version
+
+KINDS = ("artist", "album", "track", "composer", "genre")
+
+# (tipo, id, nome, contexto) de cada entidade do catálogo
+_ENTITIES = """
+SELECT 'artist', ArtistId, Name, '' FROM Artist WHERE Name IS NOT NULL
+UNION ALL
+SELECT 'album', al.AlbumId, al.Title, COALESCE(ar.Name, '')
+  FROM Album al LEFT JOIN Artist ar ON ar.ArtistId = al.ArtistId
+UNION ALL
+SELECT 'track', t.TrackId, t.Name, COALESCE(al.Title, '') || ' — ' || COALESCE(ar.Name, '')
+  FROM Track t LEFT JOIN Album al ON al.AlbumId = t.AlbumId LEFT JOIN Artist ar ON ar.ArtistId = al.ArtistId
+UNION ALL
+SELECT 'composer', NULL, Composer, COUNT(*) || ' faixas'
+  FROM Track WHERE Composer IS NOT NULL AND Composer <> '' GROUP BY Composer
+UNION ALL
+SELECT 'genre', GenreId, Name, '' FROM Genre WHERE Name IS NOT NULL
+"""
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    entity_id INTEGER,
+    name TEXT NOT NULL,
+    context TEXT NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS words USING fts5(
+    name, context, content='entries', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS grams USING fts5(folded, tokenize='trigram');
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+"""
+
+# Candidatos por trigramas avaliados pela similaridade antes de ordenar
+_FUZZY_CANDIDATES = 200
+
+
+def fold(text: str) -> str:
+    """Minúsculas e sem acentos (o tokenizador trigram desta versão não tira acentos)"""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def similarity(query: str, name: str) -> float:
+    """Melhor semelhança entre a consulta e um trecho do nome com o mesmo número de palavras"""
+    query_words, name_words = query.split(), name.split()
+    size = max(len(query_words), 1)
+    windows = [" ".join(name_words[i:i + size]) for i in range(max(len(name_words) - size + 1, 1))]
+    return max(difflib.SequenceMatcher(None, query, window).ratio() for window in windows)
+
+
+def _phrase(term: str) -> str:
+    return '"' + term.replace('"', '""') + '"'
+
+
+class CatalogSearch:
+    """Índice FTS5 dos nomes do Chinook em um banco auxiliar"""
+
+    def __init__(self, source: str, path: str = ":memory:", min_similarity: float = 0.75):
+        self.source = source
+        self.min_similarity = min_similarity
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+
+    @classmethod
+    def from_env(cls, source: str, default_path: str) -> Optional["CatalogSearch"]:
+        """Cria o índice (CATALOG_SEARCH=0 desativa; CATALOG_SEARCH_FILE muda o arquivo)"""
+        if os.getenv("CATALOG_SEARCH", "1") == "0":
+            return None
+        return cls(
+            source,
+            os.getenv("CATALOG_SEARCH_FILE", default_path),
+            min_similarity=float(os.getenv("CATALOG_SEARCH_MIN_SIMILARITY", "0.75")),
+        )
+
+    def _indexed_version(self) -> Optional[str]:
+        row = self._db.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        return row[0] if row else None
+
+    def rebuild(self) -> int:
+        """Recria o índice a partir do banco de origem; devolve o número de entradas"""
+        version = file_version(self.source)
+        source = sqlite3.connect(f"file:{self.source}?mode=ro", uri=True)
+        try:
+            rows = source.execute(_ENTITIES).fetchall()
+        finally:
+            source.close()
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM entries")
+            self._db.execute("DELETE FROM grams")
+            self._db.executemany(
+                "INSERT INTO entries (id, kind, entity_id, name, context) VALUES (?, ?, ?, ?, ?)",
+                [(i, *row) for i, row in enumerate(rows, 1)],
+            )
+            self._db.execute("INSERT INTO words(words) VALUES ('rebuild')")
+            self._db.executemany(
+                "INSERT INTO grams (rowid, folded) VALUES (?, ?)",
+                [(i, fold(row[2])) for i, row in enumerate(rows, 1)],
+            )
+            self._db.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (version,))
+        return len(rows)
+
+    def refresh(self) -> bool:
+        """Reconstrói o índice se o banco de origem mudou desde a última vez"""
+        if self._indexed_version() == file_version(self.source):
+            return False
+        self.rebuild()
+        return True
+
+    def _kind_filter(self, kinds: Sequence[str]) -> tuple:
+        if not kinds:
+            return "", ()
+        return f" AND e.kind IN ({', '.join('?' * len(kinds))})", tuple(kinds)
+
+    def _prefix_hits(self, folded: str, kinds: Sequence[str], limit: int) -> List[Dict[str, Any]]:
+        tokens = re.findall(r"\w+", folded)
+        if not tokens:
+            return []
+        where, params = self._kind_filter(kinds)
+        rows = self._db.execute(
+            f"""
+            SELECT e.id, e.kind, e.entity_id, e.name, e.context, bm25(words, 10.0, 1.0) AS rank
+              FROM words JOIN entries e ON e.id = words.rowid
+             WHERE words MATCH ?{where}
+             ORDER BY rank LIMIT ?
+            """,
+            (" ".join(_phrase(token) + "*" for token in tokens), *params, limit),
+        ).fetchall()
+        return [
+            {"id": row[0], "kind": row[1], "entity_id": row[2], "name": row[3], "context": row[4],
+             "score": round(-row[5], 3), "match": "prefix"}
+            for row in rows
+        ]
+
+    def _fuzzy_hits(self, folded: str, kinds: Sequence[str], limit: int) -> List[Dict[str, Any]]:
+        grams = {folded[i:i + 3] for i in range(len(folded) - 2)}
+        if not grams:
+            return []
+        where, params = self._kind_filter(kinds)
+        rows = self._db.execute(
+            f"""
+            SELECT e.id, e.kind, e.entity_id, e.name, e.context, grams.folded
+              FROM grams JOIN entries e ON e.id = grams.rowid
+             WHERE grams MATCH ?{where}
+             ORDER BY grams.rank LIMIT ?
+            """,
+            (" OR ".join(_phrase(gram) for gram in sorted(grams)), *params, _FUZZY_CANDIDATES),
+        ).fetchall()
+        hits = []
+        for row in rows:
+            score = similarity(folded, row[5])
+            if score >= self.min_similarity:
+                hits.append({"id": row[0], "kind": row[1], "entity_id": row[2], "name": row[3],
+                             "context": row[4], "score": round(score, 3), "match": "fuzzy"})
+        hits.sort(key=lambda hit: -hit["score"])
+        return hits[:limit]
+
+    def search(self, query: str, kinds: Sequence[str] = (), limit: int = 10) -> List[Dict[str, Any]]:
+        """Entidades que casam com `query`: primeiro por palavras/prefixos, depois aproximadas"""
+        unknown = set(kinds) - set(KINDS)
+        if unknown:
+            raise ValueError(f"Tipos desconhecidos: {', '.join(sorted(unknown))} (use {', '.join(KINDS)})")
+        self.refresh()
+        folded = fold(query).strip()
+        with self._lock:
+            hits = self._prefix_hits(folded, kinds, limit)
+            if len(hits) < limit:
+                seen = {hit["id"] for hit in hits}
+                fuzzy = self._fuzzy_hits(folded, kinds, limit)
+                hits += [hit for hit in fuzzy if hit["id"] not in seen][: limit - len(hits)]
+        for hit in hits:
+            del hit["id"]
+        return hits
+
+    def as_tool(self):
+        """Ferramenta `search_catalog` para o agente (LangChain)"""
+        from langchain_core.tools import StructuredTool
+
+        def search_catalog(query: str, kinds: str = "", limit: int = 10) -> str:
+            wanted = [kind.strip() for kind in kinds.split(",") if kind.strip()]
+            return json.dumps(self.search(query, wanted, limit), ensure_ascii=False)
+
+        return StructuredTool.from_function(
+            search_catalog,
+            description=(
+                "Busca nomes no catálogo (artist, album, track, composer, genre) por palavras, "
+                "prefixos ou com erros de digitação, e devolve os ids ordenados por relevância. "
+                "Use antes de filtrar por nome no SQL, em vez de LIKE. `kinds` é opcional "
+                "(ex.: 'artist,album')."
+            ),
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Índice de busca do catálogo do Chinook")
+    parser.add_argument("query", nargs="?", help="Texto a buscar")
+    parser.add_argument("--source", default="Chinook.db")
+    parser.add_argument("--index", default=os.getenv("CATALOG_SEARCH_FILE", ".catalog_search.sqlite"))
+    parser.add_argument("--kinds", default="", help="Tipos separados por vírgula")
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--rebuild", action="store_true", help="Recria o índice")
+    args = parser.parse_args()
+
+    catalog = CatalogSearch(args.source, args.index)
+    if args.rebuild:
+        print(f"🔎 Índice recriado: {catalog.rebuild()} entradas")
+    if args.query:
+        kinds = [kind for kind in args.kinds.split(",") if kind]
+        for hit in catalog.search(args.query, kinds, args.limit):
+            print(f"{hit['score']:>8} {hit['match']:<6} {hit['kind']:<8} {hit['entity_id']!s:>5} "
+                  f"{hit['name']}  ({hit['context']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,54 +1,104 @@
 # Instale as bibliotecas necessárias
 # pip install langchain langchain-openai langgraph langchain-community sqlalchemy python-dotenv
 
+import asyncio
 import os
-from langchain_openai import AzureChatOpenAI
+import sys
 from langchain_community.utilities.sql_database import SQLDatabase
 from langchain_community.agent_toolkits import SQLDatabaseToolkit, create_sql_agent
-from pydantic import SecretStr
+from langchain_community.agent_toolkits.sql.prompt import SQL_PREFIX
+from langchain_core.messages import AIMessage
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from sqlalchemy import create_engine, event
 from dotenv import load_dotenv
 
+# Permite importar o pacote infra/ da raiz do repositório
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from infra.agent_callbacks import TracingCallback, TurnTimingCallback
+from infra.deadlines import Deadline, deadline_scope, install_sqlite_deadline
+from infra.llm import create_chat_model, llm_backend, missing_azure_settings
+from infra.prompt_prefix import system_prompt
+from infra.response_cache import ResponseCache, file_version, tool_trace_from_steps
+from infra.streaming import print_agent_stream
+from infra.tracing import get_tracer
+from analytics import ColumnarMirror
+from approximate import ApproximateStats
+from catalog_search import CatalogSearch
+from trajectories import TrajectoryStore
+
 # Carrega as variáveis de ambiente do arquivo .env
 load_dotenv()
 
 # --- 1. Configuração do Ambiente (Azure OpenAI) ---
-azure_endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
-azure_api_key = os.getenv("AZURE_OPENAI_API_KEY")
-azure_deployment = os.getenv("AZURE_OPENAI_CHAT_DEPLOYMENT_NAME") or os.getenv("AZURE_MODEL_NAME")
-azure_api_version = os.getenv("OPENAI_API_VERSION")
-
-# Verifique se as variáveis de ambiente do Azure estão configuradas
-if not all([azure_endpoint, azure_api_key, azure_deployment, azure_api_version]):
+# Com LLM_BACKEND=scripted|replay o agente roda offline e dispensa o Azure
+if llm_backend() == "azure" and missing_azure_settings():
     print("Erro: Uma ou mais variáveis de ambiente do Azure OpenAI não foram definidas.")
     print("Por favor, configure AZURE_OPENAI_ENDPOINT, AZURE_OPENAI_API_KEY, AZURE_OPENAI_CHAT_DEPLOYMENT_NAME, e OPENAI_API_VERSION.")
     exit()
 
 # --- 2. Configuração do Banco de Dados ---
 # Conectando ao banco de dados local Chinook.db
-db = SQLDatabase.from_uri("sqlite:///Chinook.db")
+engine = create_engine("sqlite:///Chinook.db")
+
+# Prazo de cada pergunta em segundos (SQL_AGENT_TIMEOUT, 0 = sem prazo): o
+# agente para de raciocinar e as consultas SQLite em andamento são interrompidas
+QUESTION_TIMEOUT = float(os.getenv("SQL_AGENT_TIMEOUT", "0")) or None
+
+@event.listens_for(engine, "connect")
+def _interrupt_on_deadline(dbapi_connection, connection_record):
+    install_sqlite_deadline(dbapi_connection)
+
+db = SQLDatabase(engine)
 
 # --- 3. Criação das Ferramentas e do Agente ---
 # Inicialize o modelo de linguagem que o agente usará
-llm = AzureChatOpenAI(
-    azure_endpoint=azure_endpoint,
-    azure_deployment=azure_deployment,
-    api_key=SecretStr(azure_api_key) if azure_api_key else None,
-    api_version=azure_api_version,
-    temperature=0
-)
+llm = create_chat_model(temperature=0)
 
 # Crie o SQLDatabaseToolkit, que contém as ferramentas para interagir com o banco de dados
 toolkit = SQLDatabaseToolkit(db=db, llm=llm)
 
+# Busca de nomes indexada e tolerante a erros de digitação, em vez de LIKE
+# (CATALOG_SEARCH=0 desativa; o índice é recriado quando o Chinook.db muda)
+catalog = CatalogSearch.from_env("Chinook.db", ".catalog_search.sqlite")
+
+# Agregações de vendas (receita por gênero, país, ano...) em colunas NumPy
+# em memória, sem JOINs no SQLite (ANALYTICS_MIRROR=0 desativa)
+analytics = ColumnarMirror.from_env("Chinook.db")
+
+# Respostas aproximadas (amostra, HyperLogLog, t-digest) com margem de erro,
+# para quando a pergunta aceita estimativa (APPROXIMATE_QUERIES=0 desativa)
+approximate = ApproximateStats.from_env("Chinook.db")
+extra_tools = [tool.as_tool() for tool in (catalog, analytics, approximate) if tool is not None]
+
+# Prefixo estável para o cache de prompt do provedor: instruções e o esquema
+# do banco (tabelas, colunas e linhas de exemplo, fixos para a execução) vêm
+# antes de tudo e são idênticos em toda pergunta; a pergunta e o rascunho do
+# agente ficam no fim. Com o esquema no prompt, a ferramenta sql_db_schema sai
+# e o agente economiza as chamadas de descoberta (SQL_AGENT_SCHEMA_IN_PROMPT=0
+# volta ao prompt padrão)
+prompt = None
+if os.getenv("SQL_AGENT_SCHEMA_IN_PROMPT", "1") != "0":
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", system_prompt(SQL_PREFIX, "Database schema (tables, columns and sample rows):\n\n{table_info}")),
+        ("human", "{input}"),
+        AIMessage(content="The database schema is above, so I can write the query directly."),
+        MessagesPlaceholder(variable_name="agent_scratchpad"),
+    ])
+
 # Crie o agente SQL usando a abordagem mais estável
 agent_executor = create_sql_agent(
     llm=llm,                            # Language model instance to use
     toolkit=toolkit,                    # SQL toolkit containing database interaction tools
+    prompt=prompt,                      # Static prefix (instructions + schema snapshot) or the default
     agent_type="openai-tools",          # Type of agent to create (using OpenAI tools format)
-    verbose=True,                       # Enable detailed output of agent's thought process
+    verbose=False,                      # Progress (tools and tokens) is printed by the event stream
     max_iterations=15,                  # Maximum number of reasoning steps before stopping
-    max_execution_time=None,            # No time limit for execution
+    max_execution_time=QUESTION_TIMEOUT,  # Time limit per question (SQL_AGENT_TIMEOUT)
     early_stopping_method="force",      # Force stop when max iterations reached
+    extra_tools=extra_tools,            # search_catalog, group_aggregate and approximate_query
+    # Guarda o rastro das ferramentas junto com a resposta no cache
+    agent_executor_kwargs={"return_intermediate_steps": True},
 )
 
 print("Agente SQL pronto! Faça suas perguntas sobre o banco de dados Chinook.")
@@ -56,6 +106,19 @@ print("Exemplos: 'Liste todos os artistas', 'Quantos funcionários existem?', 'Q
 print("Digite 'sair' para terminar.")
 print("-" * 30)
 
+# Mede o tempo de cada pergunta: LLM vs. ferramentas SQL vs. overhead
+timing = TurnTimingCallback("sql_agent")
+
+# Rastreamento dos turnos (TRACE_EXPORTER=console|file para exportar)
+tracer = get_tracer("sql-agent")
+tracing = TracingCallback(tracer)
+
+# Cache de respostas por versão do Chinook.db (RESPONSE_CACHE=0 desativa)
+response_cache = ResponseCache.from_env("sql_agent", ".response_cache.sqlite")
+
+# Planos aprendidos das execuções anteriores (TRAJECTORY_REPLAY=0 desativa)
+trajectories = TrajectoryStore.from_env(".trajectories.sqlite")
+
 # --- 4. Loop de Interação com o Agente ---
 while True:
     user_input = input("Sua pergunta: ")
@@ -63,12 +126,60 @@ while True:
         break
 
     try:
-        # Use invoke diretamente no agente criado pelo create_sql_agent
-        response = agent_executor.invoke({"input": user_input})
-        final_response = response.get("output")
+        # Perguntas repetidas sobre a mesma versão dos dados vêm do cache
+        scope = file_version("Chinook.db")
+        cached = response_cache.get(user_input, scope) if response_cache else None
+        if cached:
+            print("\nResposta Final:")
+            print(cached.answer)
+            print(cached.format())
+            print("-" * 30)
+            continue
+
+        timing.start_turn()
+        final_response, steps = None, []
+        deadline = Deadline.after(QUESTION_TIMEOUT)
+
+        # Mesma trajetória de uma pergunta já respondida: SQL direto + uma chamada ao LLM
+        known = trajectories.match(user_input) if trajectories else None
+        if known:
+            plan, values = known
+            try:
+                with deadline_scope(deadline), tracer.span(
+                    "agent.plan", attributes={"category": "agent", "plan.example": plan.example}
+                ):
+                    final_response = trajectories.replay(
+                        user_input, plan, values, db, llm, config={"callbacks": [timing, tracing]}
+                    )
+                print(f"🧭 Plano reaproveitado de '{plan.example}' com {values}")
+                trace = [{"tool": "sql_db_query", "args": {"query": plan.sql, **values}, "result": None}]
+            except Exception as e:
+                print(f"⚠️  Plano descartado ({e}); usando o agente completo")
+
         print("\nResposta Final:")
-        print(final_response)
+        if final_response is None:
+            # Executa o agente imprimindo ferramentas e tokens à medida que chegam
+            with deadline_scope(deadline), tracer.span("agent.turn", attributes={"category": "agent"}):
+                final = asyncio.run(print_agent_stream(
+                    agent_executor, {"input": user_input}, config={"callbacks": [timing, tracing]}
+                ))
+            response = final["state"]
+            final_response = response.get("output")
+            steps = response.get("intermediate_steps", [])
+            trace = tool_trace_from_steps(steps)
+        else:
+            print(final_response)
+
+        print(timing.finish_turn().format())
         print("-" * 30)
+
+        # Se a pergunta alterou o banco, nem a resposta nem o plano podem ser
+        # reaproveitados; com o prazo esgotado, a resposta pode estar incompleta
+        if file_version("Chinook.db") == scope and not deadline.expired:
+            if response_cache:
+                response_cache.put(user_input, final_response, trace, scope)
+            if trajectories and steps:
+                trajectories.record(user_input, steps)
     except Exception as e:
         print(f"\nOcorreu um erro durante a execução: {e}")
         print("-" * 30)
@@ -0,0 +1,225 @@
+"""
+Reaproveitamento de trajetórias do agente SQL
+
+Muitas perguntas seguem o mesmo caminho (listar tabelas → esquema → consulta)
+e só mudam um literal: "Quais são os álbuns do artista Queen?" e "... do
+artista AC/DC?". Cada execução bem-sucedida vira um plano parametrizado:
+
+- o padrão da pergunta, com os literais trocados por grupos de captura;
+- o SQL final, com os mesmos literais trocados por parâmetros (:p0, :p1...);
+- a sequência de ferramentas que o agente usou para chegar nele.
+
+Uma pergunta nova que casa com um plano conhecido executa o SQL direto com os
+parâmetros extraídos, e o LLM é chamado uma única vez, só para redigir a
+resposta. Apenas consultas de leitura (SELECT/WITH) viram planos.
+
+Para não devolver uma resposta confiante e errada:
+
+- cada captura de texto tem o mesmo número de palavras do literal original
+  (ou vai até as aspas, se ele estava entre aspas), então uma pergunta mais
+  longa com o mesmo começo não casa;
+- os parâmetros de texto são comparados com `COLLATE NOCASE`, já que a
+  pergunta pode não ter a grafia do banco;
+- uma consulta reaproveitada que volta vazia descarta o plano, e o agente
+  completo responde.
+"""
+
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+_STRING_LITERAL = re.compile(r"'((?:[^']|'')*)'")
+_NUMBER_LITERAL = re.compile(r"(?<![\w.:])\d+(?:\.\d+)?(?![\w.])")
+_READ_ONLY = re.compile(r"^\s*(select|with)\b", re.IGNORECASE)
+_QUOTES = "\"'“”‘’«»"
+
+# Planos gravados antes das capturas delimitadas são descartados ao abrir
+_PLAN_FORMAT = 2
+
+PHRASING_PROMPT = """Responda à pergunta do usuário em português, de forma direta, usando
+apenas o resultado da consulta SQL abaixo.
+
+Pergunta: {question}
+Consulta: {sql}
+Resultado: {result}
+"""
+
+
+@dataclass
+class Plan:
+    """Trajetória parametrizada de uma pergunta já respondida pelo agente"""
+
+    pattern: str
+    sql: str
+    params: List[Dict[str, str]] = field(default_factory=list)
+    tools: List[str] = field(default_factory=list)
+    example: str = ""
+    hits: int = 0
+
+    def bind(self, question: str) -> Optional[Dict[str, Any]]:
+        """Valores dos parâmetros para `question`, ou None se ela não casar"""
+        match = re.fullmatch(self.pattern, _clean(question), re.IGNORECASE)
+        if match is None:
+            return None
+        values: Dict[str, Any] = {}
+        for spec in self.params:
+            value = match.group(spec["name"])
+            if spec.get("numeric"):
+                values[spec["name"]] = float(value) if "." in value else int(value)
+            else:
+                values[spec["name"]] = f"{spec['prefix']}{value}{spec['suffix']}"
+        return values
+
+
+def _clean(question: str) -> str:
+    return re.sub(r"\s+", " ", question).strip().rstrip("?!. ")
+
+
+def _final_query(steps: List[Any]) -> Tuple[Optional[str], List[str]]:
+    """SQL da última chamada a sql_db_query e a sequência de ferramentas"""
+    tools, sql = [], None
+    for action, _ in steps:
+        tools.append(action.tool)
+        if action.tool == "sql_db_query":
+            tool_input = action.tool_input
+            sql = tool_input.get("query") if isinstance(tool_input, dict) else str(tool_input)
+    return sql, tools
+
+
+def parameterize(question: str, sql: str) -> Optional[Plan]:
+    """Troca os literais do SQL que aparecem na pergunta por parâmetros"""
+    if not _READ_ONLY.match(sql) or ";" in sql.strip().rstrip(";"):
+        return None
+
+    cleaned = _clean(question)
+    template = sql
+    spans: List[Tuple[int, int, str]] = []
+    params: List[Dict[str, str]] = []
+
+    literals = [(m.group(0), m.group(1).replace("''", "'"), False) for m in _STRING_LITERAL.finditer(sql)]
+    literals += [(m.group(0), m.group(0), True) for m in _NUMBER_LITERAL.finditer(_STRING_LITERAL.sub("''", sql))]
+    for raw, value, numeric in literals:
+        core = value.strip("%")
+        found = core and next(
+            (
+                m for m in re.finditer(rf"(?<!\w){re.escape(core)}(?!\w)", cleaned, re.IGNORECASE)
+                if all(m.end() <= a or m.start() >= b for a, b, _ in spans)
+            ),
+            None,
+        )
+        if not found:
+            continue
+        name = f"p{len(params)}"
+        if numeric:
+            capture = rf"(?P<{name}>\d+(?:\.\d+)?)"
+        elif found.start() > 0 and found.end() < len(cleaned) and cleaned[found.start() - 1] in _QUOTES:
+            # Entre aspas: a captura vai até a aspa que fecha
+            capture = rf"(?P<{name}>[^{re.escape(_QUOTES)}]+)"
+        else:
+            # Mesmo número de palavras do literal: nada de engolir o resto da pergunta
+            capture = rf"(?P<{name}>\S+(?: \S+){{{len(found.group(0).split()) - 1}}})"
+        spans.append((found.start(), found.end(), capture))
+        if numeric:
+            template = re.sub(rf"(?<![\w.:]){re.escape(raw)}(?![\w.])", f":{name}", template, count=1)
+        else:
+            # A pergunta pode vir com outra grafia ("queen" para 'Queen')
+            template = template.replace(raw, f":{name} COLLATE NOCASE", 1)
+        prefix = value[: len(value) - len(value.lstrip("%"))]
+        suffix = value[len(value.rstrip("%")):]
+        params.append({"name": name, "prefix": prefix, "suffix": suffix, "numeric": numeric})
+
+    pattern, position = "", 0
+    for begin, finish, capture in sorted(spans):
+        pattern += re.escape(cleaned[position:begin]) + capture
+        position = finish
+    pattern += re.escape(cleaned[position:])
+    return Plan(pattern=pattern, sql=template, params=params, example=question)
+
+
+class TrajectoryStore:
+    """Planos conhecidos, persistidos em SQLite"""
+
+    def __init__(self, path: str = ":memory:"):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS plans (
+                pattern TEXT PRIMARY KEY,
+                sql TEXT NOT NULL,
+                params TEXT NOT NULL,
+                tools TEXT NOT NULL,
+                example TEXT NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0,
+                created REAL NOT NULL
+            )
+            """
+        )
+        if self._db.execute("PRAGMA user_version").fetchone()[0] < _PLAN_FORMAT:
+            self._db.execute("DELETE FROM plans")
+            self._db.execute(f"PRAGMA user_version = {_PLAN_FORMAT}")
+        self._db.commit()
+
+    @classmethod
+    def from_env(cls, default_path: str) -> Optional["TrajectoryStore"]:
+        """Cria o repositório de planos (TRAJECTORY_REPLAY=0 desativa)"""
+        if os.getenv("TRAJECTORY_REPLAY", "1") == "0":
+            return None
+        return cls(os.getenv("TRAJECTORY_FILE", default_path))
+
+    def record(self, question: str, steps: List[Any]) -> Optional[Plan]:
+        """Guarda a trajetória de uma execução bem-sucedida do agente"""
+        sql, tools = _final_query(steps)
+        plan = parameterize(question, sql) if sql else None
+        if plan is None:
+            return None
+        plan.tools = tools
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO plans VALUES (?, ?, ?, ?, ?, 0, ?)",
+                (plan.pattern, plan.sql, json.dumps(plan.params), json.dumps(tools), question, time.time()),
+            )
+            self._db.commit()
+        return plan
+
+    def match(self, question: str) -> Optional[Tuple[Plan, Dict[str, Any]]]:
+        """Plano que casa com a pergunta (o mais usado primeiro) e seus parâmetros"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT pattern, sql, params, tools, example, hits FROM plans ORDER BY hits DESC"
+            ).fetchall()
+        for pattern, sql, params, tools, example, hits in rows:
+            plan = Plan(pattern, sql, json.loads(params), json.loads(tools), example, hits)
+            values = plan.bind(question)
+            if values is not None:
+                return plan, values
+        return None
+
+    def forget(self, plan: Plan) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM plans WHERE pattern = ?", (plan.pattern,))
+            self._db.commit()
+
+    def replay(self, question: str, plan: Plan, values: Dict[str, Any], db, llm, config: Optional[dict] = None) -> str:
+        """Executa o plano: uma consulta SQL e uma chamada ao LLM para redigir"""
+        try:
+            result = db.run(plan.sql, parameters=values)
+        except Exception:
+            # O esquema mudou ou o plano era ruim: volta para o agente completo
+            self.forget(plan)
+            raise
+        if not result or result == "[]":
+            # Nada encontrado com esses valores: o plano pode não servir para a
+            # pergunta (outra grafia, outra tabela), então o agente completo decide
+            self.forget(plan)
+            raise LookupError("a consulta do plano não retornou linhas")
+        with self._lock:
+            self._db.execute("UPDATE plans SET hits = hits + 1 WHERE pattern = ?", (plan.pattern,))
+            self._db.commit()
+        prompt = PHRASING_PROMPT.format(question=question, sql=plan.sql, result=result)
+        return llm.invoke(prompt, config=config).content
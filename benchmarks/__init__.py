@@ -0,0 +1 @@
+"""Benchmarks reprodutíveis da stack MCP (veja benchmarks/run.py)"""
@@ -0,0 +1,59 @@
+"""
+Compara dois resultados de benchmark (ex.: antes e depois de um commit)
+
+    python -m benchmarks.compare benchmarks/results/stdio-abc123.json \\
+                                 benchmarks/results/stdio-def456.json
+
+Sai com código 1 se alguma métrica piorar além da tolerância (padrão 10%).
+"""
+
+import argparse
+import json
+import sys
+
+# Métrica -> True quando "maior é melhor"
+METRICS = {
+    "throughput_rps": True,
+    "p50_ms": False,
+    "p95_ms": False,
+    "p99_ms": False,
+    "p999_ms": False,
+    "errors": False,
+}
+
+
+def compare(baseline: dict, candidate: dict, tolerance: float) -> bool:
+    """Imprime a tabela de diferenças e devolve False se houver regressão"""
+    ok = True
+    print(f"{'métrica':<16}{'base':>12}{'novo':>12}{'variação':>11}")
+    for metric, higher_is_better in METRICS.items():
+        old = baseline["summary"].get(metric, 0.0)
+        new = candidate["summary"].get(metric, 0.0)
+        change = (new - old) / old if old else (0.0 if new == old else float("inf"))
+        worse = change < -tolerance if higher_is_better else change > tolerance
+        flag = "  ❌" if worse else ""
+        ok = ok and not worse
+        print(f"{metric:<16}{old:>12.2f}{new:>12.2f}{change:>10.1%}{flag}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara dois resultados de benchmark")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Piora aceitável (0.10 = 10%%)")
+    args = parser.parse_args()
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.candidate, encoding="utf-8") as f:
+        candidate = json.load(f)
+
+    if baseline.get("params") != candidate.get("params"):
+        print("⚠️  Parâmetros diferentes entre as execuções; a comparação pode não ser justa")
+    print(f"Base: {baseline['target']}@{baseline['commit']}  Novo: {candidate['target']}@{candidate['commit']}")
+    sys.exit(0 if compare(baseline, candidate, args.tolerance) else 1)
+
+
+if __name__ == "__main__":
+    main()
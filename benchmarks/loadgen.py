@@ -0,0 +1,111 @@
+"""
+Gerador de carga em malha aberta (open-loop)
+
+As requisições são disparadas em instantes pré-calculados (taxa fixa ou
+chegadas de Poisson com semente fixa), independentemente de as anteriores já
+terem terminado. A latência é medida a partir do instante *planejado* de
+envio, então a espera por uma vaga de concorrência entra na medição e o
+resultado não sofre de "coordinated omission".
+"""
+
+import asyncio
+import math
+import random
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Awaitable, Callable, Dict, List
+
+PERCENTILES = {"p50": 0.50, "p95": 0.95, "p99": 0.99, "p999": 0.999}
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Percentil pelo método nearest-rank"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, min(len(sorted_values), math.ceil(q * len(sorted_values))))
+    return sorted_values[rank - 1]
+
+
+@dataclass
+class LoadResult:
+    """Latências e contadores de uma rodada de carga"""
+
+    target_rps: float
+    duration: float
+    concurrency: int
+    latencies: List[float] = field(default_factory=list)
+    errors: int = 0
+    error_samples: List[str] = field(default_factory=list)
+    elapsed: float = 0.0
+
+    def summary(self) -> Dict[str, float]:
+        values = sorted(self.latencies)
+        completed = len(values)
+        summary = {
+            "requests": completed + self.errors,
+            "completed": completed,
+            "errors": self.errors,
+            "elapsed_s": self.elapsed,
+            "throughput_rps": completed / self.elapsed if self.elapsed else 0.0,
+            "mean_ms": (sum(values) / completed * 1000) if completed else 0.0,
+            "max_ms": (values[-1] * 1000) if values else 0.0,
+        }
+        for name, q in PERCENTILES.items():
+            summary[f"{name}_ms"] = percentile(values, q) * 1000
+        return summary
+
+    def to_dict(self) -> Dict[str, object]:
+        data = asdict(self)
+        data.pop("latencies")
+        data["summary"] = self.summary()
+        return data
+
+
+def arrival_times(rps: float, duration: float, poisson: bool, seed: int) -> List[float]:
+    """Instantes de envio (em segundos a partir do início)"""
+    times = []
+    rng = random.Random(seed)
+    t = 0.0
+    while t < duration:
+        times.append(t)
+        t += rng.expovariate(rps) if poisson else 1.0 / rps
+    return times
+
+
+async def run_open_loop(
+    call: Callable[[], Awaitable[object]],
+    rps: float,
+    duration: float,
+    concurrency: int,
+    warmup: float = 0.0,
+    poisson: bool = False,
+    seed: int = 42,
+) -> LoadResult:
+    """Executa `call` na taxa pedida e devolve as latências observadas"""
+    if warmup > 0:
+        await run_open_loop(call, rps, warmup, concurrency, poisson=poisson, seed=seed + 1)
+
+    result = LoadResult(target_rps=rps, duration=duration, concurrency=concurrency)
+    slots = asyncio.Semaphore(concurrency)
+
+    async def one(intended: float):
+        async with slots:
+            try:
+                await call()
+            except Exception as exc:
+                result.errors += 1
+                if len(result.error_samples) < 5:
+                    result.error_samples.append(f"{type(exc).__name__}: {exc}")
+                return
+        result.latencies.append(time.perf_counter() - intended)
+
+    start = time.perf_counter()
+    tasks = []
+    for offset in arrival_times(rps, duration, poisson, seed):
+        delay = start + offset - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(one(start + offset)))
+    await asyncio.gather(*tasks)
+    result.elapsed = time.perf_counter() - start
+    return result
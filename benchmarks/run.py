@@ -0,0 +1,114 @@
+"""
+Executa um benchmark e salva o resultado em JSON
+
+Exemplos (a partir da raiz do repositório):
+
+    python -m benchmarks.run --target stdio --rps 200 --duration 10
+    python -m benchmarks.run --target gateway --spawn --rps 20 --concurrency 8
+    python -m benchmarks.run --target agent --rps 50 --duration 5
+
+O arquivo fica em benchmarks/results/<alvo>-<commit>.json e pode ser
+comparado com outro resultado via `python -m benchmarks.compare`.
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+from benchmarks.loadgen import run_open_loop
+from benchmarks.targets import ROOT, TARGETS
+
+RESULTS_DIR = ROOT / "benchmarks" / "results"
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def run_benchmark(args) -> dict:
+    target = TARGETS[args.target]
+    options = {"spawn": args.spawn}
+    if args.url:
+        options["url"] = args.url
+    async with target(**options) as call:
+        result = await run_open_loop(
+            call,
+            rps=args.rps,
+            duration=args.duration,
+            concurrency=args.concurrency,
+            warmup=args.warmup,
+            poisson=args.poisson,
+            seed=args.seed,
+        )
+    return {
+        "target": args.target,
+        "commit": git_revision(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "params": {
+            "rps": args.rps,
+            "duration": args.duration,
+            "concurrency": args.concurrency,
+            "warmup": args.warmup,
+            "poisson": args.poisson,
+            "seed": args.seed,
+        },
+        **result.to_dict(),
+    }
+
+
+def print_summary(report: dict) -> None:
+    s = report["summary"]
+    print(f"🎯 Alvo: {report['target']} (commit {report['commit']})")
+    print(
+        f"   Requisições: {s['requests']} | erros: {s['errors']} | "
+        f"vazão: {s['throughput_rps']:.1f} req/s"
+    )
+    print(
+        f"   Latência (ms): p50 {s['p50_ms']:.2f} | p95 {s['p95_ms']:.2f} | "
+        f"p99 {s['p99_ms']:.2f} | p999 {s['p999_ms']:.2f} | max {s['max_ms']:.2f}"
+    )
+    for sample in report.get("error_samples", []):
+        print(f"   ❌ {sample}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark em malha aberta da stack MCP")
+    parser.add_argument("--target", choices=sorted(TARGETS), required=True)
+    parser.add_argument("--rps", type=float, default=20.0, help="Taxa de chegada (req/s)")
+    parser.add_argument("--duration", type=float, default=10.0, help="Duração da medição (s)")
+    parser.add_argument("--concurrency", type=int, default=16, help="Máximo de requisições em voo")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Aquecimento antes de medir (s)")
+    parser.add_argument("--poisson", action="store_true", help="Chegadas de Poisson em vez de taxa fixa")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--url", help="URL do alvo (gateway e http-mcp)")
+    parser.add_argument("--spawn", action="store_true", help="Sobe o servidor do alvo automaticamente")
+    parser.add_argument("--out", type=Path, help="Arquivo JSON de saída")
+    args = parser.parse_args()
+
+    report = asyncio.run(run_benchmark(args))
+    print_summary(report)
+
+    out = args.out or RESULTS_DIR / f"{args.target}-{report['commit']}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"💾 Resultado salvo em {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Orçamento de tempo de partida
+
+Mede, em processos novos (melhor de `--repeat` execuções):
+
+- o custo de importação (`python -X importtime`) dos pontos de entrada;
+- o tempo do spawn até a resposta do `initialize` do servidor stdio, com o
+  servidor mínimo (`infra/lite_server.py`) e com o FastMCP.
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --budget math_server.initialize=300 --json
+
+Sai com código 1 se alguma medição passar do orçamento (em ms). Medições
+sem orçamento (ex.: FastMCP) aparecem só como referência.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+from benchmarks.targets import ROOT
+
+# nome -> (diretório, módulo importado, variáveis de ambiente)
+IMPORTS: Dict[str, Tuple[str, str, Dict[str, str]]] = {
+    "math_server.import": ("estudos", "math_server", {"MCP_SERVER_IMPL": "lite"}),
+    "math_server.import[fastmcp]": ("estudos", "math_server", {"MCP_SERVER_IMPL": "fastmcp"}),
+    "smart_llm_client.import": ("estudos", "smart_llm_client", {}),
+    "demo_integration.import": ("youtube", "demo_integration", {}),
+}
+
+# nome -> variáveis de ambiente do servidor stdio
+SPAWNS: Dict[str, Dict[str, str]] = {
+    "math_server.initialize": {"MCP_SERVER_IMPL": "lite"},
+    "math_server.initialize[fastmcp]": {"MCP_SERVER_IMPL": "fastmcp"},
+}
+
+# Orçamentos padrão em ms (folga para máquinas lentas de CI)
+BUDGETS: Dict[str, float] = {
+    "math_server.import": 150.0,
+    "math_server.initialize": 400.0,
+    "smart_llm_client.import": 600.0,
+    "demo_integration.import": 600.0,
+}
+
+INITIALIZE = {
+    "jsonrpc": "2.0",
+    "id": 1,
+    "method": "initialize",
+    "params": {
+        "protocolVersion": "2025-06-18",
+        "capabilities": {},
+        "clientInfo": {"name": "startup-benchmark", "version": "1.0"},
+    },
+}
+
+
+def _env(extra: Dict[str, str]) -> Dict[str, str]:
+    return {**os.environ, **extra}
+
+
+def import_time_ms(directory: str, module: str, env: Dict[str, str]) -> float:
+    """Tempo cumulativo de importação do módulo, segundo `-X importtime`"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT / directory,
+        env=_env(env),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    for line in result.stderr.splitlines():
+        # "import time:  self [us] | cumulative | nome" (módulos de topo sem recuo)
+        parts = line.split("|")
+        if len(parts) == 3 and parts[2].rstrip() == f" {module}":
+            return int(parts[1]) / 1000
+    raise RuntimeError(f"{module} não aparece na saída de -X importtime")
+
+
+def initialize_ms(env: Dict[str, str]) -> float:
+    """Tempo do spawn do math_server até a resposta do `initialize`"""
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "math_server.py"],
+        cwd=ROOT / "estudos",
+        env=_env(env),
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    try:
+        process.stdin.write(json.dumps(INITIALIZE) + "\n")
+        process.stdin.flush()
+        response = json.loads(process.stdout.readline())
+        elapsed = (time.perf_counter() - start) * 1000
+        if "result" not in response:
+            raise RuntimeError(f"initialize falhou: {response}")
+        return elapsed
+    finally:
+        process.stdin.close()
+        process.wait(timeout=10)
+
+
+def measure(repeat: int, only: Optional[List[str]] = None) -> Dict[str, float]:
+    results: Dict[str, float] = {}
+    for name, (directory, module, env) in IMPORTS.items():
+        if not only or name in only:
+            results[name] = min(import_time_ms(directory, module, env) for _ in range(repeat))
+    for name, env in SPAWNS.items():
+        if not only or name in only:
+            results[name] = min(initialize_ms(env) for _ in range(repeat))
+    return results
+
+
+def check(results: Dict[str, float], budgets: Dict[str, float]) -> bool:
+    """Imprime a tabela e devolve False se algum orçamento foi estourado"""
+    ok = True
+    print(f"{'medição':<34}{'ms':>10}{'orçamento':>12}")
+    for name, value in results.items():
+        budget = budgets.get(name)
+        over = budget is not None and value > budget
+        ok = ok and not over
+        flag = "  ❌" if over else ""
+        limit = f"{budget:.0f}" if budget is not None else "-"
+        print(f"{name:<34}{value:>10.1f}{limit:>12}{flag}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mede o tempo de partida dos pontos de entrada")
+    parser.add_argument("--repeat", type=int, default=3, help="Execuções por medição (vale a melhor)")
+    parser.add_argument("--only", action="append", help="Mede só estas medições (pode repetir)")
+    parser.add_argument("--budget", action="append", default=[], help="Orçamento extra: nome=ms")
+    parser.add_argument("--json", action="store_true", help="Imprime também o resultado em JSON")
+    args = parser.parse_args()
+
+    budgets = dict(BUDGETS)
+    for item in args.budget:
+        name, _, value = item.partition("=")
+        budgets[name] = float(value)
+
+    results = measure(args.repeat, args.only)
+    ok = check(results, budgets)
+    if args.json:
+        print(json.dumps({"results": results, "budgets": budgets}, indent=2))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+Alvos de benchmark
+
+Cada alvo é um context manager assíncrono que prepara a conexão (e, se
+pedido, sobe o servidor) e devolve uma função `call()` que executa uma
+requisição completa.
+"""
+
+import asyncio
+import os
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import AsyncIterator, Awaitable, Callable, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+
+Call = Callable[[], Awaitable[object]]
+
+# Pergunta usada no modo agente (o modelo roteirizado extrai os números dela)
+AGENT_QUESTION = "Qual é a soma de 5 e 3?"
+
+
+def _wait_until_ready(url: str, process: subprocess.Popen, timeout: float = 60.0) -> None:
+    """Espera `GET /readyz` responder 200
+
+    A porta aceita conexões antes do fim do aquecimento (o gateway responde
+    503 até lá): medir a partir da porta aberta mediria o aquecimento.
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Servidor saiu antes de ficar pronto (código {process.returncode})")
+        try:
+            with urllib.request.urlopen(url, timeout=0.5) as response:
+                if response.status == 200:
+                    return
+        except (OSError, urllib.error.URLError):
+            pass
+        time.sleep(0.2)
+    raise TimeoutError(f"Servidor não ficou pronto em {url}")
+
+
+@asynccontextmanager
+async def _spawned(args, cwd: Path, port: int, spawn: bool):
+    """Sobe o servidor em um subprocesso quando `spawn` é verdadeiro"""
+    process: Optional[subprocess.Popen] = None
+    if spawn:
+        process = subprocess.Popen(
+            [sys.executable, *args],
+            cwd=cwd,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+    try:
+        if process is not None:
+            await asyncio.to_thread(_wait_until_ready, f"http://127.0.0.1:{port}/readyz", process)
+        yield
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=10)
+
+
+@asynccontextmanager
+async def gateway_target(url: str = "http://127.0.0.1:8000", spawn: bool = False) -> AsyncIterator[Call]:
+    """Gateway FastAPI (youtube/http_server.py): POST /add"""
+    import httpx
+
+    # O gateway procura math_server.py no diretório corrente
+    server = [str(ROOT / "youtube" / "http_server.py")]
+    async with _spawned(server, ROOT / "estudos", 8000, spawn):
+        async with httpx.AsyncClient(base_url=url, timeout=60) as client:
+
+            async def call():
+                response = await client.post("/add", json={"a": 5, "b": 3})
+                response.raise_for_status()
+                return response.json()
+
+            yield call
+
+
+@asynccontextmanager
+async def http_mcp_target(url: str = "http://127.0.0.1:8001/mcp", spawn: bool = False) -> AsyncIterator[Call]:
+    """Servidor MCP streamable-HTTP (MCP_didatico/mcp_http_server.py): tools/call add"""
+    from mcp import ClientSession
+    from mcp.client.streamable_http import streamablehttp_client
+
+    server = [str(ROOT / "MCP_didatico" / "mcp_http_server.py")]
+    async with _spawned(server, ROOT / "MCP_didatico", 8001, spawn):
+        async with streamablehttp_client(url) as (read, write, _):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+
+                async def call():
+                    return await session.call_tool("add", {"a": 5, "b": 3})
+
+                yield call
+
+
+@asynccontextmanager
+async def _stdio_session():
+    from mcp import ClientSession, StdioServerParameters
+
+    from infra.stdio_transport import pipelined_stdio_client
+
+    params = StdioServerParameters(
+        command=sys.executable,
+        args=[str(ROOT / "estudos" / "math_server.py")],
+        cwd=str(ROOT / "estudos"),
+    )
+    async with pipelined_stdio_client(params) as (read, write):
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+            yield session
+
+
+@asynccontextmanager
+async def stdio_target(**_) -> AsyncIterator[Call]:
+    """Servidor stdio (estudos/math_server.py) com uma sessão de longa duração"""
+    async with _stdio_session() as session:
+
+        async def call():
+            return await session.call_tool("add", {"a": 5, "b": 3})
+
+        yield call
+
+
+@asynccontextmanager
+async def agent_target(**_) -> AsyncIterator[Call]:
+    """Loop do agente (LangGraph + ferramentas MCP stdio) com LLM roteirizado, sem rede
+
+    Latência e vazão do modelo seguem LLM_STUB_LATENCY_MS e
+    LLM_STUB_TOKENS_PER_SEC; LLM_BACKEND=replay reproduz respostas gravadas.
+    """
+    from langchain_mcp_adapters.tools import load_mcp_tools
+    from langgraph.prebuilt import create_react_agent
+
+    from infra.llm import create_chat_model, llm_backend
+
+    backend = llm_backend() if llm_backend() != "azure" else "scripted"
+    async with _stdio_session() as session:
+        tools = await load_mcp_tools(session)
+        agent = create_react_agent(create_chat_model(backend), tools)
+
+        async def call():
+            response = await agent.ainvoke({"messages": [AGENT_QUESTION]})
+            return response["messages"][-1].content
+
+        yield call
+
+
+TARGETS = {
+    "gateway": gateway_target,
+    "http-mcp": http_mcp_target,
+    "stdio": stdio_target,
+    "agent": agent_target,
+}
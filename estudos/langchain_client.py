@@ -1,30 +1,27 @@
+import argparse
 import asyncio
 import requests
-from langchain_openai import AzureChatOpenAI
-from pydantic import SecretStr
 from langchain_core.tools import tool
 from langgraph.prebuilt import create_react_agent
 import os
+import sys
 from dotenv import load_dotenv
 
-load_dotenv()
+# Permite importar o pacote infra/ da raiz do repositório
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from infra.agent_callbacks import TurnTimingCallback
+from infra.batch_eval import evaluate_file
+from infra.checkpointer import SQLiteCheckpointer, session_id
+from infra.llm import create_chat_model
 
-# Configuração do Azure OpenAI
-azure_endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
-azure_api_key = os.getenv("AZURE_OPENAI_API_KEY")
-azure_deployment = os.getenv("AZURE_OPENAI_CHAT_DEPLOYMENT_NAME") or os.getenv("AZURE_MODEL_NAME")
-azure_api_version = os.getenv("OPENAI_API_VERSION")
+load_dotenv()
 
 # URL do servidor HTTP
 SERVER_URL = "http://localhost:8000"
 
-# Configuração do modelo LLM
-model = AzureChatOpenAI(
-    azure_endpoint=azure_endpoint,
-    azure_deployment=azure_deployment,
-    api_key=SecretStr(azure_api_key) if azure_api_key else None,
-    api_version=azure_api_version,
-)
+# Configuração do modelo LLM (LLM_BACKEND=azure|scripted|replay)
+model = create_chat_model()
 
 def call_math_server(endpoint: str, **params):
     """Chama o servidor de matemática via HTTP"""
@@ -86,18 +83,30 @@ def list_available_tools() -> str:
     except Exception as e:
         return f"Erro na conexão: {e}"
 
-def create_agent():
+# Mede o tempo de cada pergunta: LLM vs. ferramentas vs. overhead
+turn_timing = TurnTimingCallback("langchain_client")
+
+# Conversa persistida em disco (CHECKPOINT=0 desativa); AGENT_SESSION=<id> retoma
+checkpointer = SQLiteCheckpointer.from_env(".checkpoints.sqlite")
+thread = {"configurable": {"thread_id": session_id()}}
+
+def create_agent(checkpointer=checkpointer):
     """Cria o agente LangChain com as ferramentas do servidor HTTP"""
     tools = [add_numbers, subtract_numbers, list_available_tools]
-    return create_react_agent(model, tools)
+    return create_react_agent(model, tools, checkpointer=checkpointer)
 
 async def get_agent_response(agent, message: str):
     """Obtém resposta do agente para uma mensagem"""
+    turn_timing.start_turn()
     try:
-        response = await agent.ainvoke({"messages": [message]})
+        response = await agent.ainvoke(
+            {"messages": [message]}, config={**thread, "callbacks": [turn_timing]}
+        )
         return response["messages"][-1].content
     except Exception as e:
         return f"Erro no agente: {e}"
+    finally:
+        turn_timing.finish_turn()
 
 async def test_server_connection():
     """Testa a conexão com o servidor HTTP"""
@@ -131,6 +140,8 @@ async def main():
     # Cria o agente
     print("\n🤖 Criando agente LangChain...")
     agent = create_agent()
+    if checkpointer:
+        print(f"💾 Sessão {thread['configurable']['thread_id']} (AGENT_SESSION=<id> para continuar)")
     
     # Testa algumas consultas
     test_queries = [
@@ -148,9 +159,30 @@ async def main():
         
         response = await get_agent_response(agent, query)
         print(response)
+        print(f"   {turn_timing.last.format()}")
     
     print("\n✅ Teste concluído!")
 
+async def run_batch_file(path: str, output: str = None, concurrency: int = None):
+    """Avalia um arquivo de perguntas em paralelo, cada uma em uma conversa nova"""
+    # Sem checkpointer: perguntas independentes não dividem a mesma thread
+    agent = create_agent(checkpointer=None)
+
+    async def answer(question: str, callbacks) -> str:
+        response = await agent.ainvoke({"messages": [question]}, config={"callbacks": callbacks})
+        return response["messages"][-1].content
+
+    await evaluate_file(answer, path, output, concurrency, agent="langchain_client")
+
 if __name__ == "__main__":
-    # Executa a função principal
-    asyncio.run(main())
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Cliente LangChain + servidor HTTP de matemática")
+    parser.add_argument("--batch", help="Arquivo de perguntas (uma por linha ou JSONL) para avaliar em lote")
+    parser.add_argument("--output", help="JSONL de resultados e retomada (padrão: <arquivo>.results.jsonl)")
+    parser.add_argument("--concurrency", type=int, help="Perguntas em paralelo (padrão: BATCH_CONCURRENCY ou 8)")
+    args = parser.parse_args()
+
+    if args.batch:
+        asyncio.run(run_batch_file(args.batch, args.output, args.concurrency))
+    else:
+        # Executa a função principal
+        asyncio.run(main())
\ No newline at end of file
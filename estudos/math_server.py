@@ -1,14 +1,43 @@
-from mcp.server.fastmcp import FastMCP
+import os
+import sys
 
-mcp = FastMCP("Math")
+# Permite importar o pacote infra/ da raiz do repositório
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from infra.instrumentation import instrument_tool
+from infra.metrics import REGISTRY, ToolMetrics, start_textfile_exporter
+from infra.tracing import get_tracer
+
+# Cada sessão stdio é um processo novo: por padrão usa o servidor mínimo da
+# infra (sobe em ~0,1 s); MCP_SERVER_IMPL=fastmcp volta ao SDK oficial
+if os.getenv("MCP_SERVER_IMPL", "lite") == "fastmcp":
+    from mcp.server.fastmcp import FastMCP
+
+    mcp = FastMCP("Math")
+else:
+    from infra.lite_server import LiteMCPServer
+
+    # Resultados acima de MCP_BINARY_MIN_BYTES vão em binário para quem pedir
+    mcp = LiteMCPServer("Math", binary_min_bytes=int(os.getenv("MCP_BINARY_MIN_BYTES", "4096")))
+
+# Servidor stdio não tem HTTP: as métricas vão para um arquivo no formato
+# do coletor textfile do Prometheus quando MCP_METRICS_FILE estiver definido
+tool_metrics = ToolMetrics(REGISTRY, "mcp_server")
+
+# Spans por ferramenta, filhos do trace recebido no _meta da requisição
+tracer = get_tracer("mcp-math-server")
 
 @mcp.tool()
+@instrument_tool(tool_metrics, tracer)
 def add(a: int, b: int) -> int:
     return a + b
 
 @mcp.tool()
+@instrument_tool(tool_metrics, tracer)
 def subtract(a: int, b: int) -> int:
     return a - b
 
 if __name__ == "__main__":
+    if os.getenv("MCP_METRICS_FILE"):
+        start_textfile_exporter(os.environ["MCP_METRICS_FILE"])
     mcp.run(transport="stdio", mount_path="/math")
@@ -1,32 +1,23 @@
 import requests
 import json
-from langchain_openai import AzureChatOpenAI
-from pydantic import SecretStr
-from langchain_core.tools import tool
-from langgraph.prebuilt import create_react_agent
 import os
+import sys
 from dotenv import load_dotenv
+
+# Permite importar o pacote infra/ da raiz do repositório
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from infra.agent_callbacks import TurnTimingCallback
+from infra.llm import create_chat_model
+from infra.memory import OUTPUT_TOOL, ConversationMemory
+from infra.tool_selection import ToolSelector
 from typing import Dict, Any, List
 
 load_dotenv()
 
-# Configuração do Azure OpenAI
-azure_endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
-azure_api_key = os.getenv("AZURE_OPENAI_API_KEY")
-azure_deployment = os.getenv("AZURE_OPENAI_CHAT_DEPLOYMENT_NAME") or os.getenv("AZURE_MODEL_NAME")
-azure_api_version = os.getenv("OPENAI_API_VERSION")
-
 # URL base do servidor HTTP
 BASE_URL = "http://localhost:8000"
 
-# Configuração do modelo LLM
-model = AzureChatOpenAI(
-    azure_endpoint=azure_endpoint,
-    azure_deployment=azure_deployment,
-    api_key=SecretStr(azure_api_key) if azure_api_key else None,
-    api_version=azure_api_version,
-)
-
 class DynamicHTTPClient:
     """Cliente que descobre automaticamente as ferramentas do servidor HTTP"""
     
@@ -93,6 +84,9 @@ http_client = DynamicHTTPClient(BASE_URL)
 
 def create_dynamic_tools() -> List:
     """Cria ferramentas LangChain baseadas nas ferramentas descobertas"""
+    # Import adiado: só o chat precisa do LangChain (test_discovery não)
+    from langchain_core.tools import tool
+
     tools = []
     
     # Ferramenta genérica que descobre e lista ferramentas
@@ -172,13 +166,22 @@ def check_server_connection() -> bool:
         print(f"❌ Erro inesperado: {e}")
         return False
 
-def chat_with_agent(message: str, agent) -> str:
-    """Conversa com o agente LLM"""
+# Mede o tempo de cada pergunta: LLM vs. ferramentas vs. overhead
+turn_timing = TurnTimingCallback("smart_llm_client")
+
+def chat_with_agent(message: str, agent, memory: ConversationMemory = None) -> str:
+    """Conversa com o agente LLM (com `memory`, o histórico compactado vai junto)"""
+    turn_timing.start_turn()
     try:
-        response = agent.invoke({"messages": [message]})
+        messages = memory.context(message) if memory else [message]
+        response = agent.invoke({"messages": messages}, config={"callbacks": [turn_timing]})
+        if memory:
+            memory.add_turn(response["messages"][len(messages) - 1:])
         return response["messages"][-1].content
     except Exception as e:
         return f"Erro no agente: {e}"
+    finally:
+        turn_timing.finish_turn()
 
 def interactive_chat():
     """Interface interativa para conversar com o agente"""
@@ -191,9 +194,21 @@ def interactive_chat():
     print("- 'Liste as ferramentas do servidor'")
     print("\nDigite 'sair' para encerrar.\n")
     
-    # Cria o agente com ferramentas dinâmicas
-    tools = create_dynamic_tools()
-    agent = create_react_agent(model, tools)
+    from langgraph.prebuilt import create_react_agent
+
+    # Configuração do modelo LLM (LLM_BACKEND=azure|scripted|replay)
+    model = create_chat_model()
+
+    # Cria o agente com ferramentas dinâmicas; com a seleção (TOOL_SELECTION=1
+    # liga), cada chamada ao LLM leva só as relevantes e a de descoberta
+    # (resolve_output devolve as saídas grandes que a memória tirou do contexto)
+    memory = ConversationMemory.from_env(model)
+    tools = create_dynamic_tools() + [memory.resolve_tool()]
+    selector = ToolSelector.from_env(tools, always=("list_server_tools", OUTPUT_TOOL))
+    if selector:
+        agent = create_react_agent(selector.bind(model), selector.tools)
+    else:
+        agent = create_react_agent(model, tools)
     
     while True:
         user_input = input("Você: ").strip()
@@ -206,8 +221,9 @@ def interactive_chat():
             continue
             
         print("\n🤖 Agente: Processando...")
-        response = chat_with_agent(user_input, agent)
-        print(f"🤖 Agente: {response}\n")
+        response = chat_with_agent(user_input, agent, memory)
+        print(f"🤖 Agente: {response}")
+        print(f"{turn_timing.last.format()}\n")
 
 def test_discovery():
     """Testa a descoberta automática de ferramentas"""
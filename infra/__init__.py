@@ -0,0 +1,6 @@
+"""
+Infraestrutura compartilhada pelos exemplos (servidores, gateway e agentes)
+
+Os scripts de cada pasta adicionam a raiz do repositório ao sys.path para
+poder importar este pacote, por exemplo: `from infra.metrics import REGISTRY`.
+"""
@@ -0,0 +1,281 @@
+"""
+Callbacks do LangChain para medir os turnos dos agentes
+
+`TurnTimingCallback` separa o tempo de cada turno (uma pergunta do usuário)
+em chamadas ao LLM, chamadas de ferramentas e o restante (overhead do grafo,
+serialização, etc.):
+
+    timing = TurnTimingCallback("sql_agent")
+    timing.start_turn()
+    agent.invoke(inputs, config={"callbacks": [timing]})
+    print(timing.finish_turn().format())
+
+Também soma os tokens de entrada informados pelo provedor e quantos deles
+vieram do cache de prompt (`input_token_details.cache_read`).
+
+`TracingCallback` transforma as execuções do LangChain/LangGraph (nós do
+grafo, chamadas ao LLM e ferramentas) em spans filhos do span corrente.
+"""
+
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from infra.metrics import REGISTRY, MetricsRegistry
+from infra.tracing import Span, Tracer, activate
+
+
+@dataclass
+class TurnStats:
+    """Resumo de tempo de um turno do agente"""
+
+    total: float
+    llm_seconds: float
+    tool_seconds: float
+    llm_calls: int
+    tool_calls: int
+    input_tokens: int = 0
+    cached_tokens: int = 0
+    output_tokens: int = 0
+
+    @property
+    def overhead(self) -> float:
+        return max(0.0, self.total - self.llm_seconds - self.tool_seconds)
+
+    @property
+    def cache_ratio(self) -> float:
+        """Fração dos tokens de entrada servida pelo cache de prompt do provedor"""
+        return self.cached_tokens / self.input_tokens if self.input_tokens else 0.0
+
+    def format(self) -> str:
+        text = (
+            f"⏱️  Turno: {self.total:.2f}s | "
+            f"LLM {self.llm_seconds:.2f}s ({self.llm_calls} chamadas) | "
+            f"ferramentas {self.tool_seconds:.2f}s ({self.tool_calls} chamadas) | "
+            f"overhead {self.overhead:.2f}s"
+        )
+        if self.input_tokens:
+            text += f" | entrada {self.input_tokens} tokens ({self.cache_ratio:.0%} do cache)"
+        return text
+
+
+class TurnTimingCallback(BaseCallbackHandler):
+    """Acumula o tempo gasto no LLM e nas ferramentas durante um turno"""
+
+    # Executa no mesmo fluxo do agente para que as medições fiquem ordenadas
+    run_inline = True
+
+    def __init__(self, agent: str, registry: MetricsRegistry = REGISTRY):
+        self.agent = agent
+        self._lock = threading.Lock()
+        self._starts: Dict[UUID, float] = {}
+        self._turn_start: Optional[float] = None
+        self.last: Optional[TurnStats] = None
+        self._reset()
+
+        self.turn_seconds = registry.histogram(
+            "agent_turn_seconds", "Duração total de cada turno do agente", ("agent",)
+        )
+        self.llm_seconds = registry.histogram(
+            "agent_llm_seconds", "Tempo em chamadas ao LLM por turno", ("agent",)
+        )
+        self.tool_seconds = registry.histogram(
+            "agent_tool_seconds", "Tempo em chamadas de ferramentas por turno", ("agent",)
+        )
+        self.calls = registry.counter(
+            "agent_calls_total", "Chamadas feitas pelos agentes", ("agent", "kind")
+        )
+        self.prompt_tokens = registry.counter(
+            "agent_prompt_tokens_total",
+            "Tokens de entrada enviados ao LLM (kind=cached: servidos pelo cache de prompt)",
+            ("agent", "kind"),
+        )
+
+    def _reset(self) -> None:
+        self._llm = 0.0
+        self._tool = 0.0
+        self._llm_calls = 0
+        self._tool_calls = 0
+        self._input_tokens = 0
+        self._cached_tokens = 0
+        self._output_tokens = 0
+
+    def _start(self, run_id: UUID) -> None:
+        with self._lock:
+            self._starts[run_id] = time.perf_counter()
+
+    def _stop(self, run_id: UUID) -> float:
+        with self._lock:
+            start = self._starts.pop(run_id, None)
+        return time.perf_counter() - start if start is not None else 0.0
+
+    def start_turn(self) -> None:
+        with self._lock:
+            self._reset()
+            self._turn_start = time.perf_counter()
+
+    def finish_turn(self) -> TurnStats:
+        with self._lock:
+            start = self._turn_start or time.perf_counter()
+            stats = TurnStats(
+                total=time.perf_counter() - start,
+                llm_seconds=self._llm,
+                tool_seconds=self._tool,
+                llm_calls=self._llm_calls,
+                tool_calls=self._tool_calls,
+                input_tokens=self._input_tokens,
+                cached_tokens=self._cached_tokens,
+                output_tokens=self._output_tokens,
+            )
+            self._turn_start = None
+        self.last = stats
+        self.turn_seconds.observe(stats.total, agent=self.agent)
+        self.llm_seconds.observe(stats.llm_seconds, agent=self.agent)
+        self.tool_seconds.observe(stats.tool_seconds, agent=self.agent)
+        self.calls.inc(stats.llm_calls, agent=self.agent, kind="llm")
+        self.calls.inc(stats.tool_calls, agent=self.agent, kind="tool")
+        self.prompt_tokens.inc(stats.input_tokens, agent=self.agent, kind="input")
+        self.prompt_tokens.inc(stats.cached_tokens, agent=self.agent, kind="cached")
+        return stats
+
+    # --- LLM ---
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, **kwargs: Any) -> None:
+        self._start(run_id)
+
+    def on_llm_start(self, serialized, prompts, *, run_id: UUID, **kwargs: Any) -> None:
+        self._start(run_id)
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs: Any) -> None:
+        elapsed = self._stop(run_id)
+        usage = {}
+        try:
+            usage = response.generations[0][0].message.usage_metadata or {}
+        except (AttributeError, IndexError):
+            pass
+        with self._lock:
+            self._llm += elapsed
+            self._llm_calls += 1
+            self._input_tokens += usage.get("input_tokens", 0)
+            self._cached_tokens += (usage.get("input_token_details") or {}).get("cache_read", 0) or 0
+            self._output_tokens += usage.get("output_tokens", 0)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self.on_llm_end(None, run_id=run_id)
+
+    # --- Ferramentas ---
+
+    def on_tool_start(self, serialized, input_str, *, run_id: UUID, **kwargs: Any) -> None:
+        self._start(run_id)
+
+    def on_tool_end(self, output, *, run_id: UUID, **kwargs: Any) -> None:
+        elapsed = self._stop(run_id)
+        with self._lock:
+            self._tool += elapsed
+            self._tool_calls += 1
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self.on_tool_end(None, run_id=run_id)
+
+
+class TracingCallback(BaseCallbackHandler):
+    """Emite spans para nós do grafo, chamadas ao LLM e ferramentas"""
+
+    run_inline = True
+
+    def __init__(self, tracer: Tracer):
+        self.tracer = tracer
+        self._lock = threading.Lock()
+        self._spans: Dict[UUID, Tuple[Span, Optional[Span]]] = {}
+
+    def _begin(
+        self,
+        run_id: UUID,
+        parent_run_id: Optional[UUID],
+        name: str,
+        category: str,
+        **attributes: Any,
+    ) -> None:
+        with self._lock:
+            parent = self._spans.get(parent_run_id) if parent_run_id else None
+        span = self.tracer.start_span(
+            name,
+            attributes={"category": category, **attributes},
+            parent=parent[0].context if parent else None,
+        )
+        # Ativa o span para que chamadas MCP feitas pela ferramenta o usem como pai
+        previous = activate(span)
+        with self._lock:
+            self._spans[run_id] = (span, previous)
+
+    def _finish(self, run_id: UUID, error: Optional[BaseException] = None, **attributes: Any) -> None:
+        with self._lock:
+            entry = self._spans.pop(run_id, None)
+        if entry is None:
+            return
+        span, previous = entry
+        for key, value in attributes.items():
+            span.set_attribute(key, value)
+        if error is not None:
+            span.record_exception(error)
+        span.end()
+        activate(previous)
+
+    @staticmethod
+    def _name(serialized: Optional[Dict[str, Any]], kwargs: Dict[str, Any], default: str) -> str:
+        return kwargs.get("name") or (serialized or {}).get("name") or default
+
+    # --- Nós do grafo / chains ---
+
+    def on_chain_start(self, serialized, inputs, *, run_id: UUID, parent_run_id=None, **kwargs: Any) -> None:
+        self._begin(run_id, parent_run_id, f"graph {self._name(serialized, kwargs, 'chain')}", "graph")
+
+    def on_chain_end(self, outputs, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish(run_id)
+
+    def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish(run_id, error)
+
+    # --- LLM ---
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, parent_run_id=None, **kwargs: Any) -> None:
+        name = self._name(serialized, kwargs, "chat_model")
+        self._begin(run_id, parent_run_id, f"llm {name}", "llm", **{"llm.messages": len(messages[0]) if messages else 0})
+
+    def on_llm_start(self, serialized, prompts, *, run_id: UUID, parent_run_id=None, **kwargs: Any) -> None:
+        self._begin(run_id, parent_run_id, f"llm {self._name(serialized, kwargs, 'llm')}", "llm")
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs: Any) -> None:
+        usage = {}
+        try:
+            message = response.generations[0][0].message
+            usage = getattr(message, "usage_metadata", None) or {}
+        except (AttributeError, IndexError):
+            pass
+        self._finish(
+            run_id,
+            **{
+                "llm.input_tokens": usage.get("input_tokens", 0),
+                "llm.output_tokens": usage.get("output_tokens", 0),
+                "llm.cached_tokens": (usage.get("input_token_details") or {}).get("cache_read", 0) or 0,
+            },
+        )
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish(run_id, error)
+
+    # --- Ferramentas ---
+
+    def on_tool_start(self, serialized, input_str, *, run_id: UUID, parent_run_id=None, **kwargs: Any) -> None:
+        name = self._name(serialized, kwargs, "tool")
+        self._begin(run_id, parent_run_id, f"tool {name}", "tool", **{"tool.name": name})
+
+    def on_tool_end(self, output, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish(run_id)
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish(run_id, error)
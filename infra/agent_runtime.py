@@ -0,0 +1,183 @@
+"""
+Runtime de agente de longa duração
+
+`AgentRuntime` abre as sessões MCP uma única vez, carrega as ferramentas e
+compila o grafo do LangGraph, e reaproveita tudo entre perguntas (e entre
+usuários, no gateway). As ferramentas só são recarregadas quando um servidor
+avisa `notifications/tools/list_changed` ou quando `refresh_tools()` é
+chamado explicitamente.
+
+Com um `WarmServerPool` (`infra/server_pool.py`), as sessões dos servidores
+stdio vêm de instâncias já iniciadas e voltam para o pool no `close()`.
+
+Ferramentas locais (`local_tools`, ex.: `memory.resolve_tool()`) entram no
+catálogo junto com as dos servidores.
+
+Com `tool_selection` (ex.: `ToolSelector.from_env`, `infra/tool_selection.py`),
+cada chamada ao LLM recebe só as ferramentas relevantes para o turno, e não o
+catálogo inteiro de todos os servidores.
+
+    async with AgentRuntime({"math": {...}}, model) as runtime:
+        agent = await runtime.get_agent()
+        await agent.ainvoke({"messages": ["Quanto é 5 + 3?"]})
+"""
+
+import asyncio
+from contextlib import AsyncExitStack
+from typing import Any, Callable, Dict, List, Optional
+
+from mcp import ClientSession, types
+
+from infra.prompt_prefix import canonical_tools
+
+# Chaves descritivas aceitas na configuração, mas que não são do transporte
+_METADATA_KEYS = ("name", "description")
+
+
+class AgentRuntime:
+    """Sessões MCP, ferramentas e grafo compilado para a vida do processo"""
+
+    def __init__(
+        self,
+        connections: Dict[str, Dict[str, Any]],
+        model,
+        tool_interceptors: Optional[List[Any]] = None,
+        graph_factory: Optional[Callable[..., Any]] = None,
+        server_pool: Optional[Any] = None,
+        tool_selection: Optional[Callable[[List[Any]], Optional[Any]]] = None,
+        local_tools: Optional[List[Any]] = None,
+        **graph_kwargs: Any,
+    ):
+        self.connections = connections
+        self.model = model
+        self.tool_interceptors = tool_interceptors
+        self.graph_factory = graph_factory
+        self.server_pool = server_pool
+        self.tool_selection = tool_selection
+        self.local_tools = list(local_tools or [])
+        self.graph_kwargs = graph_kwargs
+        self.sessions: Dict[str, ClientSession] = {}
+        self.tools: List[Any] = []
+        self.selector = None
+        self.agent = None
+        self.refreshes = 0
+        self._stale = False
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._closing: Optional[asyncio.Event] = None
+
+    async def __aenter__(self) -> "AgentRuntime":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    @property
+    def started(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def _on_message(self, message: Any) -> None:
+        """Marca as ferramentas como desatualizadas quando o servidor avisa"""
+        if isinstance(message, types.ServerNotification) and isinstance(
+            message.root, types.ToolListChangedNotification
+        ):
+            self._stale = True
+
+    async def start(self) -> None:
+        async with self._lock:
+            if self.started:
+                return
+            ready = asyncio.get_running_loop().create_future()
+            self._closing = asyncio.Event()
+            self._task = asyncio.create_task(self._serve(ready))
+            try:
+                await ready
+            except BaseException:
+                self._task = None
+                raise
+
+    async def _serve(self, ready: asyncio.Future) -> None:
+        """Mantém as sessões abertas em uma tarefa própria até `close()`
+
+        Os transportes do MCP (anyio) precisam ser abertos e fechados na mesma
+        tarefa; assim o runtime pode ser usado de qualquer requisição.
+        """
+        from langchain_mcp_adapters.sessions import create_session
+
+        try:
+            async with AsyncExitStack() as stack:
+                for name, connection in self.connections.items():
+                    if self.server_pool is not None and name in self.server_pool:
+                        # Instância pré-iniciada, com a sessão já inicializada
+                        self.sessions[name] = await stack.enter_async_context(
+                            self.server_pool.lease(name, self._on_message)
+                        )
+                        continue
+                    connection = {k: v for k, v in connection.items() if k not in _METADATA_KEYS}
+                    session_kwargs = {**(connection.get("session_kwargs") or {}), "message_handler": self._on_message}
+                    session = await stack.enter_async_context(
+                        create_session({**connection, "session_kwargs": session_kwargs})
+                    )
+                    await session.initialize()
+                    self.sessions[name] = session
+                await self._load()
+                ready.set_result(None)
+                await self._closing.wait()
+        except BaseException as exc:
+            if not ready.done():
+                ready.set_exception(exc)
+            elif not isinstance(exc, asyncio.CancelledError):
+                raise
+        finally:
+            self.sessions.clear()
+            self.agent = None
+
+    async def _load(self) -> None:
+        from langchain_mcp_adapters.tools import load_mcp_tools
+
+        tools: List[Any] = list(self.local_tools)
+        for name, session in self.sessions.items():
+            tools += await load_mcp_tools(
+                session, tool_interceptors=self.tool_interceptors, server_name=name
+            )
+        if self.graph_factory is None:
+            from langgraph.prebuilt import create_react_agent
+
+            self.graph_factory = create_react_agent
+        # Ordem e schemas canônicos: o prefixo do prompt (definições das
+        # ferramentas) fica idêntico entre processos e turnos
+        self.tools = canonical_tools(tools)
+        self.selector = self.tool_selection(self.tools) if self.tool_selection is not None else None
+        if self.selector is not None:
+            # Modelo dinâmico: as ferramentas ligadas mudam a cada chamada; o
+            # ToolNode recebe o catálogo inteiro mais a ferramenta de descoberta
+            self.agent = self.graph_factory(self.selector.bind(self.model), self.selector.tools, **self.graph_kwargs)
+        else:
+            self.agent = self.graph_factory(self.model, self.tools, **self.graph_kwargs)
+        self.refreshes += 1
+        self._stale = False
+
+    async def refresh_tools(self) -> List[Any]:
+        """Relista as ferramentas e recompila o grafo"""
+        if not self.started:
+            await self.start()
+            return self.tools
+        async with self._lock:
+            await self._load()
+        return self.tools
+
+    async def get_agent(self):
+        """Grafo compilado, recarregado só se a lista de ferramentas mudou"""
+        if not self.started:
+            await self.start()
+        elif self._stale:
+            await self.refresh_tools()
+        return self.agent
+
+    async def close(self) -> None:
+        async with self._lock:
+            task, self._task = self._task, None
+            if task is not None:
+                self._closing.set()
+                await task
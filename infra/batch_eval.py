@@ -0,0 +1,330 @@
+"""
+Avaliação em lote de listas de perguntas
+
+As listas de regressão noturnas (milhares de perguntas) rodavam uma pergunta
+por vez, como os `test_queries` dos clientes. `run_batch` avalia um arquivo
+de perguntas em paralelo:
+
+- no máximo `concurrency` perguntas em andamento (semáforo);
+- cada chamada ao LLM passa antes por um `RateLimiter` com dois baldes de
+  fichas (requisições e tokens por minuto, os limites do deployment no
+  Azure); os tokens são estimados pelo prompt e acertados com o uso real
+  informado pelo provedor;
+- cada pergunta respondida vira uma linha no JSONL de saída (resposta,
+  latência, chamadas e tokens). O arquivo é também o checkpoint: rodar de
+  novo com a mesma saída pula as perguntas já respondidas e refaz as que
+  deram erro.
+
+Arquivo de perguntas: uma por linha, ou JSONL com `{"id", "question",
+"expected"}`. Com `expected`, a resposta precisa conter o texto (sem
+diferenciar maiúsculas) para `passed` ser verdadeiro.
+
+    questions = load_questions("perguntas.jsonl")
+    summary = await run_batch(answer, questions, "resultados.jsonl",
+                              concurrency=16, limiter=RateLimiter.from_env())
+"""
+
+import asyncio
+import hashlib
+import json
+import math
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+from langchain_core.callbacks import AsyncCallbackHandler
+
+from infra.agent_callbacks import TurnTimingCallback
+from infra.memory import estimate_tokens
+
+# Answer(pergunta, callbacks) -> resposta final do agente
+Answer = Callable[[str, List[Any]], Awaitable[str]]
+
+
+@dataclass
+class Question:
+    id: str
+    question: str
+    expected: Optional[str] = None
+
+
+def load_questions(path: str) -> List[Question]:
+    """Perguntas de um arquivo texto (uma por linha) ou JSONL; ids estáveis para retomar"""
+    questions = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if line.startswith("{"):
+                data = json.loads(line)
+                text = data["question"]
+                question_id = str(data.get("id") or hashlib.sha1(text.encode("utf-8")).hexdigest()[:12])
+                questions.append(Question(question_id, text, data.get("expected")))
+            else:
+                questions.append(Question(hashlib.sha1(line.encode("utf-8")).hexdigest()[:12], line))
+    return questions
+
+
+class TokenBucket:
+    """Balde de fichas: enche a `rate` por minuto até `capacity`; pode ficar em débito"""
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, amount: float) -> float:
+        """Segundos até haver `amount` fichas (pedidos maiores que o balde esperam enchê-lo)"""
+        self._refill()
+        missing = min(amount, self.capacity) - self.tokens
+        return missing / self.rate if missing > 0 else 0.0
+
+    def take(self, amount: float) -> None:
+        self._refill()
+        self.tokens -= amount
+
+
+class RateLimiter:
+    """Requisições e tokens por minuto para as chamadas ao LLM (em ordem de chegada)"""
+
+    def __init__(self, requests_per_minute: float = 0, tokens_per_minute: float = 0, output_tokens: int = 256):
+        # O Azure confere os limites em janelas curtas: a rajada máxima é de 10 s
+        self.requests = TokenBucket(requests_per_minute, max(requests_per_minute / 6, 1)) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute, tokens_per_minute / 6) if tokens_per_minute else None
+        # Reserva para a resposta, que só se conhece no fim da chamada
+        self.output_tokens = output_tokens
+        self.waited = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+
+    @classmethod
+    def from_env(cls) -> Optional["RateLimiter"]:
+        """Limites do deployment: LLM_RPM e LLM_TPM (0 ou ausentes = sem limite)"""
+        rpm = float(os.getenv("LLM_RPM", "0"))
+        tpm = float(os.getenv("LLM_TPM", "0"))
+        if not rpm and not tpm:
+            return None
+        return cls(rpm, tpm, int(os.getenv("LLM_RESERVED_OUTPUT_TOKENS", "256")))
+
+    async def acquire(self, tokens: float) -> None:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        # Um por vez: quem chegou primeiro é atendido primeiro
+        async with self._lock:
+            start = time.monotonic()
+            while True:
+                wait = max(
+                    self.requests.delay(1) if self.requests else 0.0,
+                    self.tokens.delay(tokens) if self.tokens else 0.0,
+                )
+                if wait <= 0:
+                    break
+                await asyncio.sleep(wait)
+            if self.requests:
+                self.requests.take(1)
+            if self.tokens:
+                self.tokens.take(tokens)
+            self.waited += time.monotonic() - start
+
+    def settle(self, reserved: float, used: float) -> None:
+        """Acerta a reserva com o uso real (devolve a sobra ou cobra o excesso)"""
+        if self.tokens:
+            self.tokens.take(used - reserved)
+
+    def callback(self) -> "RateLimitCallback":
+        return RateLimitCallback(self)
+
+
+class RateLimitCallback(AsyncCallbackHandler):
+    """Segura cada chamada ao LLM até o `RateLimiter` liberar"""
+
+    run_inline = True
+
+    def __init__(self, limiter: RateLimiter):
+        self.limiter = limiter
+        self._reserved: Dict[Any, float] = {}
+
+    async def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs: Any) -> None:
+        reserved = sum(estimate_tokens(batch) for batch in messages) + self.limiter.output_tokens
+        self._reserved[run_id] = reserved
+        await self.limiter.acquire(reserved)
+
+    async def on_llm_end(self, response, *, run_id, **kwargs: Any) -> None:
+        reserved = self._reserved.pop(run_id, 0)
+        try:
+            usage = response.generations[0][0].message.usage_metadata or {}
+        except (AttributeError, IndexError):
+            usage = {}
+        if usage.get("total_tokens"):
+            self.limiter.settle(reserved, usage["total_tokens"])
+
+    async def on_llm_error(self, error: BaseException, *, run_id, **kwargs: Any) -> None:
+        self._reserved.pop(run_id, None)
+
+
+def _is_rate_limited(exc: BaseException) -> bool:
+    return getattr(exc, "status_code", None) == 429 or type(exc).__name__ == "RateLimitError"
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(1, min(len(ordered), math.ceil(q * len(ordered)))) - 1]
+
+
+def _completed(output: str) -> Dict[str, Dict[str, Any]]:
+    """Último resultado de cada pergunta já gravada no JSONL de saída"""
+    results: Dict[str, Dict[str, Any]] = {}
+    if not os.path.exists(output):
+        return results
+    # A linha truncada pode terminar no meio de um caractere UTF-8
+    with open(output, encoding="utf-8", errors="replace") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # linha truncada por uma interrupção
+            results[record["id"]] = record
+    return results
+
+
+async def run_batch(
+    answer: Answer,
+    questions: Sequence[Question],
+    output: str,
+    concurrency: int = 8,
+    limiter: Optional[RateLimiter] = None,
+    agent: str = "batch",
+    retries: int = 2,
+    on_result: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> Dict[str, Any]:
+    """Avalia as perguntas em paralelo, gravando cada resultado ao terminar"""
+    done = _completed(output)
+    pending = [q for q in questions if done.get(q.id, {}).get("status") != "ok"]
+    slots = asyncio.Semaphore(concurrency)
+    records: List[Dict[str, Any]] = []
+    start = time.perf_counter()
+
+    # Uma interrupção pode ter deixado a última linha pela metade (talvez no meio
+    # de um caractere UTF-8): o último byte é lido em modo binário
+    broken_tail = False
+    if os.path.exists(output):
+        with open(output, "rb") as tail:
+            if tail.seek(0, os.SEEK_END):
+                tail.seek(-1, os.SEEK_END)
+                broken_tail = tail.read(1) != b"\n"
+
+    with open(output, "a", encoding="utf-8") as sink:
+        if broken_tail:
+            sink.write("\n")
+
+        async def evaluate(question: Question) -> None:
+            async with slots:
+                for attempt in range(retries + 1):
+                    timing = TurnTimingCallback(agent)
+                    callbacks: List[Any] = [timing]
+                    if limiter is not None:
+                        callbacks.append(limiter.callback())
+                    timing.start_turn()
+                    record: Dict[str, Any] = {"id": question.id, "question": question.question}
+                    try:
+                        record["answer"] = await answer(question.question, callbacks)
+                        record["status"] = "ok"
+                    except Exception as exc:
+                        record["status"] = "error"
+                        record["error"] = f"{type(exc).__name__}: {exc}"
+                        if _is_rate_limited(exc) and attempt < retries:
+                            await asyncio.sleep(2 ** attempt * 5)
+                            continue
+                    break
+                stats = timing.finish_turn()
+            record.update({
+                "latency_s": round(stats.total, 4),
+                "llm_seconds": round(stats.llm_seconds, 4),
+                "tool_seconds": round(stats.tool_seconds, 4),
+                "llm_calls": stats.llm_calls,
+                "tool_calls": stats.tool_calls,
+                "input_tokens": stats.input_tokens,
+                "output_tokens": stats.output_tokens,
+                "cached_tokens": stats.cached_tokens,
+            })
+            if question.expected is not None and record["status"] == "ok":
+                record["passed"] = question.expected.lower() in str(record["answer"]).lower()
+            # Uma linha por pergunta, gravada na hora: é o ponto de retomada
+            sink.write(json.dumps(record, ensure_ascii=False) + "\n")
+            sink.flush()
+            records.append(record)
+            if on_result is not None:
+                on_result(record)
+
+        await asyncio.gather(*(evaluate(question) for question in pending))
+
+    elapsed = time.perf_counter() - start
+    ok = [r for r in records if r["status"] == "ok"]
+    latencies = [r["latency_s"] for r in ok]
+    graded = [r for r in records if "passed" in r]
+    input_tokens = sum(r["input_tokens"] for r in records)
+    summary = {
+        "questions": len(questions),
+        "skipped": len(questions) - len(pending),
+        "evaluated": len(records),
+        "ok": len(ok),
+        "errors": len(records) - len(ok),
+        "passed": sum(1 for r in graded if r["passed"]),
+        "graded": len(graded),
+        "elapsed_s": round(elapsed, 3),
+        "questions_per_minute": round(len(records) / elapsed * 60, 1) if elapsed else 0.0,
+        "p50_s": _percentile(latencies, 0.50),
+        "p95_s": _percentile(latencies, 0.95),
+        "input_tokens": input_tokens,
+        "output_tokens": sum(r["output_tokens"] for r in records),
+        "cache_ratio": round(sum(r["cached_tokens"] for r in records) / input_tokens, 3) if input_tokens else 0.0,
+        "rate_limit_wait_s": round(limiter.waited, 3) if limiter else 0.0,
+    }
+    return summary
+
+
+def format_summary(summary: Dict[str, Any]) -> str:
+    graded = f" | corretas {summary['passed']}/{summary['graded']}" if summary["graded"] else ""
+    return (
+        f"📊 {summary['evaluated']} avaliadas ({summary['skipped']} já feitas) em {summary['elapsed_s']:.1f}s "
+        f"({summary['questions_per_minute']}/min) | ok {summary['ok']} | erros {summary['errors']}{graded} | "
+        f"p50 {summary['p50_s']:.2f}s p95 {summary['p95_s']:.2f}s | "
+        f"tokens {summary['input_tokens']}+{summary['output_tokens']} ({summary['cache_ratio']:.0%} do cache) | "
+        f"espera por limite {summary['rate_limit_wait_s']:.1f}s"
+    )
+
+
+async def evaluate_file(
+    answer: Answer,
+    path: str,
+    output: Optional[str] = None,
+    concurrency: Optional[int] = None,
+    agent: str = "batch",
+) -> Dict[str, Any]:
+    """Roda `run_batch` com a configuração do ambiente, imprimindo o progresso"""
+    questions = load_questions(path)
+    output = output or os.path.splitext(path)[0] + ".results.jsonl"
+    concurrency = concurrency or int(os.getenv("BATCH_CONCURRENCY", "8"))
+    limiter = RateLimiter.from_env()
+    print(f"📋 {len(questions)} perguntas de {path} → {output} (concorrência {concurrency}"
+          f"{', limites LLM_RPM/LLM_TPM' if limiter else ''})")
+    finished = 0
+
+    def report(record: Dict[str, Any]) -> None:
+        nonlocal finished
+        finished += 1
+        icon = "✅" if record["status"] == "ok" and record.get("passed", True) else "❌"
+        print(f"{icon} [{finished}] {record['latency_s']:.2f}s {record['question'][:60]}")
+
+    summary = await run_batch(answer, questions, output, concurrency, limiter, agent, on_result=report)
+    print(format_summary(summary))
+    return summary
@@ -0,0 +1,456 @@
+"""
+Checkpointer persistente (SQLite local) para os agentes do LangGraph
+
+Com um checkpointer, o estado de cada conversa (`thread_id`) sobrevive a uma
+queda do processo e pode ser retomado por qualquer worker que abra o mesmo
+arquivo. O arquivo é separado dos bancos de dados consultados pelos agentes
+(ex.: `Chinook.db`).
+
+- WAL + synchronous=NORMAL: leitores não bloqueiam o escritor e vários
+  processos podem compartilhar o arquivo;
+- escritas em lote: checkpoints e writes ficam em um buffer e vão para o
+  disco em uma única transação (a cada `batch_size` itens, no máximo
+  `flush_interval` segundos depois da primeira escrita pendente, mesmo sem
+  novas escritas, antes de qualquer leitura e no `close()`);
+- delta de listas: quando a nova versão de um canal (ex.: `messages`) só
+  acrescenta itens à versão anterior, grava-se apenas o trecho novo e uma
+  referência à versão base. A cada `max_delta_depth` deltas grava-se a lista
+  inteira, para limitar o custo de reconstrução.
+
+    checkpointer = SQLiteCheckpointer(".checkpoints.sqlite")
+    agent = create_react_agent(model, tools, checkpointer=checkpointer)
+    await agent.ainvoke({"messages": ["Oi"]}, {"configurable": {"thread_id": "sessao-1"}})
+"""
+
+import asyncio
+import atexit
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+    writes_sort_key,
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    checkpoint_id TEXT NOT NULL,
+    parent_id TEXT,
+    type TEXT NOT NULL,
+    checkpoint BLOB NOT NULL,
+    metadata_type TEXT NOT NULL,
+    metadata BLOB NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS blobs (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    channel TEXT NOT NULL,
+    version TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    base TEXT,
+    depth INTEGER NOT NULL DEFAULT 0,
+    type TEXT NOT NULL,
+    data BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, channel, version)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT NOT NULL,
+    data BLOB,
+    task_path TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+"""
+
+
+def session_id() -> str:
+    """Conversa a retomar (AGENT_SESSION) ou o identificador de uma nova"""
+    return os.getenv("AGENT_SESSION") or uuid.uuid4().hex[:12]
+
+
+class SQLiteCheckpointer(BaseCheckpointSaver[str]):
+    """Checkpoints do LangGraph em SQLite com WAL, escrita em lote e delta de listas"""
+
+    def __init__(
+        self,
+        path: str = ".checkpoints.sqlite",
+        batch_size: int = 32,
+        flush_interval: float = 0.5,
+        max_delta_depth: int = 32,
+        serde: Any = None,
+    ):
+        super().__init__(serde=serde)
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_delta_depth = max_delta_depth
+        self.stats = {"flushes": 0, "rows": 0, "full_blobs": 0, "delta_blobs": 0}
+        self._lock = threading.RLock()
+        self._pending: List[Tuple[str, tuple]] = []
+        self._last_flush = time.monotonic()
+        # Grava o buffer quando o prazo vence, mesmo que nenhuma escrita chegue
+        self._timer: Optional[threading.Timer] = None
+        self._closed = False
+        # Última lista gravada por canal: (thread, ns, canal) -> (versão, profundidade, itens)
+        self._lists: "OrderedDict[Tuple[str, str, str], Tuple[str, int, list]]" = OrderedDict()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        self._db.commit()
+        atexit.register(self.flush)
+
+    @classmethod
+    def from_env(cls, default_path: str = ".checkpoints.sqlite") -> Optional["SQLiteCheckpointer"]:
+        """Cria o checkpointer a partir de CHECKPOINT_* (CHECKPOINT=0 desativa)"""
+        if os.getenv("CHECKPOINT", "1") == "0":
+            return None
+        return cls(
+            os.getenv("CHECKPOINT_FILE", default_path),
+            batch_size=int(os.getenv("CHECKPOINT_BATCH_SIZE", "32")),
+            flush_interval=float(os.getenv("CHECKPOINT_FLUSH_INTERVAL", "0.5")),
+        )
+
+    # --- Buffer de escrita ---
+
+    def _queue(self, sql: str, params: tuple) -> None:
+        self._pending.append((sql, params))
+        if self._timer is None and self.flush_interval > 0 and not self._closed:
+            self._timer = threading.Timer(self.flush_interval, self._timed_flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _timed_flush(self) -> None:
+        # O último turno de uma conversa não fica no buffer esperando a próxima escrita
+        with self._lock:
+            self._timer = None
+            if not self._closed:
+                self.flush()
+
+    def _flush_due(self) -> bool:
+        return bool(self._pending) and (
+            len(self._pending) >= self.batch_size
+            or time.monotonic() - self._last_flush >= self.flush_interval
+        )
+
+    def flush(self) -> None:
+        """Grava o buffer em uma única transação"""
+        with self._lock:
+            pending, self._pending = self._pending, []
+            self._last_flush = time.monotonic()
+            if not pending:
+                return
+            with self._db:
+                for sql, params in pending:
+                    self._db.execute(sql, params)
+            self.stats["flushes"] += 1
+            self.stats["rows"] += len(pending)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self.flush()
+            self._closed = True
+        atexit.unregister(self.flush)
+        self._db.close()
+
+    # --- Canais (blobs) ---
+
+    def _put_blob(self, thread_id: str, ns: str, channel: str, version: str, values: Dict[str, Any]) -> None:
+        key = (thread_id, ns, channel)
+        if channel not in values:
+            self._lists.pop(key, None)
+            self._queue(
+                "INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?, 'empty', NULL, 0, 'empty', NULL)",
+                (thread_id, ns, channel, version),
+            )
+            return
+        value = values[channel]
+        previous = self._lists.get(key)
+        kind, base, depth, payload = "full", None, 0, value
+        if (
+            isinstance(value, list)
+            and previous is not None
+            and previous[1] < self.max_delta_depth
+            and len(value) >= len(previous[2])
+            and all(new is old or new == old for new, old in zip(value, previous[2]))
+        ):
+            # Só itens novos no fim da lista: grava o trecho acrescentado
+            kind, base, depth, payload = "delta", previous[0], previous[1] + 1, value[len(previous[2]):]
+        type_, data = self.serde.dumps_typed(payload)
+        self._queue(
+            "INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (thread_id, ns, channel, version, kind, base, depth, type_, data),
+        )
+        self.stats[f"{kind}_blobs"] += 1
+        self._remember(key, version, depth, value)
+
+    def _remember(self, key: Tuple[str, str, str], version: str, depth: int, value: Any) -> None:
+        """Guarda a última lista do canal para a próxima escrita poder ser um delta"""
+        if not isinstance(value, list):
+            self._lists.pop(key, None)
+            return
+        self._lists[key] = (version, depth, list(value))
+        self._lists.move_to_end(key)
+        while len(self._lists) > 256:
+            self._lists.popitem(last=False)
+
+    def _load_blob(self, thread_id: str, ns: str, channel: str, version: str) -> Tuple[bool, Any, int]:
+        tail: List[Any] = []
+        depth = 0
+        while True:
+            row = self._db.execute(
+                "SELECT kind, base, type, data FROM blobs "
+                "WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?",
+                (thread_id, ns, channel, version),
+            ).fetchone()
+            if row is None or row[0] == "empty":
+                return False, None, 0
+            kind, base, type_, data = row
+            value = self.serde.loads_typed((type_, data))
+            if kind == "full":
+                break
+            tail = value + tail
+            version = base
+            depth += 1
+        return True, (value + tail if tail else value), depth
+
+    def _load_values(self, thread_id: str, ns: str, versions: ChannelVersions) -> Dict[str, Any]:
+        values: Dict[str, Any] = {}
+        for channel, version in versions.items():
+            found, value, depth = self._load_blob(thread_id, ns, channel, str(version))
+            if found:
+                values[channel] = value
+                # Outro worker pode ter escrito antes: a próxima escrita parte do que foi lido
+                self._remember((thread_id, ns, channel), str(version), depth, value)
+        return values
+
+    # --- Leitura ---
+
+    def _tuple(self, thread_id: str, ns: str, row: tuple) -> CheckpointTuple:
+        checkpoint_id, parent_id, type_, data, metadata_type, metadata = row
+        checkpoint: Checkpoint = self.serde.loads_typed((type_, data))
+        writes = self._db.execute(
+            "SELECT task_id, idx, channel, type, data, task_path FROM writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+            (thread_id, ns, checkpoint_id),
+        ).fetchall()
+        writes.sort(key=lambda w: writes_sort_key(w[5], w[0], w[1]))
+        return CheckpointTuple(
+            config={"configurable": {"thread_id": thread_id, "checkpoint_ns": ns, "checkpoint_id": checkpoint_id}},
+            checkpoint={
+                **checkpoint,
+                "channel_values": self._load_values(thread_id, ns, checkpoint["channel_versions"]),
+            },
+            metadata=self.serde.loads_typed((metadata_type, metadata)),
+            parent_config=(
+                {"configurable": {"thread_id": thread_id, "checkpoint_ns": ns, "checkpoint_id": parent_id}}
+                if parent_id
+                else None
+            ),
+            pending_writes=[(task_id, channel, self.serde.loads_typed((t, d))) for task_id, _, channel, t, d, _ in writes],
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        ns = config["configurable"].get("checkpoint_ns", "")
+        columns = "checkpoint_id, parent_id, type, checkpoint, metadata_type, metadata"
+        with self._lock:
+            self.flush()
+            if checkpoint_id := get_checkpoint_id(config):
+                row = self._db.execute(
+                    f"SELECT {columns} FROM checkpoints "
+                    "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    (thread_id, ns, checkpoint_id),
+                ).fetchone()
+            else:
+                row = self._db.execute(
+                    f"SELECT {columns} FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                    "ORDER BY checkpoint_id DESC LIMIT 1",
+                    (thread_id, ns),
+                ).fetchone()
+            return self._tuple(thread_id, ns, row) if row else None
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        clauses, params = [], []
+        if config:
+            clauses.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            if (ns := config["configurable"].get("checkpoint_ns")) is not None:
+                clauses.append("checkpoint_ns = ?")
+                params.append(ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                clauses.append("checkpoint_id = ?")
+                params.append(checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            clauses.append("checkpoint_id < ?")
+            params.append(before_id)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            self.flush()
+            rows = self._db.execute(
+                "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_id, type, checkpoint, "
+                f"metadata_type, metadata FROM checkpoints {where} ORDER BY checkpoint_id DESC",
+                params,
+            ).fetchall()
+            results = []
+            for thread_id, ns, *row in rows:
+                if limit is not None and len(results) >= limit:
+                    break
+                metadata = self.serde.loads_typed((row[4], row[5]))
+                if filter and not all(metadata.get(k) == v for k, v in filter.items()):
+                    continue
+                results.append(self._tuple(thread_id, ns, tuple(row)))
+        yield from results
+
+    # --- Escrita ---
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint = checkpoint.copy()
+        values = checkpoint.pop("channel_values")
+        with self._lock:
+            for channel, version in new_versions.items():
+                self._put_blob(thread_id, ns, channel, str(version), values)
+            type_, data = self.serde.dumps_typed(checkpoint)
+            metadata_type, metadata_data = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+            self._queue(
+                "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    thread_id,
+                    ns,
+                    checkpoint["id"],
+                    config["configurable"].get("checkpoint_id"),
+                    type_,
+                    data,
+                    metadata_type,
+                    metadata_data,
+                ),
+            )
+            if self._flush_due():
+                self.flush()
+        return {"configurable": {"thread_id": thread_id, "checkpoint_ns": ns, "checkpoint_id": checkpoint["id"]}}
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        with self._lock:
+            for idx, (channel, value) in enumerate(writes):
+                idx = WRITES_IDX_MAP.get(channel, idx)
+                # Writes especiais (índice negativo) substituem; os demais são idempotentes
+                verb = "INSERT OR REPLACE" if idx < 0 else "INSERT OR IGNORE"
+                type_, data = self.serde.dumps_typed(value)
+                self._queue(
+                    f"{verb} INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (thread_id, ns, checkpoint_id, task_id, idx, channel, type_, data, task_path),
+                )
+            if self._flush_due():
+                self.flush()
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            self.flush()
+            with self._db:
+                for table in ("checkpoints", "blobs", "writes"):
+                    self._db.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+            for key in [key for key in self._lists if key[0] == thread_id]:
+                del self._lists[key]
+
+    def get_next_version(self, current: Optional[str], channel: None = None) -> str:
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+    # --- Versões assíncronas ---
+    # As escritas só vão para o buffer; o disco é tocado em uma thread à parte.
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        results = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for item in results:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        if self._flush_due() or len(self._pending) + len(new_versions) + 1 >= self.batch_size:
+            return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+        return self.put(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        if self._flush_due() or len(self._pending) + len(writes) >= self.batch_size:
+            return await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+        self.put_writes(config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
@@ -0,0 +1,172 @@
+"""
+Prazos propagados e cancelamento de trabalho abandonado
+
+Quando o cliente HTTP desiste (timeout ou conexão fechada), a chamada MCP e a
+consulta SQL por trás dela continuariam rodando até o fim. O prazo viaja
+junto com a requisição:
+
+1. o gateway lê o cabeçalho `X-Request-Timeout` (segundos) ou usa o padrão;
+2. cada chamada MCP leva o tempo restante no `_meta` (`timeoutMs`, relativo,
+   para não depender dos relógios dos dois processos);
+3. no servidor, `instrument_tool` recria o prazo: ferramentas assíncronas são
+   canceladas ao estourar, as síncronas podem consultar `check_deadline()`, e
+   conexões SQLite com `install_sqlite_deadline` abortam a consulta.
+
+Se o prazo passa ou o cliente desconecta, `run_until_deadline` cancela a
+tarefa, marca o prazo como cancelado (threads e consultas SQLite olham essa
+marca) e `call_tool` avisa o servidor MCP com `notifications/cancelled`.
+
+    deadline = Deadline.from_headers(request.headers, default=30)
+    result = await run_until_deadline(work(), deadline, request.is_disconnected)
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Mapping, Optional
+
+TIMEOUT_HEADER = "x-request-timeout"
+TIMEOUT_META = "timeoutMs"
+
+
+class DeadlineExceeded(TimeoutError):
+    """O prazo da requisição acabou antes do fim do trabalho"""
+
+
+class ClientDisconnected(Exception):
+    """O cliente fechou a conexão: ninguém vai ler a resposta"""
+
+
+class Deadline:
+    """Instante limite (relógio monotônico) que também pode ser cancelado"""
+
+    def __init__(self, at: Optional[float] = None):
+        self.at = at
+        self.cancelled = False
+
+    @classmethod
+    def after(cls, seconds: Optional[float]) -> "Deadline":
+        return cls(time.monotonic() + seconds if seconds is not None else None)
+
+    @classmethod
+    def from_headers(cls, headers: Mapping[str, str], default: Optional[float] = None) -> "Deadline":
+        """Prazo do cabeçalho `X-Request-Timeout`, limitado pelo padrão do servidor"""
+        timeout = default or None
+        value = headers.get(TIMEOUT_HEADER)
+        if value:
+            try:
+                requested = float(value)
+            except ValueError:
+                requested = None
+            if requested and requested > 0:
+                timeout = min(requested, timeout) if timeout else requested
+        return cls.after(timeout)
+
+    @classmethod
+    def from_meta(cls, meta: Optional[Any]) -> "Deadline":
+        """Prazo recebido no `_meta` de uma requisição MCP (dict ou modelo do SDK)"""
+        if meta is None:
+            return cls()
+        if not hasattr(meta, "get"):
+            meta = getattr(meta, "model_extra", None) or {}
+        value = meta.get(TIMEOUT_META)
+        if value is None:
+            return cls()
+        return cls.after(max(float(value), 0.0) / 1000)
+
+    def remaining(self) -> Optional[float]:
+        """Segundos restantes (None = sem prazo; 0 = já acabou)"""
+        if self.cancelled:
+            return 0.0
+        if self.at is None:
+            return None
+        return max(self.at - time.monotonic(), 0.0)
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() == 0.0
+
+    def cancel(self) -> None:
+        self.cancelled = True
+
+    def to_meta(self, meta: Optional[dict] = None) -> dict:
+        """Acrescenta o tempo restante ao `_meta` de uma requisição MCP"""
+        meta = dict(meta or {})
+        remaining = self.remaining()
+        if remaining is not None:
+            meta[TIMEOUT_META] = int(remaining * 1000)
+        return meta
+
+    def check(self) -> None:
+        if self.expired:
+            raise DeadlineExceeded("Prazo da requisição esgotado" if not self.cancelled else "Requisição cancelada")
+
+
+current_deadline: ContextVar[Optional[Deadline]] = ContextVar("current_deadline", default=None)
+
+
+@contextmanager
+def deadline_scope(deadline: Deadline):
+    """Torna `deadline` o prazo corrente (herdado por tarefas e threads do contexto)"""
+    token = current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        current_deadline.reset(token)
+
+
+def check_deadline() -> None:
+    """Para ferramentas síncronas longas: levanta DeadlineExceeded se o prazo acabou"""
+    deadline = current_deadline.get()
+    if deadline is not None:
+        deadline.check()
+
+
+def install_sqlite_deadline(connection: Any, every: int = 10000) -> None:
+    """Aborta consultas da conexão quando o prazo corrente acaba ou é cancelado
+
+    O SQLite chama o handler a cada `every` instruções da VM, na thread da
+    consulta; devolver verdadeiro interrompe a consulta com
+    `sqlite3.OperationalError: interrupted` (o mesmo efeito de `interrupt()`).
+    """
+
+    def expired() -> int:
+        deadline = current_deadline.get()
+        return int(deadline is not None and deadline.expired)
+
+    connection.set_progress_handler(expired, every)
+
+
+async def run_until_deadline(
+    work: Awaitable[Any],
+    deadline: Deadline,
+    disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+    poll_interval: float = 0.25,
+) -> Any:
+    """Aguarda `work`, cancelando-o se o prazo acabar ou o cliente desconectar"""
+    # asyncio (~40 ms) só é importado aqui: os servidores stdio síncronos
+    # carregam este módulo via infra.instrumentation e não precisam dele
+    import asyncio
+
+    with deadline_scope(deadline):
+        task = asyncio.ensure_future(work)
+    try:
+        while True:
+            remaining = deadline.remaining()
+            timeout = poll_interval if disconnected is not None else remaining
+            if remaining is not None and timeout is not None:
+                timeout = min(timeout, remaining)
+            done, _ = await asyncio.wait({task}, timeout=timeout)
+            if done:
+                return task.result()
+            if deadline.expired:
+                raise DeadlineExceeded("Prazo da requisição esgotado")
+            if disconnected is not None and await disconnected():
+                raise ClientDisconnected()
+    except BaseException:
+        # Inclui o cancelamento da própria requisição pelo servidor HTTP
+        deadline.cancel()
+        if not task.done():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        raise
@@ -0,0 +1,118 @@
+"""
+Instrumentação das ferramentas dos servidores MCP
+
+`instrument_tool` envolve a função da ferramenta antes de registrá-la no
+FastMCP, preservando nome, docstring e assinatura (o FastMCP gera o schema
+de entrada a partir deles):
+
+    @server.tool()
+    @instrument_tool(tool_metrics, tracer)
+    def add(a: int, b: int) -> int:
+        ...
+
+Com um tracer, cada chamada vira um span de servidor filho do contexto
+recebido no `_meta` da requisição MCP (ou no cabeçalho HTTP `traceparent`).
+O prazo (`timeoutMs`) do `_meta` também é respeitado.
+"""
+
+import functools
+import inspect
+import sys
+from contextlib import contextmanager
+from typing import Any, Optional
+
+from infra.deadlines import Deadline, DeadlineExceeded, deadline_scope
+from infra.metrics import ToolMetrics
+from infra.tracing import SpanContext, Tracer, extract
+
+
+def _request_context() -> Optional[Any]:
+    """Contexto da requisição MCP em andamento (LiteMCPServer, SDK oficial e fastmcp)"""
+    from infra.lite_server import request_ctx as lite_ctx
+
+    context = lite_ctx.get(None)
+    if context is not None:
+        return context
+    # Só consulta o SDK se ele já foi carregado: importá-lo aqui custaria ~0,6 s
+    # a um servidor que não o usa
+    module = sys.modules.get("mcp.server.lowlevel.server")
+    if module is None:
+        return None
+    try:
+        return module.request_ctx.get()
+    except LookupError:
+        return None
+
+
+def request_meta() -> Optional[Any]:
+    """`_meta` da requisição MCP em andamento (dict ou modelo pydantic do SDK)"""
+    context = _request_context()
+    return getattr(context, "meta", None) if context is not None else None
+
+
+def incoming_trace_context() -> Optional[SpanContext]:
+    """Contexto de trace propagado pelo cliente, se houver"""
+    context = _request_context()
+    if context is None:
+        return None
+    parent = extract(context.meta)
+    if parent is None and getattr(context, "request", None) is not None:
+        parent = extract(getattr(context.request, "headers", None))
+    return parent
+
+
+@contextmanager
+def _observe(name: str, metrics: ToolMetrics, tracer: Optional[Tracer]):
+    with metrics.track(name) as call:
+        if tracer is None:
+            with call.phase("backend"):
+                yield
+            return
+        attributes = {"category": "mcp.server", "mcp.tool": name}
+        with tracer.span(
+            f"tool {name}", kind="server", attributes=attributes, parent=incoming_trace_context()
+        ):
+            with call.phase("backend"):
+                yield
+
+
+def instrument_tool(metrics: ToolMetrics, tracer: Optional[Tracer] = None):
+    """Decorator que mede chamadas, erros e latência de uma ferramenta
+
+    O prazo do `_meta` (infra/deadlines.py) vira o prazo corrente da chamada;
+    ferramentas assíncronas são canceladas quando ele acaba.
+    """
+
+    def decorator(fn):
+        name = fn.__name__
+
+        if inspect.iscoroutinefunction(fn):
+
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                import asyncio
+
+                deadline = Deadline.from_meta(request_meta())
+                with deadline_scope(deadline), _observe(name, metrics, tracer):
+                    # Vencido antes de começar (ex.: esperou na fila do pipe): nem roda
+                    deadline.check()
+                    timeout = deadline.remaining()
+                    if timeout is None:
+                        return await fn(*args, **kwargs)
+                    try:
+                        return await asyncio.wait_for(fn(*args, **kwargs), timeout)
+                    except asyncio.TimeoutError:
+                        raise DeadlineExceeded(f"Prazo esgotado em {name}") from None
+
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            deadline = Deadline.from_meta(request_meta())
+            with deadline_scope(deadline), _observe(name, metrics, tracer):
+                deadline.check()
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
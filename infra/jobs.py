@@ -0,0 +1,413 @@
+"""
+Fila de jobs para ferramentas demoradas
+
+Um `factorial(200000)` ou uma consulta pesada seguram a requisição HTTP (e o
+passo do agente) enquanto rodam. Com `JobQueue`, a ferramenta devolve um id
+na hora e o trabalho roda em um pool limitado de threads (ou de processos,
+para tarefas registradas com `process=True`):
+
+    jobs = JobQueue(workers=2)
+
+    @jobs.task()
+    def factorial(n: int, progress: Progress) -> int:
+        for i in range(2, n + 1):
+            ...
+            progress(i, n)          # também é o ponto de cancelamento
+        return result
+
+    job = jobs.submit("factorial", {"n": 100000})   # status "queued"
+    job = await jobs.wait(job.id, timeout=10)       # ou jobs.get(job.id)
+
+- `submit` recusa novos jobs (`JobQueueFull`) com `max_queued` na fila;
+- o progresso fica no job e acorda quem espera (`wait`, `events`), para ser
+  repassado como notificação de progresso do MCP ou como SSE;
+- jobs terminados (resultado ou erro) ficam guardados por `ttl` segundos;
+- `cancel` tira o job da fila ou, se já estiver rodando, interrompe na
+  próxima chamada de `progress`;
+- com `timeout`, o job que passa do prazo falha do mesmo jeito.
+
+Uma conta com inteiros enormes segura o GIL e só chama `progress` entre as
+multiplicações: `power` nunca chama. Tarefas com `process=True` rodam em um
+processo filho (um por thread do pool, reaproveitado entre jobs) e, ao
+cancelar ou estourar o prazo, o processo é morto na hora e recriado no
+próximo job. Argumentos, resultado e a própria função viajam por pickle.
+
+Os jobs vivem no processo que os aceitou: com vários workers HTTP, o status
+precisa ser consultado no mesmo processo (um worker ou roteamento fixo).
+"""
+
+import asyncio
+import inspect
+import multiprocessing
+import multiprocessing.connection
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from infra.metrics import REGISTRY, MetricsRegistry
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINISHED = (DONE, FAILED, CANCELLED)
+
+_MP = multiprocessing.get_context("spawn")
+
+
+class JobQueueFull(RuntimeError):
+    """Fila cheia: o cliente deve tentar de novo mais tarde"""
+
+
+class JobCancelled(Exception):
+    """Levantada por `progress()` quando o job foi cancelado"""
+
+
+@dataclass
+class Job:
+    id: str
+    name: str
+    arguments: Dict[str, Any]
+    status: str = QUEUED
+    progress: float = 0.0
+    total: Optional[float] = None
+    message: Optional[str] = None
+    result: Any = None
+    error: Optional[str] = None
+    created: float = field(default_factory=time.time)
+    started: Optional[float] = None
+    finished: Optional[float] = None
+    version: int = 0
+    cancel_requested: bool = False
+
+    @property
+    def done(self) -> bool:
+        return self.status in FINISHED
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Estado do job sem o resultado (que pode ser enorme)"""
+        return {
+            "job_id": self.id,
+            "tool": self.name,
+            "status": self.status,
+            "progress": self.progress,
+            "total": self.total,
+            "message": self.message,
+            "error": self.error,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+        }
+
+
+class Progress:
+    """Callback passado à função do job: `progress(feito, total, mensagem)`"""
+
+    def __init__(self, queue: "JobQueue", job: Job):
+        self._queue = queue
+        self._job = job
+
+    def __call__(self, progress: float, total: Optional[float] = None, message: Optional[str] = None) -> None:
+        self._queue._check(self._job)
+        self._queue._update(self._job, progress=progress, total=total, message=message)
+
+
+class _PipeProgress:
+    """`progress` dentro do processo filho: repassa o aviso pelo pipe"""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def __call__(self, progress: float, total: Optional[float] = None, message: Optional[str] = None) -> None:
+        self._conn.send(("progress", {"progress": progress, "total": total, "message": message}))
+
+
+def _process_main(conn) -> None:
+    """Processo filho: executa os jobs recebidos pelo pipe até ele fechar"""
+    while True:
+        try:
+            fn, arguments = conn.recv()
+        except EOFError:
+            return
+        try:
+            result = fn(**arguments, progress=_PipeProgress(conn))
+        except Exception as exc:
+            conn.send(("error", str(exc) or type(exc).__name__))
+        else:
+            conn.send(("result", result))
+
+
+class _JobProcess:
+    """Processo filho de uma thread do pool, morto ao cancelar ou estourar o prazo"""
+
+    def __init__(self):
+        self.conn, child = _MP.Pipe()
+        self.process = _MP.Process(target=_process_main, args=(child,), name="job-process", daemon=True)
+        self.process.start()
+        child.close()
+
+    def run(self, queue: "JobQueue", fn: Callable[..., Any], job: Job) -> Any:
+        self.conn.send((fn, job.arguments))
+        while True:
+            # Acorda a cada 0,1s para ver cancelamento e prazo
+            ready = multiprocessing.connection.wait([self.conn, self.process.sentinel], 0.1)
+            queue._check(job)
+            if self.conn in ready:
+                try:
+                    kind, payload = self.conn.recv()
+                except EOFError:
+                    raise RuntimeError(f"Processo do job saiu (código {self.process.exitcode})")
+                if kind == "progress":
+                    queue._update(job, **payload)
+                elif kind == "error":
+                    raise RuntimeError(payload)
+                else:
+                    return payload
+            elif ready:
+                raise RuntimeError(f"Processo do job saiu (código {self.process.exitcode})")
+
+    @property
+    def alive(self) -> bool:
+        return self.process.is_alive()
+
+    def kill(self) -> None:
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+class JobQueue:
+    """Pool limitado de threads que executa jobs e guarda os resultados com TTL"""
+
+    def __init__(
+        self,
+        workers: int = 2,
+        max_queued: int = 64,
+        ttl: float = 600.0,
+        timeout: Optional[float] = None,
+        registry: MetricsRegistry = REGISTRY,
+    ):
+        self.workers = workers
+        self.max_queued = max_queued
+        self.ttl = ttl
+        self.timeout = timeout
+        self.tasks: Dict[str, Callable[..., Any]] = {}
+        self.process_tasks = set()
+        # Processo filho de cada thread do pool (criado no primeiro job)
+        self._local = threading.local()
+        self._processes: List[_JobProcess] = []
+        self._jobs: Dict[str, Job] = {}
+        self._futures: Dict[str, Future] = {}
+        self._waiters: Dict[str, List[Tuple[asyncio.AbstractEventLoop, asyncio.Event]]] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        registry.gauge("jobs", "Jobs guardados por estado", ("state",), self._gauge)
+        self.duration = registry.histogram(
+            "job_duration_seconds", "Tempo de execução dos jobs (sem a fila)", ("tool", "status")
+        )
+
+    @classmethod
+    def from_env(cls) -> "JobQueue":
+        """Configurada por JOB_WORKERS, JOB_MAX_QUEUED, JOB_RESULT_TTL e JOB_TIMEOUT"""
+        return cls(
+            workers=int(os.getenv("JOB_WORKERS", "2")),
+            max_queued=int(os.getenv("JOB_MAX_QUEUED", "64")),
+            ttl=float(os.getenv("JOB_RESULT_TTL", "600")),
+            timeout=float(os.getenv("JOB_TIMEOUT", "0")) or None,
+        )
+
+    def _gauge(self) -> Dict[tuple, float]:
+        with self._lock:
+            statuses = [job.status for job in self._jobs.values()]
+        return {(state,): statuses.count(state) for state in (QUEUED, RUNNING, *FINISHED)}
+
+    def task(self, name: Optional[str] = None, process: bool = False):
+        """Registra uma função que pode rodar como job (recebe `progress=`)
+
+        Com `process=True` ela roda em um processo filho, que pode ser morto
+        no meio da conta (a função precisa estar no nível do módulo).
+        """
+
+        def decorator(fn):
+            self.tasks[name or fn.__name__] = fn
+            if process:
+                self.process_tasks.add(name or fn.__name__)
+            return fn
+
+        return decorator
+
+    def submit(self, name: str, arguments: Optional[Dict[str, Any]] = None) -> Job:
+        """Enfileira o job e devolve sem esperar a execução"""
+        fn = self.tasks.get(name)
+        if fn is None:
+            raise KeyError(f"Tarefa desconhecida: {name} (disponíveis: {', '.join(sorted(self.tasks))})")
+        # Argumentos errados falham aqui, e não depois, dentro do worker
+        inspect.signature(fn).bind(**(arguments or {}), progress=None)
+        self._purge()
+        with self._lock:
+            queued = sum(1 for job in self._jobs.values() if job.status == QUEUED)
+            if queued >= self.max_queued:
+                raise JobQueueFull(f"Fila de jobs cheia ({queued} aguardando); tente de novo mais tarde")
+            job = Job(id=uuid.uuid4().hex, name=name, arguments=dict(arguments or {}))
+            self._jobs[job.id] = job
+        future = self._futures[job.id] = self._executor.submit(self._run, fn, job)
+        future.add_done_callback(lambda _: self._futures.pop(job.id, None))
+        return job
+
+    def _run(self, fn: Callable[..., Any], job: Job) -> None:
+        if job.cancel_requested:
+            # Cancelado entre sair da fila e começar a rodar
+            self._update(job, status=CANCELLED, finished=time.time())
+            return
+        self._update(job, status=RUNNING, started=time.time())
+        start = time.perf_counter()
+        try:
+            if job.name in self.process_tasks:
+                result = self._run_in_process(fn, job)
+            else:
+                result = fn(**job.arguments, progress=Progress(self, job))
+        except JobCancelled:
+            self._update(job, status=CANCELLED, finished=time.time())
+        except Exception as exc:
+            self._update(job, status=FAILED, error=str(exc) or type(exc).__name__, finished=time.time())
+        else:
+            self._update(job, status=DONE, result=result, progress=job.total or job.progress, finished=time.time())
+        finally:
+            self.duration.observe(time.perf_counter() - start, tool=job.name, status=job.status)
+
+    def _run_in_process(self, fn: Callable[..., Any], job: Job) -> Any:
+        worker = getattr(self._local, "process", None)
+        if worker is None or not worker.alive:
+            worker = self._local.process = _JobProcess()
+            with self._lock:
+                self._processes.append(worker)
+        try:
+            return worker.run(self, fn, job)
+        except BaseException:
+            # Cancelado, fora do prazo ou com o pipe no meio de uma mensagem:
+            # o processo não serve mais para o próximo job
+            self._local.process = None
+            with self._lock:
+                if worker in self._processes:
+                    self._processes.remove(worker)
+            worker.kill()
+            raise
+
+    def _check(self, job: Job) -> None:
+        """Interrompe o job cancelado ou que passou do prazo"""
+        if job.cancel_requested:
+            raise JobCancelled(job.id)
+        if self.timeout and job.started is not None and time.time() - job.started > self.timeout:
+            raise TimeoutError(f"Job passou do prazo de {self.timeout:g}s")
+
+    def _update(self, job: Job, **changes: Any) -> None:
+        """Aplica as mudanças e acorda quem espera pelo job (em qualquer loop)"""
+        with self._lock:
+            for key, value in changes.items():
+                if key == "total" and value is None:
+                    continue
+                setattr(job, key, value)
+            job.version += 1
+            waiters = list(self._waiters.get(job.id, ()))
+        for loop, event in waiters:
+            loop.call_soon_threadsafe(event.set)
+
+    def _purge(self) -> None:
+        """Descarta jobs terminados há mais de `ttl` segundos"""
+        now = time.time()
+        with self._lock:
+            expired = [
+                job_id for job_id, job in self._jobs.items()
+                if job.finished is not None and now - job.finished > self.ttl
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
+
+    def get(self, job_id: str) -> Job:
+        self._purge()
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            raise KeyError(f"Job desconhecido ou expirado: {job_id}")
+        return job
+
+    def cancel(self, job_id: str) -> Job:
+        """Cancela o job (na fila: na hora; rodando: no próximo progress ou matando o processo)"""
+        job = self.get(job_id)
+        if job.done:
+            return job
+        job.cancel_requested = True
+        future = self._futures.get(job_id)
+        if future is not None and future.cancel():
+            self._futures.pop(job_id, None)
+            self._update(job, status=CANCELLED, finished=time.time())
+        return job
+
+    async def events(self, job_id: str, timeout: Optional[float] = None) -> AsyncIterator[Job]:
+        """Gera o job a cada mudança (progresso ou estado) até terminar ou estourar o prazo"""
+        job = self.get(job_id)
+        loop = asyncio.get_running_loop()
+        event = asyncio.Event()
+        waiter = (loop, event)
+        with self._lock:
+            self._waiters.setdefault(job_id, []).append(waiter)
+        deadline = None if timeout is None else loop.time() + timeout
+        try:
+            seen = -1
+            while True:
+                if job.version != seen:
+                    seen = job.version
+                    yield job
+                if job.done:
+                    return
+                remaining = None if deadline is None else deadline - loop.time()
+                if remaining is not None and remaining <= 0:
+                    return
+                event.clear()
+                if job.version != seen:
+                    continue
+                try:
+                    await asyncio.wait_for(event.wait(), remaining)
+                except asyncio.TimeoutError:
+                    return
+        finally:
+            with self._lock:
+                waiters = self._waiters.get(job_id, [])
+                if waiter in waiters:
+                    waiters.remove(waiter)
+                if not waiters:
+                    self._waiters.pop(job_id, None)
+
+    async def wait(
+        self,
+        job_id: str,
+        timeout: Optional[float] = None,
+        on_progress: Optional[Callable[[Job], Any]] = None,
+    ) -> Job:
+        """Espera o job terminar (ou o prazo acabar) e devolve o estado atual"""
+        job = self.get(job_id)
+        async for job in self.events(job_id, timeout):
+            if on_progress is not None and not job.done:
+                result = on_progress(job)
+                if asyncio.iscoroutine(result):
+                    await result
+        return job
+
+    def shutdown(self, wait: bool = False) -> None:
+        """Cancela o que está na fila e encerra o pool (e os processos filhos)"""
+        with self._lock:
+            pending = [job for job in self._jobs.values() if not job.done]
+        for job in pending:
+            self.cancel(job.id)
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+        with self._lock:
+            processes, self._processes = self._processes, []
+        for worker in processes:
+            worker.kill()
@@ -0,0 +1,312 @@
+"""
+Servidor MCP mínimo (stdio) só com a biblioteca padrão
+
+Importar `mcp.server.fastmcp` custa ~0,6 s (pydantic, starlette, anyio...),
+e um servidor stdio paga isso a cada processo: cada sessão do pool, cada
+cliente de linha de comando, cada reabertura após falha. Para servidores de
+ferramentas simples, `LiteMCPServer` fala o JSON-RPC do MCP diretamente:
+`initialize`, `ping`, `tools/list` e `tools/call`, uma mensagem JSON por
+linha, com a mesma interface de decorator do FastMCP.
+
+    mcp = LiteMCPServer("Math")
+
+    @mcp.tool()
+    def add(a: int, b: int) -> int:
+        return a + b
+
+    mcp.run(transport="stdio")
+
+Clientes que pedem `acceptBinary` no `_meta` recebem resultados grandes como
+recurso binário (`infra/payloads.py`). Recursos, prompts, amostragem e
+transportes HTTP continuam exigindo o SDK.
+"""
+
+import inspect
+import json
+import os
+import sys
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from infra.payloads import DEFAULT_MIN_BYTES, accepts_binary, binary_content
+
+SUPPORTED_PROTOCOL_VERSIONS = ["2024-11-05", "2025-03-26", "2025-06-18", "2025-11-25"]
+
+# Tipos de parâmetro -> tipo no JSON Schema
+_JSON_TYPES = {int: "integer", float: "number", str: "string", bool: "boolean", list: "array", dict: "object"}
+
+# Erros JSON-RPC
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+
+
+@dataclass
+class LiteRequestContext:
+    """Requisição em andamento (equivalente ao `request_ctx` do SDK)"""
+
+    request_id: Any
+    meta: Dict[str, Any] = field(default_factory=dict)
+
+
+request_ctx: ContextVar[LiteRequestContext] = ContextVar("lite_request_ctx")
+
+
+@dataclass
+class LiteTool:
+    name: str
+    fn: Callable[..., Any]
+    description: str
+    input_schema: Dict[str, Any]
+
+    def describe(self) -> Dict[str, Any]:
+        return {"name": self.name, "description": self.description, "inputSchema": self.input_schema}
+
+
+def input_schema(fn: Callable[..., Any]) -> Dict[str, Any]:
+    """JSON Schema dos argumentos a partir da assinatura da função"""
+    properties: Dict[str, Any] = {}
+    required: List[str] = []
+    for name, param in inspect.signature(fn).parameters.items():
+        spec: Dict[str, Any] = {"title": name.replace("_", " ").title()}
+        if param.annotation in _JSON_TYPES:
+            spec["type"] = _JSON_TYPES[param.annotation]
+        if param.default is inspect.Parameter.empty:
+            required.append(name)
+        else:
+            spec["default"] = param.default
+        properties[name] = spec
+    return {"type": "object", "properties": properties, "required": required}
+
+
+def _coerce(tool: LiteTool, arguments: Dict[str, Any]) -> Dict[str, Any]:
+    """Converte números enviados como texto, como a validação do FastMCP faria"""
+    coerced = dict(arguments)
+    for name, spec in tool.input_schema["properties"].items():
+        value = coerced.get(name)
+        if isinstance(value, str) and spec.get("type") in ("integer", "number"):
+            coerced[name] = int(value) if spec["type"] == "integer" else float(value)
+    return coerced
+
+
+class LiteMCPServer:
+    """Servidor de ferramentas MCP sobre stdio, sem dependências externas"""
+
+    def __init__(self, name: str, version: str = "1.0.0", binary_min_bytes: int = DEFAULT_MIN_BYTES):
+        self.name = name
+        self.version = version
+        self.binary_min_bytes = binary_min_bytes
+        self.tools: Dict[str, LiteTool] = {}
+
+    def tool(self, name: Optional[str] = None, description: Optional[str] = None):
+        """Registra uma ferramenta (mesma forma de uso de `FastMCP.tool()`)"""
+
+        def decorator(fn):
+            tool_name = name or fn.__name__
+            self.tools[tool_name] = LiteTool(
+                name=tool_name,
+                fn=fn,
+                description=description or inspect.getdoc(fn) or "",
+                input_schema=input_schema(fn),
+            )
+            return fn
+
+        return decorator
+
+    def _initialize(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        requested = params.get("protocolVersion")
+        version = requested if requested in SUPPORTED_PROTOCOL_VERSIONS else SUPPORTED_PROTOCOL_VERSIONS[-1]
+        return {
+            "protocolVersion": version,
+            "capabilities": {"tools": {"listChanged": False}},
+            "serverInfo": {"name": self.name, "version": self.version},
+        }
+
+    def _tool_result(self, tool: LiteTool, params: Dict[str, Any], value: Any) -> Dict[str, Any]:
+        if accepts_binary(params.get("_meta")):
+            content = binary_content(value, f"result://{tool.name}", self.binary_min_bytes)
+            if content is not None:
+                return {"content": [content], "isError": False}
+        text = value if isinstance(value, str) else json.dumps(value, ensure_ascii=False, default=str)
+        return {"content": [{"type": "text", "text": text}], "isError": False}
+
+    def _tool_error(self, tool: LiteTool, exc: Exception) -> Dict[str, Any]:
+        text = f"Error executing tool {tool.name}: {exc}"
+        return {"content": [{"type": "text", "text": text}], "isError": True}
+
+    def _call_tool(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        tool = self.tools.get(params.get("name"))
+        if tool is None:
+            return {"content": [{"type": "text", "text": f"Unknown tool: {params.get('name')}"}], "isError": True}
+        try:
+            return self._tool_result(tool, params, tool.fn(**_coerce(tool, params.get("arguments") or {})))
+        except Exception as exc:
+            return self._tool_error(tool, exc)
+
+    def handle(self, message: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Processa uma mensagem JSON-RPC; devolve a resposta (None para notificações)"""
+        if "id" not in message:
+            return None
+        method = message.get("method")
+        params = message.get("params") or {}
+        token = request_ctx.set(LiteRequestContext(message["id"], params.get("_meta") or {}))
+        try:
+            if method == "initialize":
+                result = self._initialize(params)
+            elif method == "ping":
+                result = {}
+            elif method == "tools/list":
+                result = {"tools": [tool.describe() for tool in self.tools.values()]}
+            elif method == "tools/call":
+                result = self._call_tool(params)
+            else:
+                error = {"code": METHOD_NOT_FOUND, "message": f"Method not found: {method}"}
+                return {"jsonrpc": "2.0", "id": message["id"], "error": error}
+        except (TypeError, ValueError) as exc:
+            error = {"code": INVALID_PARAMS, "message": str(exc)}
+            return {"jsonrpc": "2.0", "id": message["id"], "error": error}
+        finally:
+            request_ctx.reset(token)
+        return {"jsonrpc": "2.0", "id": message["id"], "result": result}
+
+    async def handle_async(self, message: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """`handle` aguardando ferramentas assíncronas (as síncronas rodam direto)"""
+        params = message.get("params") or {}
+        tool = self.tools.get(params.get("name")) if message.get("method") == "tools/call" else None
+        if tool is None or not inspect.iscoroutinefunction(tool.fn) or "id" not in message:
+            return self.handle(message)
+        token = request_ctx.set(LiteRequestContext(message["id"], params.get("_meta") or {}))
+        try:
+            value = await tool.fn(**_coerce(tool, params.get("arguments") or {}))
+            result = self._tool_result(tool, params, value)
+        except Exception as exc:
+            result = self._tool_error(tool, exc)
+        finally:
+            request_ctx.reset(token)
+        return {"jsonrpc": "2.0", "id": message["id"], "result": result}
+
+    def _messages(self, chunk: bytes, buffer: bytes):
+        """Mensagens completas do bloco lido (linhas incompletas ficam no buffer)"""
+        lines = (buffer + chunk).split(b"\n")
+        messages = []
+        for line in lines[:-1]:
+            if line.strip():
+                try:
+                    messages.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+        return messages, lines[-1]
+
+    @staticmethod
+    def _encode(responses: List[Dict[str, Any]]) -> bytes:
+        return b"".join(json.dumps(r, ensure_ascii=False).encode("utf-8") + b"\n" for r in responses)
+
+    def run(self, transport: str = "stdio", max_in_flight: int = 256, **_options: Any) -> None:
+        """Atende mensagens do stdin até o cliente fechar a entrada
+
+        O cliente pode mandar várias requisições sem esperar as respostas: tudo
+        o que chegou em uma leitura é processado e respondido em uma só escrita.
+        Com ferramentas assíncronas, as requisições rodam em paralelo (até
+        `max_in_flight`) e as respostas saem na ordem em que ficam prontas;
+        `notifications/cancelled` interrompe a requisição em andamento.
+        """
+        if transport != "stdio":
+            raise ValueError(f"LiteMCPServer só suporta stdio (pedido: {transport})")
+        if any(inspect.iscoroutinefunction(tool.fn) for tool in self.tools.values()):
+            import asyncio
+
+            asyncio.run(self._serve_async(max_in_flight))
+            return
+        stdin, stdout = sys.stdin.buffer.fileno(), sys.stdout.buffer.fileno()
+        buffer = b""
+        while True:
+            chunk = os.read(stdin, 1 << 16)
+            if not chunk:
+                break
+            messages, buffer = self._messages(chunk, buffer)
+            # Requisições canceladas pelo cliente no mesmo bloco nem chegam a rodar
+            cancelled = _cancelled_ids(messages)
+            responses = [
+                r for r in (self.handle(m) for m in messages if not _is_cancelled(m, cancelled)) if r is not None
+            ]
+            if responses:
+                _write_all(stdout, self._encode(responses))
+
+    async def _serve_async(self, max_in_flight: int) -> None:
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        stdin, stdout = sys.stdin.buffer.fileno(), sys.stdout.buffer.fileno()
+        slots = asyncio.Semaphore(max_in_flight)
+        ready: List[Dict[str, Any]] = []
+        wake = asyncio.Event()
+        tasks = set()
+
+        running: Dict[Any, Any] = {}
+
+        async def dispatch(message):
+            try:
+                response = await self.handle_async(message)
+                if response is not None:
+                    ready.append(response)
+                    wake.set()
+            finally:
+                running.pop(message.get("id"), None)
+                slots.release()
+
+        def flush():
+            batch, ready[:] = list(ready), []
+            if batch:
+                _write_all(stdout, self._encode(batch))
+
+        async def writer():
+            # As respostas prontas desde o último despertar saem em uma escrita
+            while True:
+                await wake.wait()
+                wake.clear()
+                flush()
+
+        flusher = asyncio.create_task(writer())
+        buffer = b""
+        while True:
+            chunk = await loop.run_in_executor(None, os.read, stdin, 1 << 16)
+            if not chunk:
+                break
+            messages, buffer = self._messages(chunk, buffer)
+            cancelled = _cancelled_ids(messages)
+            for request_id in cancelled:
+                # notifications/cancelled: a requisição é interrompida e fica sem resposta
+                if request_id in running:
+                    running.pop(request_id).cancel()
+            for message in messages:
+                if _is_cancelled(message, cancelled) or "method" not in message:
+                    continue
+                # Contrapressão: com max_in_flight em andamento, para de ler o stdin
+                await slots.acquire()
+                task = asyncio.create_task(dispatch(message))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+                if "id" in message:
+                    running[message["id"]] = task
+        await asyncio.gather(*tasks, return_exceptions=True)
+        flusher.cancel()
+        flush()
+
+
+def _cancelled_ids(messages: List[Dict[str, Any]]) -> set:
+    """Ids das requisições canceladas pelo cliente (`notifications/cancelled`)"""
+    return {
+        (m.get("params") or {}).get("requestId")
+        for m in messages
+        if m.get("method") == "notifications/cancelled"
+    }
+
+
+def _is_cancelled(message: Dict[str, Any], cancelled: set) -> bool:
+    return "method" in message and "id" in message and message["id"] in cancelled
+
+
+def _write_all(fd: int, data: bytes) -> None:
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view):]
@@ -0,0 +1,94 @@
+"""
+Fábrica do modelo de chat usado pelos agentes
+
+O backend é escolhido pela variável LLM_BACKEND:
+
+- azure (padrão): AzureChatOpenAI com as variáveis AZURE_OPENAI_* de sempre;
+  com LLM_RECORD_FILE definido, grava cada resposta para replay posterior.
+  As respostas em streaming trazem o uso de tokens (inclusive os servidos
+  pelo cache de prompt); LLM_STREAM_USAGE=0 desliga para versões antigas da API.
+- scripted: ScriptedChatModel (infra/scripted_llm.py), sem rede. LLM_SCRIPT
+  aponta para um JSON com as regras; sem ele, usa a política padrão.
+- replay: reproduz as respostas gravadas em LLM_REPLAY_FILE.
+
+Nos modos offline, LLM_STUB_LATENCY_MS simula o tempo até o primeiro token e
+LLM_STUB_TOKENS_PER_SEC a vazão da geração (0 = instantâneo).
+"""
+
+import json
+import os
+from typing import List
+
+AZURE_SETTINGS = {
+    "AZURE_OPENAI_ENDPOINT": ("AZURE_OPENAI_ENDPOINT",),
+    "AZURE_OPENAI_API_KEY": ("AZURE_OPENAI_API_KEY",),
+    "AZURE_OPENAI_CHAT_DEPLOYMENT_NAME": ("AZURE_OPENAI_CHAT_DEPLOYMENT_NAME", "AZURE_MODEL_NAME"),
+    "OPENAI_API_VERSION": ("OPENAI_API_VERSION",),
+}
+
+
+def llm_backend() -> str:
+    return os.getenv("LLM_BACKEND", "azure").lower()
+
+
+def missing_azure_settings() -> List[str]:
+    """Variáveis do Azure OpenAI que não foram definidas"""
+    return [
+        name for name, candidates in AZURE_SETTINGS.items()
+        if not any(os.getenv(candidate) for candidate in candidates)
+    ]
+
+
+def _azure_model(**overrides):
+    from langchain_openai import AzureChatOpenAI
+    from pydantic import SecretStr
+
+    api_key = os.getenv("AZURE_OPENAI_API_KEY")
+    overrides.setdefault("stream_usage", os.getenv("LLM_STREAM_USAGE", "1") != "0")
+    model = AzureChatOpenAI(
+        azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+        azure_deployment=os.getenv("AZURE_OPENAI_CHAT_DEPLOYMENT_NAME") or os.getenv("AZURE_MODEL_NAME"),
+        api_key=SecretStr(api_key) if api_key else None,
+        api_version=os.getenv("OPENAI_API_VERSION"),
+        **overrides,
+    )
+    record_file = os.getenv("LLM_RECORD_FILE")
+    if record_file:
+        from infra.scripted_llm import RecordingCallback
+
+        model.callbacks = [*(model.callbacks or []), RecordingCallback(record_file)]
+    return model
+
+
+def _offline_model(backend: str, **overrides):
+    from infra.scripted_llm import ScriptedChatModel, load_recordings
+
+    settings = {
+        "latency_ms": float(os.getenv("LLM_STUB_LATENCY_MS", "0")),
+        "tokens_per_second": float(os.getenv("LLM_STUB_TOKENS_PER_SEC", "0")),
+    }
+    if backend == "replay":
+        replay_file = os.getenv("LLM_REPLAY_FILE")
+        if not replay_file:
+            raise ValueError("LLM_BACKEND=replay exige LLM_REPLAY_FILE")
+        settings["recordings"] = load_recordings(replay_file)
+    script_file = os.getenv("LLM_SCRIPT")
+    if script_file:
+        with open(script_file, encoding="utf-8") as f:
+            settings["script"] = json.load(f)
+    settings.update(overrides)
+    return ScriptedChatModel(**settings)
+
+
+def create_chat_model(backend: str = None, **overrides):
+    """Cria o modelo de chat do backend configurado
+
+    `overrides` vai direto para o construtor (ex.: temperature=0 no Azure,
+    latency_ms=200 no modelo roteirizado).
+    """
+    backend = (backend or llm_backend()).lower()
+    if backend == "azure":
+        return _azure_model(**overrides)
+    if backend in ("scripted", "replay"):
+        return _offline_model(backend, **overrides)
+    raise ValueError(f"LLM_BACKEND desconhecido: {backend} (use azure, scripted ou replay)")
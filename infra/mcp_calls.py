@@ -0,0 +1,125 @@
+"""
+Chamadas a ferramentas MCP com contexto propagado
+
+`call_tool` envolve `ClientSession.call_tool` em um span de cliente e grava o
+`traceparent` (e o prazo restante, infra/deadlines.py) no `_meta` da
+requisição. `TracingInterceptor` faz o mesmo para
+as ferramentas criadas pelo `langchain_mcp_adapters`, propagando o contexto
+pelos cabeçalhos HTTP (transportes streamable_http/sse).
+"""
+
+import asyncio
+import importlib.metadata
+from datetime import timedelta
+from functools import lru_cache
+from typing import Any, Dict, Optional
+
+import httpx
+from mcp.shared.exceptions import McpError
+
+from infra.deadlines import Deadline
+from infra.tracing import Tracer, get_tracer, inject
+
+
+# O SDK não expõe o id de uma requisição: o `ClientSession` das versões 1.x
+# numera em sequência no atributo privado `_request_id`, lido antes do envio.
+# Em outra versão (ou sem o atributo) a chamada segue normalmente, só sem o
+# aviso de cancelamento ao servidor
+_SEQUENTIAL_ID_VERSIONS = ("1.",)
+
+
+@lru_cache(maxsize=1)
+def _sdk_numbers_requests() -> bool:
+    try:
+        return importlib.metadata.version("mcp").startswith(_SEQUENTIAL_ID_VERSIONS)
+    except importlib.metadata.PackageNotFoundError:
+        return False
+
+
+def _next_request_id(session) -> Optional[int]:
+    """Id que o `ClientSession` dará à próxima requisição (None se não der para saber)"""
+    if not _sdk_numbers_requests():
+        return None
+    request_id = getattr(session, "_request_id", None)
+    return request_id if isinstance(request_id, int) else None
+
+
+async def _notify_cancelled(session, request_id: int, reason: str) -> None:
+    """Avisa o servidor que a requisição foi abandonada (o SDK não faz isso)"""
+    from mcp import types
+
+    notification = types.CancelledNotification(
+        params=types.CancelledNotificationParams(requestId=request_id, reason=reason)
+    )
+    try:
+        await session.send_notification(types.ClientNotification(notification))
+    except Exception:
+        # Sessão já fechada: não há mais o que cancelar
+        pass
+
+
+async def call_tool(
+    session,
+    name: str,
+    arguments: Optional[Dict[str, Any]] = None,
+    meta: Optional[Dict[str, Any]] = None,
+    read_timeout_seconds: Optional[float] = None,
+    tracer: Optional[Tracer] = None,
+    deadline: Optional[Deadline] = None,
+):
+    """Chama uma ferramenta MCP propagando o trace e o prazo no `_meta`
+
+    Se a chamada for cancelada (ou o prazo acabar), o servidor recebe
+    `notifications/cancelled` e pode parar o trabalho.
+    """
+    tracer = tracer or get_tracer("mcp-client")
+    attributes = {"category": "mcp.client", "mcp.tool": name}
+    if deadline is not None:
+        meta = deadline.to_meta(meta)
+        remaining = deadline.remaining()
+        if remaining is not None:
+            read_timeout_seconds = min(read_timeout_seconds or remaining, remaining)
+    with tracer.span(f"mcp.call_tool {name}", kind="client", attributes=attributes) as span:
+        request_meta = inject(dict(meta or {}), span)
+        # Lido logo antes do envio: call_tool atribui o id sem ceder o loop
+        request_id = _next_request_id(session)
+        try:
+            result = await session.call_tool(
+                name,
+                arguments,
+                read_timeout_seconds=(
+                    timedelta(seconds=read_timeout_seconds) if read_timeout_seconds is not None else None
+                ),
+                meta=request_meta,
+            )
+        except asyncio.CancelledError:
+            if request_id is not None:
+                # shield: a notificação precisa sair mesmo com a tarefa cancelada
+                await asyncio.shield(_notify_cancelled(session, request_id, "cancelled"))
+            raise
+        except McpError as exc:
+            if request_id is not None and exc.error.code == httpx.codes.REQUEST_TIMEOUT:
+                await _notify_cancelled(session, request_id, "timeout")
+            raise
+        if result.isError:
+            span.status = "error"
+        return result
+
+
+class TracingInterceptor:
+    """Interceptor do langchain_mcp_adapters que cria spans e propaga o trace"""
+
+    def __init__(self, tracer: Optional[Tracer] = None):
+        self.tracer = tracer or get_tracer("mcp-client")
+
+    async def __call__(self, request, handler):
+        attributes = {
+            "category": "mcp.client",
+            "mcp.tool": request.name,
+            "mcp.server": request.server_name,
+        }
+        with self.tracer.span(
+            f"mcp.call_tool {request.name}", kind="client", attributes=attributes
+        ) as span:
+            headers = inject(dict(request.headers or {}), span)
+            return await handler(request.override(headers=headers))
@@ -0,0 +1,252 @@
+"""
+Memória de conversa com compactação para sessões longas
+
+Cada pergunta envia ao agente um contexto de tamanho limitado:
+
+    [resumo dos turnos antigos] + [últimos turnos na íntegra] + pergunta
+
+- os `keep_turns` turnos mais recentes ficam como estão;
+- os mais antigos são incorporados ao resumo um a um (incremental), por um
+  resumo extrativo barato ou, se configurado, pelo próprio LLM;
+- saídas grandes de ferramentas são guardadas uma única vez e substituídas
+  por uma referência curta (a mesma saída repetida vira a mesma referência);
+  o agente recupera a íntegra com a ferramenta `resolve_output`
+  (`memory.resolve_tool()`), e só as `max_outputs` mais recentes ficam
+  guardadas;
+- o orçamento de tokens da sessão (`token_budget`) é respeitado compactando
+  mais turnos quando necessário.
+
+Assim a latência por turno não cresce com o tamanho da sessão.
+
+    memory = ConversationMemory()
+    messages = memory.context("Quanto é 5 + 3?")
+    state = await agent.ainvoke({"messages": messages})
+    memory.add_turn(state["messages"][len(messages) - 1:])
+"""
+
+import hashlib
+import os
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage
+
+from infra.streaming import message_text
+
+Summarizer = Callable[[str, List[BaseMessage]], str]
+
+SUMMARY_HEADER = "Resumo da conversa até aqui:\n"
+
+# Ferramenta local que devolve a íntegra de uma saída referenciada
+OUTPUT_TOOL = "resolve_output"
+
+SUMMARY_PROMPT = """Atualize o resumo da conversa incorporando o novo trecho.
+Mantenha fatos, números e decisões; seja breve.
+
+Resumo atual:
+{summary}
+
+Novo trecho:
+{turn}
+"""
+
+
+def estimate_tokens(messages: List[BaseMessage]) -> int:
+    """Estimativa barata (~4 caracteres por token, mais o envelope da mensagem)"""
+    total = 0
+    for message in messages:
+        total += 4 + len(message_text(message.content)) // 4
+        for call in getattr(message, "tool_calls", None) or []:
+            total += len(str(call.get("args", ""))) // 4 + 4
+    return total
+
+
+def _render(turn: List[BaseMessage]) -> str:
+    lines = []
+    for message in turn:
+        text = message_text(message.content)
+        if isinstance(message, HumanMessage):
+            lines.append(f"Usuário: {text}")
+        elif isinstance(message, ToolMessage):
+            lines.append(f"Ferramenta {message.name or ''}: {text}")
+        elif isinstance(message, AIMessage):
+            for call in message.tool_calls:
+                lines.append(f"Chamada {call['name']}({call['args']})")
+            if text:
+                lines.append(f"Assistente: {text}")
+    return "\n".join(lines)
+
+
+def extractive_summarizer(max_chars: int = 300) -> Summarizer:
+    """Resumo sem LLM: pergunta e resposta final de cada turno, truncadas"""
+
+    def summarize(summary: str, turn: List[BaseMessage]) -> str:
+        question = next((message_text(m.content) for m in turn if isinstance(m, HumanMessage)), "")
+        answer = next(
+            (message_text(m.content) for m in reversed(turn) if isinstance(m, AIMessage) and m.content),
+            "",
+        )
+        line = f"- {question[:max_chars]} → {answer[:max_chars]}"
+        return f"{summary}\n{line}".strip()
+
+    return summarize
+
+
+def llm_summarizer(model) -> Summarizer:
+    """Resumo incremental feito pelo LLM (uma chamada por turno compactado)"""
+
+    def summarize(summary: str, turn: List[BaseMessage]) -> str:
+        prompt = SUMMARY_PROMPT.format(summary=summary or "(vazio)", turn=_render(turn))
+        return message_text(model.invoke(prompt).content).strip()
+
+    return summarize
+
+
+class ConversationMemory:
+    """Histórico de uma sessão: resumo + turnos recentes + saídas referenciadas"""
+
+    def __init__(
+        self,
+        keep_turns: int = 4,
+        token_budget: int = 3000,
+        max_tool_chars: int = 1000,
+        summarizer: Optional[Summarizer] = None,
+        max_outputs: int = 32,
+    ):
+        self.keep_turns = keep_turns
+        self.token_budget = token_budget
+        self.max_tool_chars = max_tool_chars
+        self.max_outputs = max_outputs
+        self.summarizer = summarizer or extractive_summarizer()
+        self.summary = ""
+        self.turns: List[List[BaseMessage]] = []
+        # Saídas grandes por referência, da menos para a mais recente (LRU)
+        self.blobs: "OrderedDict[str, str]" = OrderedDict()
+        self.compacted_turns = 0
+        self._summary_message: Optional[SystemMessage] = None
+
+    @classmethod
+    def from_env(cls, model=None) -> "ConversationMemory":
+        """Configuração por MEMORY_* (MEMORY_SUMMARIZER=llm usa o modelo para resumir)"""
+        use_llm = os.getenv("MEMORY_SUMMARIZER", "extractive").lower() == "llm" and model is not None
+        return cls(
+            keep_turns=int(os.getenv("MEMORY_KEEP_TURNS", "4")),
+            token_budget=int(os.getenv("MEMORY_TOKEN_BUDGET", "3000")),
+            max_tool_chars=int(os.getenv("MEMORY_MAX_TOOL_CHARS", "1000")),
+            summarizer=llm_summarizer(model) if use_llm else None,
+            max_outputs=int(os.getenv("MEMORY_MAX_OUTPUTS", "32")),
+        )
+
+    # --- Contexto enviado ao agente ---
+
+    def _prefix(self) -> List[BaseMessage]:
+        messages: List[BaseMessage] = []
+        if self.summary:
+            # Mesmo objeto enquanto o resumo não muda (o checkpointer grava só o delta)
+            content = SUMMARY_HEADER + self.summary
+            if self._summary_message is None or self._summary_message.content != content:
+                self._summary_message = SystemMessage(content=content)
+            messages.append(self._summary_message)
+        for turn in self.turns:
+            messages.extend(turn)
+        return messages
+
+    def context(self, question: str) -> List[BaseMessage]:
+        """Mensagens para a próxima pergunta, dentro do orçamento de tokens"""
+        question_tokens = estimate_tokens([HumanMessage(content=question)])
+        while self.turns and estimate_tokens(self._prefix()) + question_tokens > self.token_budget:
+            self._compact_oldest()
+        return self._prefix() + [HumanMessage(content=question)]
+
+    def add_turn(self, turn: List[BaseMessage]) -> None:
+        """Registra as mensagens do turno (pergunta, chamadas, resultados e resposta)"""
+        self.turns.append([self._dedupe(message) for message in turn])
+        while len(self.turns) > self.keep_turns:
+            self._compact_oldest()
+
+    def add_exchange(self, question: str, answer: str) -> None:
+        """Registra um turno respondido sem o agente (ex.: vindo do cache)"""
+        self.add_turn([HumanMessage(content=question), AIMessage(content=answer)])
+
+    def restore(self, messages: List[BaseMessage]) -> None:
+        """Reconstrói a memória a partir do estado salvo de uma sessão (checkpoint)"""
+        self.summary, self.turns = "", []
+        for message in messages:
+            if isinstance(message, SystemMessage) and message_text(message.content).startswith(SUMMARY_HEADER):
+                self.summary = message_text(message.content)[len(SUMMARY_HEADER):]
+                self._summary_message = message
+            elif isinstance(message, HumanMessage) or not self.turns:
+                self.turns.append([message])
+            else:
+                self.turns[-1].append(message)
+        while len(self.turns) > self.keep_turns:
+            self._compact_oldest()
+
+    # --- Compactação ---
+
+    def _compact_oldest(self) -> None:
+        turn = self.turns.pop(0)
+        self.summary = self.summarizer(self.summary, turn)
+        self.compacted_turns += 1
+        # O resumo ocupa no máximo ~1/4 do orçamento (4 caracteres por token)
+        limit = self.token_budget
+        if len(self.summary) > limit:
+            self.summary = "…" + self.summary[-limit:]
+
+    def _dedupe(self, message: BaseMessage) -> BaseMessage:
+        if not isinstance(message, ToolMessage):
+            return message
+        text = message_text(message.content)
+        if len(text) <= self.max_tool_chars:
+            return message
+        ref = hashlib.sha256(text.encode("utf-8")).hexdigest()[:12]
+        self.blobs[ref] = text
+        self.blobs.move_to_end(ref)
+        while len(self.blobs) > self.max_outputs:
+            self.blobs.popitem(last=False)
+        preview = text[: self.max_tool_chars // 4]
+        content = (
+            f"[saída {ref} guardada fora do contexto: {len(text)} caracteres; "
+            f"íntegra com {OUTPUT_TOOL}(\"{ref}\")] {preview}…"
+        )
+        return message.model_copy(update={"content": content})
+
+    def resolve(self, ref: str) -> Optional[str]:
+        """Conteúdo completo de uma saída referenciada (None se já foi descartada)"""
+        text = self.blobs.get(ref)
+        if text is not None:
+            self.blobs.move_to_end(ref)
+        return text
+
+    def resolve_tool(self):
+        """Ferramenta `resolve_output(ref)` para o agente recuperar uma saída guardada"""
+        from langchain_core.tools import StructuredTool
+
+        def resolve_output(ref: str) -> str:
+            text = self.resolve(ref.strip())
+            if text is None:
+                return f"Saída {ref} não está mais guardada; chame a ferramenta original de novo"
+            return text
+
+        return StructuredTool.from_function(
+            resolve_output,
+            name=OUTPUT_TOOL,
+            description=(
+                "Devolve a íntegra de uma saída de ferramenta que aparece no histórico "
+                "como [saída <ref> guardada fora do contexto]."
+            ),
+        )
+
+    def fingerprint(self) -> str:
+        """Identifica o contexto atual (para não reaproveitar respostas fora dele)"""
+        if not self.turns and not self.summary:
+            return ""
+        return hashlib.sha256(_render(self._prefix()).encode("utf-8")).hexdigest()[:16]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "turns": len(self.turns),
+            "compacted_turns": self.compacted_turns,
+            "context_tokens": estimate_tokens(self._prefix()),
+            "stored_outputs": len(self.blobs),
+        }
@@ -0,0 +1,519 @@
+"""
+Métricas no formato de exposição do Prometheus
+
+Implementação enxuta (apenas biblioteca padrão) de contadores, gauges e
+histogramas no estilo HDR: os buckets são log-lineares, com `sub_buckets`
+subdivisões por potência de 2, então o erro relativo dos percentis fica
+limitado a 1/sub_buckets independentemente da escala da latência.
+
+Uso típico:
+
+    from infra.metrics import REGISTRY, ToolMetrics
+
+    tool_metrics = ToolMetrics(REGISTRY, "gateway")
+    with tool_metrics.track("add") as call:
+        with call.phase("backend"):
+            ...
+    print(REGISTRY.render())
+"""
+
+import atexit
+import glob
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+LabelValues = Tuple[str, ...]
+
+# Fases em que o tempo de uma chamada de ferramenta é decomposto
+PHASES = ("queue", "session_acquire", "backend", "serialization")
+
+QUANTILES = (0.5, 0.9, 0.95, 0.99, 0.999)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    """Contador monotônico"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def get(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> Dict[LabelValues, float]:
+        with self._lock:
+            return dict(self._values)
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for key, value in sorted(self.samples().items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    """Valor instantâneo; aceita uma função para cálculo sob demanda"""
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        callback: Optional[Callable[[], Dict[LabelValues, float]]] = None,
+    ):
+        super().__init__(name, help, labelnames)
+        self.callback = callback
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def samples(self) -> Dict[LabelValues, float]:
+        if self.callback is not None:
+            return dict(self.callback())
+        return super().samples()
+
+
+class _HistogramSeries:
+    __slots__ = ("counts", "count", "sum", "min", "max")
+
+    def __init__(self, size: int):
+        self.counts = [0] * size
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+
+class Histogram(_Metric):
+    """Histograma log-linear (estilo HDR) com percentis de erro limitado"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        lowest: float = 1e-6,
+        highest: float = 120.0,
+        sub_buckets: int = 8,
+    ):
+        super().__init__(name, help, labelnames)
+        self.lowest = lowest
+        self.highest = highest
+        self.sub_buckets = sub_buckets
+        self._min_exp = math.frexp(lowest)[1]
+        self._max_exp = math.frexp(highest)[1]
+        self._size = (self._max_exp - self._min_exp + 1) * sub_buckets
+        self._series: Dict[LabelValues, _HistogramSeries] = {}
+
+    def _index(self, value: float) -> int:
+        if value <= 0:
+            return 0
+        mantissa, exp = math.frexp(value)  # value = mantissa * 2**exp, 0.5 <= mantissa < 1
+        if exp < self._min_exp:
+            return 0
+        if exp > self._max_exp:
+            return self._size - 1
+        sub = int((mantissa * 2 - 1) * self.sub_buckets)
+        return (exp - self._min_exp) * self.sub_buckets + min(sub, self.sub_buckets - 1)
+
+    def upper_bound(self, index: int) -> float:
+        exp, sub = divmod(index, self.sub_buckets)
+        return math.ldexp(1 + (sub + 1) / self.sub_buckets, exp + self._min_exp - 1)
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _HistogramSeries(self._size)
+            series.counts[self._index(value)] += 1
+            series.count += 1
+            series.sum += value
+            series.min = min(series.min, value)
+            series.max = max(series.max, value)
+
+    @contextmanager
+    def time(self, **labels: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def quantile(self, q: float, **labels: str) -> float:
+        series = self._series.get(self._key(labels))
+        return self._quantile(series, q) if series else 0.0
+
+    def _quantile(self, series: _HistogramSeries, q: float) -> float:
+        if not series.count:
+            return 0.0
+        rank = q * series.count
+        seen = 0
+        for index, count in enumerate(series.counts):
+            seen += count
+            if count and seen >= rank:
+                return min(max(self.upper_bound(index), series.min), series.max)
+        return series.max
+
+    def count(self, **labels: str) -> int:
+        series = self._series.get(self._key(labels))
+        return series.count if series else 0
+
+    def snapshot(self) -> Dict[LabelValues, Dict[str, object]]:
+        with self._lock:
+            return {
+                key: {
+                    "counts": list(series.counts),
+                    "count": series.count,
+                    "sum": series.sum,
+                    "min": series.min,
+                    "max": series.max,
+                }
+                for key, series in self._series.items()
+            }
+
+    def merge(self, key: LabelValues, snapshot: Dict[str, object]) -> None:
+        """Soma a série de outro processo (mesma configuração de buckets)"""
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _HistogramSeries(self._size)
+            series.counts = [a + b for a, b in zip(series.counts, snapshot["counts"])]
+            series.count += snapshot["count"]
+            series.sum += snapshot["sum"]
+            series.min = min(series.min, snapshot["min"])
+            series.max = max(series.max, snapshot["max"])
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        summary = [f"# TYPE {self.name}_quantiles summary"]
+        with self._lock:
+            items = sorted(self._series.items())
+            for key, series in items:
+                # Exporta os limites de cada potência de 2 (exatos em relação aos buckets finos)
+                cumulative = 0
+                for index, count in enumerate(series.counts):
+                    cumulative += count
+                    if (index + 1) % self.sub_buckets == 0 and cumulative:
+                        le = _format_value(self.upper_bound(index))
+                        labels = _format_labels(self.labelnames, key, f'le="{le}"')
+                        lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+                lines.append(f"{self.name}_bucket{labels} {series.count}")
+                plain = _format_labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{plain} {_format_value(series.sum)}")
+                lines.append(f"{self.name}_count{plain} {series.count}")
+                for q in QUANTILES:
+                    labels = _format_labels(self.labelnames, key, f'quantile="{q}"')
+                    value = _format_value(self._quantile(series, q))
+                    summary.append(f"{self.name}_quantiles{labels} {value}")
+        return lines + (summary if items else [])
+
+
+class MetricsRegistry:
+    """Conjunto de métricas de um processo"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, help, labelnames)
+
+    def gauge(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        callback: Optional[Callable[[], Dict[LabelValues, float]]] = None,
+    ) -> Gauge:
+        return self._get_or_create(Gauge, name, help, labelnames, callback)
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (), **kwargs) -> Histogram:
+        return self._get_or_create(Histogram, name, help, labelnames, **kwargs)
+
+    def names(self) -> List[str]:
+        with self._lock:
+            return list(self._metrics)
+
+    def metrics(self) -> Iterable[_Metric]:
+        with self._lock:
+            return list(self._metrics.values())
+
+    def render(self) -> str:
+        """Gera o texto no formato de exposição do Prometheus (0.0.4)"""
+        lines: List[str] = []
+        for metric in sorted(self.metrics(), key=lambda m: m.name):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def dump(self) -> Dict[str, dict]:
+        """Estado serializável (JSON) das métricas, para agregar entre processos"""
+        data: Dict[str, dict] = {}
+        for metric in self.metrics():
+            entry = {"kind": metric.kind, "help": metric.help, "labels": list(metric.labelnames)}
+            if isinstance(metric, Histogram):
+                entry["options"] = {
+                    "lowest": metric.lowest,
+                    "highest": metric.highest,
+                    "sub_buckets": metric.sub_buckets,
+                }
+                entry["samples"] = [[list(k), v] for k, v in metric.snapshot().items()]
+            else:
+                entry["samples"] = [[list(k), v] for k, v in metric.samples().items()]
+            data[metric.name] = entry
+        return data
+
+    def merge(self, data: Dict[str, dict], worker: str, gauges: bool = True) -> None:
+        """Incorpora o `dump()` de outro processo
+
+        Contadores e histogramas são somados; gauges não podem ser somados
+        sem conhecer o significado, então ganham o rótulo `worker`.
+        """
+        for name, entry in data.items():
+            labels = tuple(entry["labels"])
+            if entry["kind"] == "histogram":
+                metric = self.histogram(name, entry["help"], labels, **entry["options"])
+                for key, snapshot in entry["samples"]:
+                    metric.merge(tuple(key), snapshot)
+            elif entry["kind"] == "gauge":
+                if gauges:
+                    metric = self.gauge(name, entry["help"], labels + ("worker",))
+                    for key, value in entry["samples"]:
+                        metric.set(value, **dict(zip(labels, key)), worker=worker)
+            else:
+                metric = self.counter(name, entry["help"], labels)
+                for key, value in entry["samples"]:
+                    metric.inc(value, **dict(zip(labels, key)))
+
+    def write_textfile(self, path: str) -> None:
+        """Grava as métricas de forma atômica (coletor textfile do node_exporter)"""
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+
+
+REGISTRY = MetricsRegistry()
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _cache_hit_ratio(requests: Counter) -> Callable[[], Dict[LabelValues, float]]:
+    def hit_ratio() -> Dict[LabelValues, float]:
+        totals: Dict[str, List[float]] = {}
+        for (name, result), value in requests.samples().items():
+            hits_total = totals.setdefault(name, [0.0, 0.0])
+            hits_total[1] += value
+            if result == "hit":
+                hits_total[0] += value
+        return {(name,): hits / total for name, (hits, total) in totals.items() if total}
+
+    return hit_ratio
+
+
+def record_cache(cache: str, hit: bool, registry: MetricsRegistry = REGISTRY) -> None:
+    """Registra um acerto/erro de cache; a taxa de acerto é exportada como gauge"""
+    requests = registry.counter(
+        "cache_requests_total", "Consultas a caches por resultado", ("cache", "result")
+    )
+    requests.inc(cache=cache, result="hit" if hit else "miss")
+    if "cache_hit_ratio" not in registry.names():
+        registry.gauge(
+            "cache_hit_ratio", "Taxa de acerto por cache", ("cache",), _cache_hit_ratio(requests)
+        )
+
+
+class _CallTracker:
+    """Acumula o tempo de cada fase de uma chamada de ferramenta"""
+
+    def __init__(self, metrics: "ToolMetrics", tool: str):
+        self._metrics = metrics
+        self.tool = tool
+        self.phases: Dict[str, float] = {}
+
+    def record(self, name: str, elapsed: float) -> None:
+        self.phases[name] = self.phases.get(name, 0.0) + elapsed
+        self._metrics.phase_seconds.observe(elapsed, tool=self.tool, phase=name)
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+
+class ToolMetrics:
+    """Contagens, erros e latências (total e por fase) de chamadas de ferramentas"""
+
+    def __init__(self, registry: MetricsRegistry, prefix: str):
+        self.calls = registry.counter(
+            f"{prefix}_tool_calls_total", "Chamadas de ferramentas", ("tool",)
+        )
+        self.errors = registry.counter(
+            f"{prefix}_tool_errors_total", "Chamadas de ferramentas com erro", ("tool",)
+        )
+        self.latency = registry.histogram(
+            f"{prefix}_tool_latency_seconds", "Latência total das chamadas", ("tool",)
+        )
+        self.phase_seconds = registry.histogram(
+            f"{prefix}_tool_phase_seconds",
+            "Latência por fase (queue, session_acquire, backend, serialization)",
+            ("tool", "phase"),
+        )
+
+    @contextmanager
+    def track(self, tool: str):
+        tracker = _CallTracker(self, tool)
+        start = time.perf_counter()
+        self.calls.inc(tool=tool)
+        try:
+            yield tracker
+        except BaseException:
+            self.errors.inc(tool=tool)
+            raise
+        finally:
+            self.latency.observe(time.perf_counter() - start, tool=tool)
+
+
+def start_textfile_exporter(
+    path: str, interval: float = 5.0, registry: MetricsRegistry = REGISTRY
+) -> threading.Thread:
+    """Grava as métricas periodicamente em `path` (para processos sem HTTP, ex.: stdio)"""
+
+    def loop():
+        while True:
+            time.sleep(interval)
+            try:
+                registry.write_textfile(path)
+            except OSError:
+                pass
+
+    atexit.register(registry.write_textfile, path)
+    thread = threading.Thread(target=loop, name="metrics-textfile", daemon=True)
+    thread.start()
+    return thread
+
+
+# --- Vários processos (workers do gateway) ---
+
+# Diretório onde cada worker publica o seu estado; definido pelo supervisor (infra/serve.py)
+WORKERS_DIR_ENV = "WORKER_METRICS_DIR"
+
+
+def _write_json(path: str, data: dict) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def start_worker_exporter(
+    directory: str, worker: str, interval: float = 2.0, registry: MetricsRegistry = REGISTRY
+) -> threading.Thread:
+    """Publica periodicamente o `dump()` deste worker em `directory`
+
+    Ao sair, grava um estado final: os contadores continuam somados na visão
+    agregada, mas os gauges do worker encerrado deixam de aparecer.
+    """
+    path = os.path.join(directory, f"worker-{worker}-{os.getpid()}.json")
+
+    def publish(final: bool = False):
+        try:
+            _write_json(path, {"worker": worker, "final": final, "metrics": registry.dump()})
+        except OSError:
+            pass
+
+    def loop():
+        while True:
+            time.sleep(interval)
+            publish()
+
+    publish()
+    atexit.register(publish, True)
+    thread = threading.Thread(target=loop, name="metrics-worker", daemon=True)
+    thread.start()
+    return thread
+
+
+def render_metrics(registry: MetricsRegistry = REGISTRY) -> str:
+    """Métricas do processo ou, com vários workers, a soma de todos eles"""
+    directory = os.getenv(WORKERS_DIR_ENV)
+    if not directory:
+        return registry.render()
+    own = f"-{os.getpid()}.json"
+    merged = MetricsRegistry()
+    for path in sorted(glob.glob(os.path.join(directory, "worker-*.json"))):
+        if path.endswith(own):
+            continue
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        merged.merge(data["metrics"], data["worker"], gauges=not data["final"])
+    # O próprio worker entra com o estado atual, não com o último publicado
+    merged.merge(registry.dump(), os.getenv("WORKER_ID", str(os.getpid())))
+    return merged.render()
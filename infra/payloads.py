@@ -0,0 +1,242 @@
+"""
+Resultados binários de ferramentas MCP
+
+Por padrão todo resultado vira texto no servidor (`str(valor)`), é escapado
+em JSON a cada salto e convertido de volta no gateway. Para resultados
+grandes (inteiros enormes, listas de números, tabelas) isso custa CPU e
+cópias, e inteiros com mais de 4300 dígitos nem podem virar texto sem mudar
+`sys.set_int_max_str_digits`.
+
+O canal binário é opcional e negociado por chamada: o cliente pede com
+`_meta = {"acceptBinary": true}` e o servidor, se o valor codificado passar
+de `min_bytes`, devolve um recurso embutido (`type: "resource"` com `blob`)
+em vez de texto. Formatos:
+
+- `application/x-mcp-int`: inteiro com sinal, little-endian;
+- `application/x-mcp-array;type=q|d`: lista de int64/float64 (`array`);
+- `application/vnd.apache.arrow.stream`: tabela (dict de colunas), se o
+  `pyarrow` estiver instalado;
+- `application/x-msgpack`: demais estruturas, se o `msgpack` estiver
+  instalado.
+
+Do lado do cliente, `Payload` decodifica o base64 uma vez e guarda um
+`memoryview`; o gateway repassa fatias dele sem recodificar, e o texto só é
+gerado quando alguém precisa dele (`Payload.text()`, ex.: para o LLM).
+"""
+
+import base64
+import functools
+import inspect
+import json
+import sys
+from array import array
+from decimal import Decimal
+from typing import Any, Dict, Optional, Tuple
+
+ACCEPT_META = "acceptBinary"
+
+INT_MIME = "application/x-mcp-int"
+ARRAY_MIME = "application/x-mcp-array"
+ARROW_MIME = "application/vnd.apache.arrow.stream"
+MSGPACK_MIME = "application/x-msgpack"
+
+# Abaixo disso o texto é mais barato que o recurso (base64 + metadados)
+DEFAULT_MIN_BYTES = 4096
+
+
+def accepts_binary(meta: Optional[Any]) -> bool:
+    """O cliente pediu resultados binários no `_meta` da requisição?"""
+    if meta is None:
+        return False
+    if hasattr(meta, "get"):
+        return bool(meta.get(ACCEPT_META))
+    # Modelo pydantic do SDK: campos extras ficam em model_extra
+    return bool((getattr(meta, "model_extra", None) or {}).get(ACCEPT_META))
+
+
+def _int_bytes(value: int) -> bytes:
+    return value.to_bytes((value.bit_length() + 8) // 8, "little", signed=True)
+
+
+def _numeric_array(values: list) -> Optional[array]:
+    if not values or any(isinstance(v, bool) or not isinstance(v, (int, float)) for v in values):
+        return None
+    typecode = "q" if all(isinstance(v, int) for v in values) else "d"
+    try:
+        packed = array(typecode, values)
+    except OverflowError:
+        return None
+    if sys.byteorder == "big":
+        packed.byteswap()
+    return packed
+
+
+def _arrow_bytes(columns: Dict[str, list]) -> Optional[bytes]:
+    try:
+        import pyarrow as pa
+    except ImportError:
+        return None
+    table = pa.table(columns)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def _msgpack_bytes(value: Any) -> Optional[bytes]:
+    try:
+        import msgpack
+    except ImportError:
+        return None
+    try:
+        return msgpack.packb(value, use_bin_type=True)
+    except (TypeError, OverflowError):
+        return None
+
+
+def encode(value: Any) -> Optional[Tuple[str, bytes]]:
+    """(mime, bytes) do valor, ou None se não houver formato binário para ele"""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return INT_MIME, _int_bytes(value)
+    if isinstance(value, list):
+        packed = _numeric_array(value)
+        if packed is not None:
+            return f"{ARRAY_MIME};type={packed.typecode}", packed.tobytes()
+    if isinstance(value, dict) and value and all(isinstance(c, list) for c in value.values()):
+        data = _arrow_bytes(value)
+        if data is not None:
+            return ARROW_MIME, data
+    data = _msgpack_bytes(value)
+    return (MSGPACK_MIME, data) if data is not None else None
+
+
+def binary_content(value: Any, uri: str, min_bytes: int = DEFAULT_MIN_BYTES) -> Optional[Dict[str, Any]]:
+    """Conteúdo MCP `resource` com o valor em binário, se valer a pena"""
+    encoded = encode(value)
+    if encoded is None or len(encoded[1]) < min_bytes:
+        return None
+    mime, data = encoded
+    return {
+        "type": "resource",
+        "resource": {"uri": uri, "mimeType": mime, "blob": base64.b64encode(data).decode("ascii")},
+    }
+
+
+def binary_result(min_bytes: int = DEFAULT_MIN_BYTES):
+    """Decorator para ferramentas do fastmcp: resultado grande vira recurso binário
+
+    A ferramenta precisa ser registrada com `output_schema=None` (um resultado
+    binário não tem `structuredContent`):
+
+        @server.tool(output_schema=None)
+        @binary_result()
+        @instrument_tool(tool_metrics, tracer)
+        def factorial(n: int) -> int:
+            ...
+    """
+
+    def convert(fn, value):
+        from infra.instrumentation import request_meta
+
+        if not accepts_binary(request_meta()):
+            return value
+        content = binary_content(value, f"result://{fn.__name__}", min_bytes)
+        if content is None:
+            return value
+        from fastmcp.tools.tool import ToolResult
+        from mcp.types import EmbeddedResource
+
+        return ToolResult(content=[EmbeddedResource.model_validate(content)])
+
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                return convert(fn, await fn(*args, **kwargs))
+
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            return convert(fn, fn(*args, **kwargs))
+
+        return wrapper
+
+    return decorator
+
+
+def _int_text(value: int) -> str:
+    try:
+        return str(value)
+    except ValueError:
+        # Acima do limite de dígitos de int -> str do CPython; Decimal converte
+        # inteiros de forma exata e não tem esse limite
+        return str(Decimal(value))
+
+
+class Payload:
+    """Resultado binário decodificado uma única vez, exposto como memoryview"""
+
+    def __init__(self, mime: str, data: memoryview):
+        self.mime = mime
+        self.data = data
+
+    @classmethod
+    def from_resource(cls, resource: Any) -> "Payload":
+        return cls(resource.mimeType, memoryview(base64.b64decode(resource.blob)))
+
+    @property
+    def nbytes(self) -> int:
+        return self.data.nbytes
+
+    def value(self) -> Any:
+        """Valor Python (arrays viram memoryview tipado, sem cópia)"""
+        if self.mime == INT_MIME:
+            return int.from_bytes(self.data, "little", signed=True)
+        if self.mime.startswith(ARRAY_MIME):
+            typecode = self.mime.partition("type=")[2] or "q"
+            if sys.byteorder == "big":
+                swapped = array(typecode, self.data.tobytes())
+                swapped.byteswap()
+                return memoryview(swapped)
+            return self.data.cast(typecode)
+        if self.mime == ARROW_MIME:
+            import pyarrow as pa
+
+            return pa.ipc.open_stream(pa.py_buffer(self.data)).read_all()
+        if self.mime == MSGPACK_MIME:
+            import msgpack
+
+            return msgpack.unpackb(self.data, raw=False)
+        raise ValueError(f"Formato binário desconhecido: {self.mime}")
+
+    def text(self) -> str:
+        """Texto do valor, gerado só na fronteira com quem precisa de texto"""
+        value = self.value()
+        if isinstance(value, int):
+            return _int_text(value)
+        if isinstance(value, memoryview):
+            return json.dumps(value.tolist())
+        if self.mime == ARROW_MIME:
+            return json.dumps(value.to_pylist(), ensure_ascii=False, default=str)
+        return json.dumps(value, ensure_ascii=False, default=str)
+
+
+def result_payload(result: Any) -> Optional[Payload]:
+    """Payload binário de um `CallToolResult`, se ele trouxer um"""
+    for block in result.content or []:
+        resource = getattr(block, "resource", None)
+        if getattr(block, "type", None) == "resource" and getattr(resource, "blob", None) is not None:
+            return Payload.from_resource(resource)
+    return None
+
+
+def result_text(result: Any) -> str:
+    """Texto de um `CallToolResult`, materializando o payload binário se houver"""
+    payload = result_payload(result)
+    if payload is not None:
+        return payload.text()
+    return result.content[0].text if result.content else "No result"
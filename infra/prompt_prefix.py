@@ -0,0 +1,68 @@
+"""
+Prefixo de prompt estável para o cache de prompt do provedor
+
+O Azure OpenAI reaproveita o processamento do início do prompt (definições
+de ferramentas e mensagens iniciais) quando os bytes são idênticos aos de
+uma requisição recente: menos custo e menos tempo até o primeiro token. Uma
+ferramenta fora de ordem ou uma chave de schema trocada de lugar invalida o
+cache de tudo o que vem depois. Aqui ficam as regras de montagem:
+
+- `canonical_tools`: ferramentas ordenadas pelo nome, schemas JSON com as
+  chaves ordenadas e descrições normalizadas, não importa a ordem em que os
+  servidores MCP foram descobertos;
+- `system_prompt`: seções fixas (instruções, esquema do banco) normalizadas
+  em um único texto, para virem logo depois das ferramentas;
+- o que muda a cada turno (resumo da conversa, histórico, pergunta) vai por
+  último, nas mensagens.
+
+A fração da entrada servida pelo cache aparece no `TurnTimingCallback`
+(`agent_prompt_tokens_total{kind="cached"}`).
+"""
+
+import json
+from typing import Any, List, Sequence
+
+
+def normalize_text(text: str) -> str:
+    """Quebras de linha `\\n`, sem espaços no fim das linhas nem nas pontas"""
+    lines = text.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    return "\n".join(line.rstrip() for line in lines).strip()
+
+
+def canonical_schema(value: Any) -> Any:
+    """Schema JSON com as chaves ordenadas (e `required` em ordem alfabética)"""
+    if isinstance(value, dict):
+        result = {}
+        for key in sorted(value):
+            item = canonical_schema(value[key])
+            if key == "required" and isinstance(item, list):
+                item = sorted(item)
+            elif key == "description" and isinstance(item, str):
+                item = normalize_text(item)
+            result[key] = item
+        return result
+    if isinstance(value, list):
+        return [canonical_schema(item) for item in value]
+    return value
+
+
+def canonical_tools(tools: Sequence[Any]) -> List[Any]:
+    """Cópias das ferramentas em ordem e formato canônicos (as originais não mudam)"""
+    result = []
+    for tool in sorted(tools, key=lambda tool: tool.name):
+        update = {}
+        description = normalize_text(tool.description or "")
+        if description != tool.description:
+            update["description"] = description
+        # Ferramentas MCP trazem o inputSchema do servidor como dict
+        if isinstance(tool.args_schema, dict):
+            schema = canonical_schema(tool.args_schema)
+            if json.dumps(schema) != json.dumps(tool.args_schema):
+                update["args_schema"] = schema
+        result.append(tool.model_copy(update=update) if update else tool)
+    return result
+
+
+def system_prompt(*sections: str) -> str:
+    """Seções fixas do prompt de sistema, normalizadas e separadas por linha em branco"""
+    return "\n\n".join(normalize_text(section) for section in sections if section and section.strip())
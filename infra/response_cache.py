@@ -0,0 +1,296 @@
+"""
+Cache de respostas dos agentes para perguntas em linguagem natural
+
+Perguntas repetidas ("Quantos funcionários existem?") são respondidas sem
+rodar o loop LLM + ferramentas. A busca tem dois níveis:
+
+1. exato: pergunta normalizada (minúsculas, sem acentos, sem pontuação);
+2. semântico (opcional): similaridade de cosseno entre embeddings locais,
+   guardados no próprio SQLite, acima de `similarity`. Só vale se as duas
+   perguntas têm as mesmas âncoras (números, trechos entre aspas e nomes
+   próprios): "faixas de Rock" nunca responde "faixas de Jazz".
+
+Cada entrada pertence a um escopo (ex.: a versão do banco consultado), então
+uma mudança nos dados invalida as respostas antigas. Há TTL e despejo LRU
+limitado a `max_entries` por escopo. O valor guardado é a resposta final e o
+rastro das ferramentas usadas para chegar nela.
+"""
+
+import hashlib
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional
+
+from infra.metrics import REGISTRY, MetricsRegistry, record_cache
+
+_STOPWORDS = {
+    "a", "o", "as", "os", "de", "do", "da", "dos", "das", "e", "um", "uma",
+    "por", "favor", "me", "que", "em", "no", "na", "the", "of", "please",
+}
+
+
+def normalize_question(question: str) -> str:
+    """Forma canônica da pergunta usada como chave exata"""
+    text = unicodedata.normalize("NFKD", question.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    words = re.findall(r"\w+", text)
+    return " ".join(w for w in words if w not in _STOPWORDS)
+
+
+def file_version(path: str) -> str:
+    """Versão de um arquivo de dados (mtime + tamanho); muda a cada escrita"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return "missing"
+    return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+
+_QUOTED = re.compile(r"[\"“«]([^\"“”«»]+)[\"”»]")
+_NUMBER = re.compile(r"\d+(?:[.,]\d+)*")
+
+
+def question_anchors(question: str) -> tuple:
+    """Números (em ordem), trechos entre aspas e nomes próprios da pergunta
+
+    Duas perguntas que diferem só nesses tokens ("2012" vs. "2013", "Rock"
+    vs. "Jazz", "10 menos 3" vs. "3 menos 10") têm respostas diferentes, por
+    mais parecidas que sejam no resto. A primeira palavra só conta como nome
+    se não for uma palavra comum capitalizada ("AC/DC" conta, "Quantos" não).
+    """
+    numbers = tuple(number.replace(",", ".") for number in _NUMBER.findall(question))
+    anchors = {match.strip().casefold() for match in _QUOTED.findall(question)}
+    for position, token in enumerate(re.findall(r"[^\s,;:?!()\"“”«»]+", question)):
+        token = token.rstrip(".")
+        if not token or not token[0].isupper():
+            continue
+        ordinary = token.isalpha() and token[1:].islower()
+        if position == 0 and ordinary:
+            continue
+        anchors.add(token.casefold())
+    return numbers, frozenset(anchors)
+
+
+class HashingEmbedder:
+    """Embedding local por hashing de n-gramas de caracteres (sem modelo nem rede)
+
+    Mede sobreposição de letras, não de sentido: "liste os artistas" vs.
+    "listar todos os artistas" fica em ~0.70, enquanto perguntas que só
+    trocam um número ou um nome passam de 0.85. Por isso o cache exige as
+    mesmas âncoras (`question_anchors`) antes de aceitar um vizinho.
+    Qualquer objeto com `embed_query(text)` (ex.: um Embeddings do
+    LangChain) pode ser usado no lugar.
+    """
+
+    def __init__(self, dimensions: int = 256, ngram: int = 3):
+        self.dimensions = dimensions
+        self.ngram = ngram
+
+    def embed_query(self, text: str) -> List[float]:
+        vector = [0.0] * self.dimensions
+        for word in normalize_question(text).split():
+            padded = f" {word} "
+            for i in range(max(1, len(padded) - self.ngram + 1)):
+                digest = hashlib.blake2b(padded[i:i + self.ngram].encode(), digest_size=4).digest()
+                bucket = int.from_bytes(digest, "little")
+                vector[bucket % self.dimensions] += 1.0 if bucket & 0x80000000 else -1.0
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+
+def _cosine(a: Iterable[float], b: Iterable[float]) -> float:
+    dot = norm_a = norm_b = 0.0
+    for x, y in zip(a, b):
+        dot += x * y
+        norm_a += x * x
+        norm_b += y * y
+    return dot / math.sqrt(norm_a * norm_b) if norm_a and norm_b else 0.0
+
+
+@dataclass
+class CachedResponse:
+    """Resposta servida pelo cache"""
+
+    question: str
+    answer: str
+    tool_trace: List[Dict[str, Any]] = field(default_factory=list)
+    similarity: float = 1.0
+    age: float = 0.0
+
+    def format(self) -> str:
+        tools = " → ".join(step["tool"] for step in self.tool_trace) or "nenhuma"
+        return (
+            f"⚡ Cache: similaridade {self.similarity:.2f} | idade {self.age:.0f}s | "
+            f"ferramentas: {tools}"
+        )
+
+
+def tool_trace_from_messages(messages: List[Any]) -> List[Dict[str, Any]]:
+    """Extrai [{tool, args, result}] das mensagens de um agente LangGraph"""
+    calls: Dict[str, Dict[str, Any]] = {}
+    trace: List[Dict[str, Any]] = []
+    for message in messages:
+        for call in getattr(message, "tool_calls", None) or []:
+            entry = {"tool": call["name"], "args": call.get("args", {}), "result": None}
+            calls[call.get("id")] = entry
+            trace.append(entry)
+        if getattr(message, "type", None) == "tool":
+            entry = calls.get(getattr(message, "tool_call_id", None))
+            if entry is not None:
+                entry["result"] = str(message.content)
+    return trace
+
+
+def tool_trace_from_steps(steps: List[Any]) -> List[Dict[str, Any]]:
+    """Extrai [{tool, args, result}] dos intermediate_steps de um AgentExecutor"""
+    return [
+        {"tool": action.tool, "args": action.tool_input, "result": str(observation)}
+        for action, observation in steps
+    ]
+
+
+class ResponseCache:
+    """Cache persistente (SQLite) de respostas com TTL, LRU e busca semântica"""
+
+    def __init__(
+        self,
+        path: str = ":memory:",
+        name: str = "responses",
+        ttl: float = 3600.0,
+        max_entries: int = 256,
+        similarity: float = 0.0,
+        embedder: Any = None,
+        registry: MetricsRegistry = REGISTRY,
+    ):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.similarity = similarity
+        self.embedder = embedder or (HashingEmbedder() if similarity else None)
+        self.registry = registry
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                scope TEXT NOT NULL,
+                key TEXT NOT NULL,
+                question TEXT NOT NULL,
+                answer TEXT NOT NULL,
+                tool_trace TEXT NOT NULL,
+                vector BLOB,
+                created REAL NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (scope, key)
+            )
+            """
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses (scope, last_used)")
+        self._db.commit()
+
+    @classmethod
+    def from_env(cls, name: str, default_path: str, **kwargs: Any) -> Optional["ResponseCache"]:
+        """Cria o cache a partir de RESPONSE_CACHE_* (RESPONSE_CACHE=0 desativa)"""
+        if os.getenv("RESPONSE_CACHE", "1") == "0":
+            return None
+        return cls(
+            path=os.getenv("RESPONSE_CACHE_FILE", default_path),
+            name=name,
+            ttl=float(os.getenv("RESPONSE_CACHE_TTL", "3600")),
+            max_entries=int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "256")),
+            similarity=float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0")),
+            **kwargs,
+        )
+
+    def _embed(self, question: str) -> Optional[bytes]:
+        if self.embedder is None:
+            return None
+        return array("f", self.embedder.embed_query(question)).tobytes()
+
+    def get(self, question: str, scope: str = "") -> Optional[CachedResponse]:
+        key = normalize_question(question)
+        now = time.time()
+        with self._lock:
+            # Expira também as entradas de escopos antigos (versões anteriores dos dados)
+            self._db.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+            row = self._db.execute(
+                "SELECT key, question, answer, tool_trace, created FROM responses WHERE scope = ? AND key = ?",
+                (scope, key),
+            ).fetchone()
+            similarity = 1.0
+            if row is None and self.embedder is not None:
+                row, similarity = self._nearest(question, scope)
+            if row is not None:
+                self._db.execute(
+                    "UPDATE responses SET last_used = ? WHERE scope = ? AND key = ?", (now, scope, row[0])
+                )
+            self._db.commit()
+        record_cache(self.name, row is not None, self.registry)
+        if row is None:
+            return None
+        _, cached_question, answer, tool_trace, created = row
+        return CachedResponse(cached_question, answer, json.loads(tool_trace), similarity, now - created)
+
+    def _nearest(self, question: str, scope: str):
+        query = array("f")
+        query.frombytes(self._embed(question))
+        anchors = question_anchors(question)
+        best, best_score = None, self.similarity
+        rows = self._db.execute(
+            "SELECT key, question, answer, tool_trace, created, vector FROM responses "
+            "WHERE scope = ? AND vector IS NOT NULL",
+            (scope,),
+        )
+        for *row, blob in rows:
+            # Parecida no texto mas sobre outro número/entidade: outra resposta
+            if question_anchors(row[1]) != anchors:
+                continue
+            vector = array("f")
+            vector.frombytes(blob)
+            score = _cosine(query, vector)
+            if score >= best_score:
+                best, best_score = tuple(row), score
+        return best, best_score
+
+    def put(self, question: str, answer: str, tool_trace: Optional[List[Dict[str, Any]]] = None, scope: str = "") -> None:
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    scope,
+                    normalize_question(question),
+                    question,
+                    answer,
+                    json.dumps(tool_trace or [], ensure_ascii=False, default=str),
+                    self._embed(question),
+                    now,
+                    now,
+                ),
+            )
+            # Despejo LRU além do limite do escopo
+            self._db.execute(
+                """
+                DELETE FROM responses WHERE scope = ? AND key NOT IN (
+                    SELECT key FROM responses WHERE scope = ? ORDER BY last_used DESC LIMIT ?
+                )
+                """,
+                (scope, scope, self.max_entries),
+            )
+            self._db.commit()
+
+    def invalidate(self, scope: Optional[str] = None) -> None:
+        with self._lock:
+            if scope is None:
+                self._db.execute("DELETE FROM responses")
+            else:
+                self._db.execute("DELETE FROM responses WHERE scope = ?", (scope,))
+            self._db.commit()
@@ -0,0 +1,248 @@
+"""
+Modelo de chat determinístico para testes de desempenho offline
+
+`ScriptedChatModel` substitui o Azure OpenAI quando LLM_BACKEND=scripted ou
+LLM_BACKEND=replay. A resposta depende só da conversa (não da ordem de
+chegada), então o comportamento é o mesmo com qualquer concorrência:
+
+- replay: procura a resposta gravada para o hash da conversa;
+- script: escolhe a regra cujo `match` aparece na pergunta e devolve a
+  resposta de índice N, onde N é o número de respostas do modelo desde a
+  última mensagem do usuário;
+- sem script: chama a ferramenta mais parecida com a pergunta usando os
+  números encontrados nela e, ao receber o resultado, responde com ele.
+
+Textos aceitam os marcadores {question} e {tool_result}; argumentos de
+ferramentas aceitam "{n0}", "{n1}", ... (inteiros extraídos da pergunta).
+A latência (tempo até o primeiro token) e a vazão em tokens/s são simuladas.
+"""
+
+import asyncio
+import hashlib
+import json
+import re
+import time
+import unicodedata
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from infra.streaming import message_text
+
+
+def _normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+
+def conversation_key(messages: List[BaseMessage]) -> str:
+    """Hash estável da conversa (tipo, conteúdo e chamadas de ferramentas)"""
+    parts = []
+    for message in messages:
+        tool_calls = [
+            {"name": call["name"], "args": call["args"]}
+            for call in getattr(message, "tool_calls", None) or []
+        ]
+        parts.append({"type": message.type, "content": message.content, "tool_calls": tool_calls})
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _last_turn(messages: List[BaseMessage]) -> tuple:
+    """Pergunta atual e quantas respostas do modelo já existem neste turno"""
+    question, step = "", 0
+    for message in reversed(messages):
+        if isinstance(message, HumanMessage):
+            question = message_text(message.content)
+            break
+        if isinstance(message, AIMessage):
+            step += 1
+    return question, step
+
+
+def _fill(value: Any, question: str, numbers: List[int], tool_result: str) -> Any:
+    if isinstance(value, dict):
+        return {k: _fill(v, question, numbers, tool_result) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_fill(v, question, numbers, tool_result) for v in value]
+    if isinstance(value, str):
+        match = re.fullmatch(r"\{n(\d+)\}", value)
+        if match:
+            index = int(match.group(1))
+            return numbers[index] if index < len(numbers) else 0
+        return value.replace("{question}", question).replace("{tool_result}", tool_result)
+    return value
+
+
+class ScriptedChatModel(BaseChatModel):
+    """Modelo de chat roteirizado, com latência e vazão simuladas"""
+
+    script: List[Dict[str, Any]] = []
+    recordings: Dict[str, Dict[str, Any]] = {}
+    latency_ms: float = 0.0
+    tokens_per_second: float = 0.0
+    tools: List[Dict[str, Any]] = []
+    # Aceito por compatibilidade com o AzureChatOpenAI; a saída já é determinística
+    temperature: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def bind_tools(self, tools, **kwargs: Any) -> "ScriptedChatModel":
+        return self.model_copy(update={"tools": [convert_to_openai_tool(t) for t in tools]})
+
+    # --- Escolha da resposta ---
+
+    def _bound_tools(self, kwargs: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Ferramentas de `bind_tools` ou de `bind(tools=...)` (como no create_sql_agent)"""
+        tools = kwargs.get("tools")
+        return [convert_to_openai_tool(t) for t in tools] if tools else self.tools
+
+    def _choose(self, messages: List[BaseMessage], tools: List[Dict[str, Any]]) -> Dict[str, Any]:
+        recorded = self.recordings.get(conversation_key(messages))
+        if recorded is not None:
+            return recorded
+
+        question, step = _last_turn(messages)
+        numbers = [int(n) for n in re.findall(r"-?\d+", question)]
+        last = messages[-1]
+        tool_result = message_text(last.content) if isinstance(last, ToolMessage) else ""
+
+        normalized = _normalize(question)
+        for rule in self.script:
+            if _normalize(rule.get("match", "")) in normalized:
+                responses = rule.get("responses", [])
+                if responses:
+                    response = responses[min(step, len(responses) - 1)]
+                    return _fill(response, question, numbers, tool_result)
+
+        return self._default_response(question, numbers, last, tools)
+
+    def _default_response(
+        self, question: str, numbers: List[int], last: BaseMessage, tools: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        if isinstance(last, ToolMessage) or not tools:
+            return {"content": message_text(last.content)}
+
+        words = set(re.findall(r"\w+", _normalize(question)))
+
+        def score(tool: Dict[str, Any]) -> int:
+            function = tool["function"]
+            text = _normalize(f"{function['name']} {function.get('description', '')}")
+            return len(words & set(re.findall(r"\w+", text)))
+
+        function = max(tools, key=score)["function"]
+        # Números da pergunta vão, em ordem, para os parâmetros numéricos; texto recebe a pergunta
+        remaining = iter(numbers)
+        args = {
+            name: question if spec.get("type") == "string" else next(remaining, 0)
+            for name, spec in function.get("parameters", {}).get("properties", {}).items()
+        }
+        return {"content": "", "tool_calls": [{"name": function["name"], "args": args}]}
+
+    def _message(self, response: Dict[str, Any], messages: List[BaseMessage]) -> AIMessage:
+        tool_calls = [
+            {"name": call["name"], "args": call.get("args", {}), "id": f"call_{len(messages)}_{i}"}
+            for i, call in enumerate(response.get("tool_calls") or [])
+        ]
+        return AIMessage(content=response.get("content", ""), tool_calls=tool_calls)
+
+    # --- Simulação de latência ---
+
+    @staticmethod
+    def _tokens(message: AIMessage) -> List[str]:
+        text = str(message.content) or json.dumps(message.tool_calls, default=str)
+        return re.findall(r"\S+\s*", text) or [""]
+
+    def _delays(self, message: AIMessage) -> tuple:
+        first = self.latency_ms / 1000
+        per_token = 1 / self.tokens_per_second if self.tokens_per_second else 0.0
+        return first, per_token, len(self._tokens(message))
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        message = self._message(self._choose(messages, self._bound_tools(kwargs)), messages)
+        first, per_token, count = self._delays(message)
+        time.sleep(first + per_token * count)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        message = self._message(self._choose(messages, self._bound_tools(kwargs)), messages)
+        first, per_token, count = self._delays(message)
+        await asyncio.sleep(first + per_token * count)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _chunks(self, message: AIMessage) -> List[AIMessageChunk]:
+        if message.tool_calls:
+            chunk_calls = [
+                {"name": c["name"], "args": json.dumps(c["args"]), "id": c["id"], "index": i}
+                for i, c in enumerate(message.tool_calls)
+            ]
+            return [AIMessageChunk(content="", tool_call_chunks=chunk_calls)]
+        return [AIMessageChunk(content=token) for token in self._tokens(message)]
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        message = self._message(self._choose(messages, self._bound_tools(kwargs)), messages)
+        first, per_token, _ = self._delays(message)
+        time.sleep(first)
+        for chunk in self._chunks(message):
+            time.sleep(per_token)
+            if run_manager and chunk.content:
+                run_manager.on_llm_new_token(chunk.content, chunk=ChatGenerationChunk(message=chunk))
+            yield ChatGenerationChunk(message=chunk)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        message = self._message(self._choose(messages, self._bound_tools(kwargs)), messages)
+        first, per_token, _ = self._delays(message)
+        await asyncio.sleep(first)
+        for chunk in self._chunks(message):
+            await asyncio.sleep(per_token)
+            if run_manager and chunk.content:
+                await run_manager.on_llm_new_token(chunk.content, chunk=ChatGenerationChunk(message=chunk))
+            yield ChatGenerationChunk(message=chunk)
+
+
+class RecordingCallback(BaseCallbackHandler):
+    """Grava as respostas do LLM real para reproduzi-las com LLM_BACKEND=replay"""
+
+    run_inline = True
+
+    def __init__(self, path: str):
+        self.path = path
+        self._keys: Dict[Any, str] = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs: Any) -> None:
+        self._keys[run_id] = conversation_key(messages[0])
+
+    def on_llm_end(self, response, *, run_id, **kwargs: Any) -> None:
+        key = self._keys.pop(run_id, None)
+        if key is None:
+            return
+        message = response.generations[0][0].message
+        record = {
+            "key": key,
+            "response": {
+                "content": message.content,
+                "tool_calls": [
+                    {"name": c["name"], "args": c["args"]} for c in getattr(message, "tool_calls", [])
+                ],
+            },
+        }
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def load_recordings(path: Optional[str]) -> Dict[str, Dict[str, Any]]:
+    recordings: Dict[str, Dict[str, Any]] = {}
+    if not path:
+        return recordings
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                recordings[record["key"]] = record["response"]
+    return recordings
@@ -0,0 +1,301 @@
+"""
+Servidor HTTP com vários processos (workers)
+
+`serve()` sobe `workers` processos uvicorn para a mesma porta. Cada worker
+importa a aplicação por conta própria, então pools de sessões MCP, caches e
+controle de admissão são por processo (nada é compartilhado).
+
+- sem `reuse_port`: o supervisor abre o socket e os workers o herdam;
+- com `reuse_port` (Linux/BSD): cada worker abre o seu socket com
+  SO_REUSEPORT e o kernel distribui as conexões entre eles;
+- SIGTERM/SIGINT: os workers param de aceitar conexões, terminam as
+  requisições em andamento (até `graceful_timeout`) e fecham os pools;
+- SIGHUP: recarga gradual, um worker por vez (o novo sobe e fica pronto
+  antes de o antigo ser drenado);
+- um worker que morre é substituído, com espera exponencial se ele morre
+  logo ao subir; depois de `max_fast_crashes` quedas rápidas seguidas o
+  supervisor desiste e sai com código 1 (falha de import ou de lifespan não
+  vira um laço de fork);
+- `/metrics` de qualquer worker mostra a soma de todos (`render_metrics`).
+
+    cd estudos && python -m infra.serve http_server:app --app-dir ../youtube --workers 4
+"""
+
+import argparse
+import multiprocessing
+import os
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from infra.metrics import WORKERS_DIR_ENV
+
+_MP = multiprocessing.get_context("spawn")
+
+
+def _reuse_port_socket(host: str, port: int, backlog: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _worker_main(
+    app: str,
+    app_dir: Optional[str],
+    worker_id: int,
+    sock: Optional[socket.socket],
+    ready,
+    options: dict,
+) -> None:
+    """Processo worker: importa a aplicação e roda um uvicorn.Server"""
+    import asyncio
+
+    import uvicorn
+
+    if app_dir:
+        sys.path.insert(0, app_dir)
+    os.environ["WORKER_ID"] = str(worker_id)
+
+    # Quando o supervisor foi iniciado pelo próprio script da aplicação, o spawn
+    # já o importou como __mp_main__: reaproveita o módulo em vez de importá-lo de
+    # novo (um segundo import duplicaria o estado global, ex.: métricas)
+    module_name = app.split(":")[0]
+    main = sys.modules.get("__mp_main__")
+    if main is not None and Path(getattr(main, "__file__", "") or "").stem == module_name:
+        sys.modules.setdefault(module_name, main)
+
+    from infra.metrics import start_worker_exporter
+    from infra.warmup import READINESS
+
+    if os.getenv(WORKERS_DIR_ENV):
+        start_worker_exporter(os.environ[WORKERS_DIR_ENV], str(worker_id))
+
+    host, port = options.pop("host"), options.pop("port")
+    if sock is None:
+        sock = _reuse_port_socket(host, port, options.get("backlog", 2048))
+    config = uvicorn.Config(app, **options)
+    server = uvicorn.Server(config)
+
+    async def run():
+        task = asyncio.create_task(server.serve(sockets=[sock]))
+        # Pronto = socket aceitando conexões e aquecimento da aplicação concluído
+        while (not server.started or READINESS.warming) and not task.done():
+            await asyncio.sleep(0.05)
+        ready.set()
+        await task
+
+    asyncio.run(run())
+
+
+class Supervisor:
+    """Mantém `workers` processos vivos e coordena recarga e desligamento"""
+
+    def __init__(
+        self,
+        app: str,
+        host: str = "0.0.0.0",
+        port: int = 8000,
+        workers: int = 2,
+        reuse_port: bool = False,
+        graceful_timeout: float = 30.0,
+        app_dir: Optional[str] = None,
+        restart_backoff: float = 0.5,
+        max_restart_backoff: float = 30.0,
+        max_fast_crashes: int = 5,
+        min_uptime: float = 10.0,
+        **uvicorn_options,
+    ):
+        if reuse_port and not hasattr(socket, "SO_REUSEPORT"):
+            raise RuntimeError("SO_REUSEPORT não é suportado nesta plataforma")
+        self.app = app
+        self.app_dir = app_dir
+        self.workers = workers
+        self.reuse_port = reuse_port
+        self.graceful_timeout = graceful_timeout
+        self.restart_backoff = restart_backoff
+        self.max_restart_backoff = max_restart_backoff
+        self.max_fast_crashes = max_fast_crashes
+        # Queda rápida: antes de ficar pronto ou com menos de `min_uptime` segundos
+        self.min_uptime = min_uptime
+        self.options = {
+            "host": host,
+            "port": port,
+            "timeout_graceful_shutdown": graceful_timeout,
+            **uvicorn_options,
+        }
+        self.processes: List[Optional[multiprocessing.Process]] = [None] * workers
+        self.generation = 0
+        self.exit_code = 0
+        # Quedas rápidas seguidas e hora marcada para recriar, por worker
+        self.crashes = [0] * workers
+        self._respawn_at: Dict[int, float] = {}
+        self._socket: Optional[socket.socket] = None
+        self._stopping = False
+        self._reload = False
+
+    def _spawn(self, worker_id: int) -> multiprocessing.Process:
+        ready = _MP.Event()
+        process = _MP.Process(
+            target=_worker_main,
+            args=(self.app, self.app_dir, worker_id, self._socket, ready, dict(self.options)),
+            name=f"worker-{worker_id}",
+        )
+        process.start()
+        process.ready = ready
+        process.started = time.monotonic()
+        return process
+
+    def _wait_ready(self, process: multiprocessing.Process, timeout: float = 120.0) -> bool:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline and process.is_alive():
+            if process.ready.wait(0.2):
+                return True
+        return False
+
+    def _drain(self, process: multiprocessing.Process) -> None:
+        """Pede desligamento gracioso e espera; mata se passar do prazo"""
+        if process.is_alive():
+            os.kill(process.pid, signal.SIGTERM)
+        process.join(self.graceful_timeout + 5)
+        if process.is_alive():
+            process.kill()
+            process.join()
+
+    def _on_stop(self, signum, frame) -> None:
+        self._stopping = True
+
+    def _on_reload(self, signum, frame) -> None:
+        self._reload = True
+
+    def _replace_dead(self, worker_id: int, process: multiprocessing.Process) -> None:
+        """Recria um worker que saiu, esperando mais a cada queda rápida seguida"""
+        now = time.monotonic()
+        respawn_at = self._respawn_at.get(worker_id)
+        if respawn_at is None:
+            fast = not process.ready.is_set() or now - process.started < self.min_uptime
+            self.crashes[worker_id] = self.crashes[worker_id] + 1 if fast else 0
+            if self.crashes[worker_id] > self.max_fast_crashes:
+                print(
+                    f"❌ Worker {worker_id} caiu {self.crashes[worker_id]} vezes seguidas ao subir "
+                    f"(código {process.exitcode}); desistindo",
+                    flush=True,
+                )
+                self.exit_code = 1
+                self._stopping = True
+                return
+            delay = min(self.restart_backoff * 2 ** self.crashes[worker_id], self.max_restart_backoff)
+            self._respawn_at[worker_id] = now + delay
+            print(
+                f"⚠️ Worker {worker_id} saiu (código {process.exitcode}); substituindo em {delay:.1f}s",
+                flush=True,
+            )
+        elif now >= respawn_at:
+            del self._respawn_at[worker_id]
+            self.processes[worker_id] = self._spawn(worker_id)
+
+    def reload(self) -> None:
+        """Troca os workers um a um, sem deixar a porta sem ninguém atendendo"""
+        self.generation += 1
+        print(f"🔄 Recarregando {self.workers} workers (geração {self.generation})", flush=True)
+        for worker_id, old in enumerate(self.processes):
+            new = self._spawn(worker_id)
+            if not self._wait_ready(new):
+                print(f"❌ Worker {worker_id} novo não ficou pronto; mantendo o antigo", flush=True)
+                self._drain(new)
+                continue
+            self.processes[worker_id] = new
+            if old is not None:
+                self._drain(old)
+
+    def run(self) -> None:
+        directory = tempfile.mkdtemp(prefix="worker-metrics-")
+        os.environ[WORKERS_DIR_ENV] = directory
+        if not self.reuse_port:
+            import uvicorn
+
+            # O supervisor abre o socket uma vez; os workers o herdam
+            config = uvicorn.Config(self.app, host=self.options["host"], port=self.options["port"])
+            self._socket = config.bind_socket()
+
+        signal.signal(signal.SIGTERM, self._on_stop)
+        signal.signal(signal.SIGINT, self._on_stop)
+        if hasattr(signal, "SIGHUP"):
+            signal.signal(signal.SIGHUP, self._on_reload)
+
+        mode = "SO_REUSEPORT" if self.reuse_port else "socket compartilhado"
+        print(
+            f"🚀 Supervisor {os.getpid()}: {self.workers} workers em "
+            f"{self.options['host']}:{self.options['port']} ({mode})",
+            flush=True,
+        )
+        try:
+            for worker_id in range(self.workers):
+                self.processes[worker_id] = self._spawn(worker_id)
+            while not self._stopping:
+                time.sleep(0.5)
+                if self._reload:
+                    self._reload = False
+                    self.reload()
+                for worker_id, process in enumerate(self.processes):
+                    if process is not None and not process.is_alive() and not self._stopping:
+                        self._replace_dead(worker_id, process)
+        finally:
+            print("🛑 Drenando workers...", flush=True)
+            for process in self.processes:
+                if process is not None and process.is_alive():
+                    os.kill(process.pid, signal.SIGTERM)
+            for process in self.processes:
+                if process is not None:
+                    self._drain(process)
+            if self._socket is not None:
+                self._socket.close()
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+def serve(app: str, workers: int = 1, **kwargs) -> int:
+    """Roda `app` ("módulo:atributo") com `workers` processos; devolve o código de saída"""
+    supervisor = Supervisor(app, workers=workers, **kwargs)
+    supervisor.run()
+    return supervisor.exit_code
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Servidor HTTP com vários workers")
+    parser.add_argument("app", help='Aplicação ASGI, ex.: "http_server:app"')
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--reuse-port", action="store_true", help="Um socket por worker (SO_REUSEPORT)")
+    parser.add_argument("--graceful-timeout", type=float, default=30.0)
+    parser.add_argument(
+        "--max-fast-crashes", type=int, default=5, help="Quedas seguidas ao subir antes de desistir"
+    )
+    parser.add_argument("--app-dir", default=None, help="Diretório adicionado ao sys.path dos workers")
+    parser.add_argument("--factory", action="store_true", help="`app` é uma função que cria a aplicação")
+    args = parser.parse_args()
+    code = serve(
+        args.app,
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        reuse_port=args.reuse_port,
+        graceful_timeout=args.graceful_timeout,
+        app_dir=args.app_dir,
+        factory=args.factory,
+        max_fast_crashes=args.max_fast_crashes,
+    )
+    sys.exit(code)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""
+Instâncias pré-iniciadas dos servidores MCP stdio
+
+Subir um servidor stdio custa um processo novo (ou um `docker run`, que leva
+segundos) mais o handshake `initialize`. `WarmServerPool` mantém, para cada
+servidor stdio da configuração do `MultiServerMCPClient`, `warm` instâncias
+já iniciadas e empresta uma sessão inteira por vez:
+
+- ao emprestar, já sobe a substituta em segundo plano;
+- ao devolver, a instância volta para a fila, a menos que tenha chegado a
+  `max_uses` empréstimos ou que a sessão tenha quebrado (aí é descartada);
+- instâncias paradas há mais de `max_idle` segundos são trocadas por novas;
+- sem nenhuma pronta nem subindo (ex.: `warm=0`), `lease()` sobe uma na hora.
+
+    pool = WarmServerPool(CONNECTIONS, warm=2)
+    await pool.start()                      # sobe as instâncias em paralelo
+    async with pool.lease("SQLite") as session:
+        await session.call_tool("list_tables", {})
+    await pool.close()
+
+Conexões que não são stdio (HTTP, SSE) ficam de fora: `name in pool` diz se
+o servidor é atendido pelo pool.
+"""
+
+import asyncio
+import os
+import time
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from mcp import ClientSession, StdioServerParameters
+
+from infra.metrics import REGISTRY, MetricsRegistry
+from infra.session_pool import is_broken_session
+from infra.stdio_transport import pipelined_stdio_client
+
+# Chaves da conexão que viram StdioServerParameters
+_STDIO_KEYS = ("command", "args", "env", "cwd", "encoding", "encoding_error_handler")
+
+MessageHandler = Callable[[Any], Awaitable[None]]
+
+
+class _Instance:
+    """Um processo servidor com a sessão já inicializada"""
+
+    def __init__(self, server: str):
+        self.server = server
+        self.session: Optional[ClientSession] = None
+        self.uses = 0
+        self.idle_since = time.monotonic()
+        self.handler: Optional[MessageHandler] = None
+        self.retire = asyncio.Event()
+
+    async def dispatch(self, message: Any) -> None:
+        # Notificações do servidor (ex.: tools/list_changed) vão para quem está com a sessão
+        if self.handler is not None:
+            await self.handler(message)
+
+
+class WarmServerPool:
+    """Mantém instâncias ociosas de cada servidor stdio prontas para uso"""
+
+    def __init__(
+        self,
+        connections: Dict[str, Dict[str, Any]],
+        warm: int = 1,
+        max_uses: int = 0,
+        max_idle: float = 0.0,
+        registry: MetricsRegistry = REGISTRY,
+    ):
+        self.connections = {
+            name: connection
+            for name, connection in connections.items()
+            if connection.get("transport", "stdio") == "stdio" and "command" in connection
+        }
+        self.warm = warm
+        self.max_uses = max_uses
+        self.max_idle = max_idle
+        self.spawned = 0
+        self._idle: Dict[str, List[_Instance]] = {name: [] for name in self.connections}
+        self._starting: Dict[str, int] = {name: 0 for name in self.connections}
+        self._leased: Dict[str, int] = {name: 0 for name in self.connections}
+        self._errors: Dict[str, BaseException] = {}
+        self._available: Dict[str, asyncio.Event] = {name: asyncio.Event() for name in self.connections}
+        self._instances: Dict[_Instance, asyncio.Task] = {}
+        self._reaper: Optional[asyncio.Task] = None
+        self._closing = False
+        registry.gauge(
+            "server_pool_instances",
+            "Instâncias pré-iniciadas dos servidores MCP stdio por estado",
+            ("server", "state"),
+            self._gauge,
+        )
+
+    @classmethod
+    def from_env(cls, connections: Dict[str, Dict[str, Any]]) -> "WarmServerPool":
+        """Configurado por MCP_WARM_INSTANCES, MCP_INSTANCE_MAX_USES e MCP_INSTANCE_MAX_IDLE"""
+        return cls(
+            connections,
+            warm=int(os.getenv("MCP_WARM_INSTANCES", "1")),
+            max_uses=int(os.getenv("MCP_INSTANCE_MAX_USES", "0")),
+            max_idle=float(os.getenv("MCP_INSTANCE_MAX_IDLE", "0")),
+        )
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.connections
+
+    def _gauge(self) -> Dict[tuple, float]:
+        values = {}
+        for name in self.connections:
+            values[(name, "idle")] = len(self._idle[name])
+            values[(name, "starting")] = self._starting[name]
+            values[(name, "leased")] = self._leased[name]
+        return values
+
+    async def start(self) -> None:
+        """Sobe `warm` instâncias de cada servidor (sem esperar ficarem prontas)"""
+        for name in self.connections:
+            self._top_up(name)
+        if self.max_idle and self._reaper is None:
+            self._reaper = asyncio.create_task(self._reap())
+
+    def _top_up(self, name: str) -> None:
+        """Sobe instâncias até haver `warm` ociosas ou iniciando"""
+        while not self._closing and len(self._idle[name]) + self._starting[name] < self.warm:
+            self._spawn(name)
+
+    def _spawn(self, name: str) -> None:
+        instance = _Instance(name)
+        self._starting[name] += 1
+        self.spawned += 1
+        self._instances[instance] = asyncio.create_task(self._hold(instance))
+
+    async def _hold(self, instance: _Instance) -> None:
+        """Mantém o processo e a sessão abertos até a instância ser aposentada
+
+        Os transportes do MCP (anyio) precisam ser abertos e fechados na mesma
+        tarefa, por isso cada instância vive em uma tarefa própria.
+        """
+        name = instance.server
+        connection = self.connections[name]
+        params = StdioServerParameters(**{k: connection[k] for k in _STDIO_KEYS if k in connection})
+        session_kwargs = {k: v for k, v in (connection.get("session_kwargs") or {}).items() if k != "message_handler"}
+        starting = True
+        try:
+            async with AsyncExitStack() as stack:
+                read, write = await stack.enter_async_context(pipelined_stdio_client(params))
+                session = await stack.enter_async_context(
+                    ClientSession(read, write, message_handler=instance.dispatch, **session_kwargs)
+                )
+                await session.initialize()
+                instance.session = session
+                instance.idle_since = time.monotonic()
+                starting = False
+                self._starting[name] -= 1
+                self._errors.pop(name, None)
+                self._idle[name].append(instance)
+                self._available[name].set()
+                await instance.retire.wait()
+        except Exception as exc:
+            # Quem está esperando por este servidor recebe o erro em `lease()`
+            self._errors[name] = exc
+            self._available[name].set()
+        finally:
+            if starting:
+                self._starting[name] -= 1
+            if instance in self._idle[name]:
+                self._idle[name].remove(instance)
+            instance.session = None
+            self._instances.pop(instance, None)
+
+    async def _take(self, name: str) -> _Instance:
+        if name not in self.connections:
+            raise KeyError(f"Servidor '{name}' não é stdio ou não está no pool")
+        self._top_up(name)
+        while not self._idle[name]:
+            if self._closing:
+                raise RuntimeError(f"pool de servidores fechado (servidor {name!r})")
+            if not self._starting[name]:
+                if name in self._errors:
+                    raise self._errors.pop(name)
+                # Nenhuma pronta nem subindo (ex.: warm=0, ou todas emprestadas
+                # com warm menor que a concorrência): sobe uma sob demanda
+                self._spawn(name)
+            self._available[name].clear()
+            await self._available[name].wait()
+        # A mais recente: as mais antigas ficam para o recolhimento por ociosidade
+        instance = self._idle[name].pop()
+        # Já sobe a substituta, para o próximo empréstimo não esperar
+        self._top_up(name)
+        return instance
+
+    @asynccontextmanager
+    async def lease(self, name: str, message_handler: Optional[MessageHandler] = None):
+        """Empresta a sessão de uma instância pronta do servidor `name`"""
+        instance = await self._take(name)
+        instance.handler = message_handler
+        self._leased[name] += 1
+        broken = False
+        try:
+            yield instance.session
+        except Exception as exc:
+            broken = is_broken_session(exc)
+            raise
+        finally:
+            self._leased[name] -= 1
+            instance.handler = None
+            instance.uses += 1
+            worn_out = self.max_uses and instance.uses >= self.max_uses
+            if broken or worn_out or self._closing or instance.session is None:
+                instance.retire.set()
+            else:
+                instance.idle_since = time.monotonic()
+                self._idle[name].append(instance)
+                self._available[name].set()
+            self._top_up(name)
+
+    async def _reap(self) -> None:
+        """Troca instâncias ociosas há mais de `max_idle` segundos"""
+        while not self._closing:
+            await asyncio.sleep(max(self.max_idle / 2, 0.5))
+            now = time.monotonic()
+            for name, idle in self._idle.items():
+                expired = [i for i in idle if now - i.idle_since > self.max_idle]
+                for instance in expired:
+                    idle.remove(instance)
+                    instance.retire.set()
+                if expired:
+                    self._top_up(name)
+
+    async def close(self) -> None:
+        """Encerra todas as instâncias (ociosas e emprestadas)"""
+        self._closing = True
+        if self._reaper is not None:
+            self._reaper.cancel()
+        tasks = list(self._instances.values())
+        for instance in list(self._instances):
+            instance.retire.set()
+        # Quem espera por instância desiste em vez de esperar uma que não vem
+        for event in self._available.values():
+            event.set()
+        await asyncio.gather(*tasks, *(t for t in [self._reaper] if t), return_exceptions=True)
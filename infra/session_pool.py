@@ -0,0 +1,207 @@
+"""
+Pool de sessões MCP pré-aquecidas
+
+Abrir um `stdio_client` + `ClientSession` custa um processo novo e um
+handshake `initialize`. O pool abre `size` sessões na partida e as empresta;
+uma sessão que falha no transporte é descartada e reaberta em segundo plano.
+Cada worker do gateway tem o seu pool (nada é compartilhado entre processos).
+
+Cada sessão aceita até `max_in_flight` chamadas simultâneas: as requisições
+seguem em pipeline pelo mesmo stdio (`infra/stdio_transport.py`) e as
+respostas são casadas pelo id do JSON-RPC. `acquire()` escolhe a sessão
+menos ocupada; com `max_in_flight=1` cada sessão atende uma chamada por vez.
+
+    pool = SessionPool(server_params, size=4, max_in_flight=16)
+    await pool.start()
+    async with pool.acquire() as session:
+        await session.call_tool("add", {"a": 1, "b": 2})
+    await pool.close()
+"""
+
+import asyncio
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import Any, Dict, List, Optional
+
+import anyio
+from mcp import ClientSession, StdioServerParameters
+from mcp.shared.exceptions import McpError
+from mcp.types import CONNECTION_CLOSED
+
+from infra.metrics import REGISTRY, MetricsRegistry
+from infra.stdio_transport import pipelined_stdio_client
+
+# Erros de transporte: a sessão quebrou (e não só a requisição que falhou)
+BROKEN_SESSION_ERRORS = (
+    OSError,
+    EOFError,
+    anyio.ClosedResourceError,
+    anyio.BrokenResourceError,
+    anyio.EndOfStream,
+)
+
+
+def is_broken_session(exc: BaseException) -> bool:
+    """Erro que inutiliza a sessão inteira
+
+    Um `McpError` é da requisição (prazo estourado, erro de protocolo da
+    ferramenta) e não afeta as outras chamadas multiplexadas na mesma sessão;
+    a exceção é o `CONNECTION_CLOSED`, que o SDK usa quando o stream fecha.
+    """
+    if isinstance(exc, McpError):
+        return exc.error.code == CONNECTION_CLOSED
+    return isinstance(exc, BROKEN_SESSION_ERRORS)
+
+
+class _Slot:
+    """Uma sessão do pool e a tarefa que a mantém aberta"""
+
+    def __init__(self, index: int):
+        self.index = index
+        self.session: Optional[ClientSession] = None
+        self.in_flight = 0
+        self.retire = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+
+class SessionPool:
+    """Sessões stdio abertas na partida e reaproveitadas entre requisições"""
+
+    def __init__(
+        self,
+        server_params: StdioServerParameters,
+        size: int = 4,
+        name: str = "mcp",
+        registry: MetricsRegistry = REGISTRY,
+        max_in_flight: int = 1,
+    ):
+        self.server_params = server_params
+        self.size = size
+        self.name = name
+        self.max_in_flight = max_in_flight
+        self.tools: List[Any] = []
+        self.reopened = 0
+        self._slots: List[_Slot] = []
+        # Acorda quem espera por vaga quando uma chamada termina ou uma sessão abre
+        self._vacancy = asyncio.Event()
+        self._closing = False
+        registry.gauge(
+            "session_pool_sessions",
+            "Sessões do pool por estado",
+            ("pool", "state"),
+            self._gauge,
+        )
+
+    def _gauge(self) -> Dict[tuple, float]:
+        open_ = [slot for slot in self._slots if slot.session is not None]
+        busy = sum(1 for slot in open_ if slot.in_flight)
+        return {
+            (self.name, "idle"): len(open_) - busy,
+            (self.name, "busy"): busy,
+            (self.name, "in_flight"): sum(slot.in_flight for slot in open_),
+        }
+
+    async def start(self) -> None:
+        """Abre todas as sessões (em paralelo) e carrega o catálogo de ferramentas
+
+        Se falhar, as sessões que chegaram a abrir são fechadas e `start()` pode
+        ser chamado de novo; com o pool já aberto, só recarrega o catálogo.
+        """
+        if not self._slots:
+            ready = []
+            for index in range(self.size):
+                slot = _Slot(index)
+                future = asyncio.get_running_loop().create_future()
+                slot.task = asyncio.create_task(self._hold(slot, future))
+                self._slots.append(slot)
+                ready.append(future)
+            try:
+                await asyncio.gather(*ready)
+            except BaseException:
+                tasks = [slot.task for slot in self._slots if slot.task]
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                self._slots.clear()
+                raise
+        async with self.acquire() as session:
+            self.tools = (await session.list_tools()).tools
+
+    async def _hold(self, slot: _Slot, ready: Optional[asyncio.Future]) -> None:
+        """Mantém a sessão do slot aberta, reabrindo-a quando for descartada
+
+        Os transportes do MCP (anyio) precisam ser abertos e fechados na mesma
+        tarefa, por isso cada sessão vive em uma tarefa própria.
+        """
+        while not self._closing:
+            try:
+                async with AsyncExitStack() as stack:
+                    read, write = await stack.enter_async_context(
+                        pipelined_stdio_client(self.server_params, max_pending=max(self.max_in_flight, 1) * 2)
+                    )
+                    session = await stack.enter_async_context(ClientSession(read, write))
+                    await session.initialize()
+                    # close() pode ter começado durante a abertura: o retire já
+                    # foi sinalizado e não pode ser limpo (a espera seria eterna)
+                    if self._closing:
+                        break
+                    slot.session = session
+                    slot.in_flight = 0
+                    slot.retire.clear()
+                    self._vacancy.set()
+                    if ready is not None and not ready.done():
+                        ready.set_result(None)
+                    await slot.retire.wait()
+            except Exception as exc:
+                if ready is not None and not ready.done():
+                    ready.set_exception(exc)
+                    return
+                # Evita um loop apertado se o servidor não sobe
+                await asyncio.sleep(1.0)
+            finally:
+                slot.session = None
+            if not self._closing:
+                self.reopened += 1
+        # Fechado antes da primeira abertura: start() não fica esperando
+        if ready is not None and not ready.done():
+            ready.cancel()
+
+    def _pick(self) -> Optional[_Slot]:
+        """Sessão aberta menos ocupada que ainda tem vaga"""
+        candidates = [
+            slot
+            for slot in self._slots
+            if slot.session is not None and not slot.retire.is_set() and slot.in_flight < self.max_in_flight
+        ]
+        return min(candidates, key=lambda slot: slot.in_flight) if candidates else None
+
+    @asynccontextmanager
+    async def acquire(self):
+        """Empresta uma sessão; erros de transporte descartam a sessão"""
+        while (slot := self._pick()) is None:
+            if self._closing:
+                raise RuntimeError(f"pool de sessões {self.name!r} fechado")
+            self._vacancy.clear()
+            await self._vacancy.wait()
+        session = slot.session
+        slot.in_flight += 1
+        try:
+            yield session
+        except Exception as exc:
+            if is_broken_session(exc):
+                slot.retire.set()
+            raise
+        finally:
+            # Se a sessão foi reaberta nesse meio-tempo, o contador já recomeçou
+            if slot.session is session:
+                slot.in_flight -= 1
+            self._vacancy.set()
+
+    async def close(self) -> None:
+        """Fecha todas as sessões (encerra os processos filhos)"""
+        self._closing = True
+        for slot in self._slots:
+            slot.retire.set()
+        # Quem espera por vaga desiste em vez de esperar uma sessão que não vem
+        self._vacancy.set()
+        await asyncio.gather(*(slot.task for slot in self._slots if slot.task), return_exceptions=True)
+        self._slots.clear()
@@ -0,0 +1,114 @@
+"""
+Transporte stdio com várias requisições em andamento por sessão
+
+O `ClientSession` do SDK já casa respostas pelo id do JSON-RPC, mas o
+`stdio_client` escreve uma mensagem por vez no stdin do filho (uma chamada
+de sistema e um despertar do servidor por requisição). `pipelined_stdio_client`
+tem a mesma interface e:
+
+- guarda as mensagens de saída em uma fila limitada (`max_pending`): quem
+  envia espera quando a fila enche (contrapressão);
+- junta tudo o que estiver na fila em uma única escrita no pipe;
+- lê o stdout em blocos e entrega as respostas na ordem em que chegam.
+
+    async with pipelined_stdio_client(server_params) as (read, write):
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+            await asyncio.gather(*(session.call_tool("add", {"a": i, "b": 1}) for i in range(100)))
+"""
+
+import sys
+from contextlib import asynccontextmanager
+from typing import List, TextIO
+
+import anyio
+from mcp import StdioServerParameters, types
+from mcp.client.stdio import get_default_environment
+from mcp.shared.message import SessionMessage
+
+# Tempo para o filho sair sozinho depois de fechar o stdin (como no SDK)
+TERMINATION_TIMEOUT = 2.0
+
+
+@asynccontextmanager
+async def pipelined_stdio_client(
+    server: StdioServerParameters,
+    max_pending: int = 256,
+    max_batch: int = 256,
+    errlog: TextIO = sys.stderr,
+):
+    """Substituto de `mcp.client.stdio.stdio_client` com escrita em lote"""
+    read_writer, read_stream = anyio.create_memory_object_stream(max_pending)
+    write_stream, write_reader = anyio.create_memory_object_stream(max_pending)
+
+    env = {**get_default_environment(), **server.env} if server.env is not None else get_default_environment()
+    process = await anyio.open_process(
+        [server.command, *server.args], env=env, cwd=server.cwd, stderr=errlog
+    )
+
+    async def stdout_reader():
+        try:
+            async with read_writer:
+                buffer = b""
+                async for chunk in process.stdout:
+                    lines = (buffer + chunk).split(b"\n")
+                    buffer = lines.pop()
+                    for line in lines:
+                        if not line.strip():
+                            continue
+                        try:
+                            message = types.JSONRPCMessage.model_validate_json(line)
+                        except Exception as exc:
+                            await read_writer.send(exc)
+                            continue
+                        await read_writer.send(SessionMessage(message))
+        except (anyio.ClosedResourceError, anyio.BrokenResourceError):
+            await anyio.lowlevel.checkpoint()
+
+    async def stdin_writer():
+        try:
+            async with write_reader:
+                async for first in write_reader:
+                    # Deixa as outras tarefas prontas enfileirarem as suas mensagens:
+                    # tudo o que estiver na fila vai na mesma escrita
+                    await anyio.lowlevel.checkpoint()
+                    batch: List[SessionMessage] = [first]
+                    while len(batch) < max_batch:
+                        try:
+                            batch.append(write_reader.receive_nowait())
+                        except anyio.WouldBlock:
+                            break
+                    data = b"".join(
+                        message.message.model_dump_json(by_alias=True, exclude_none=True).encode(
+                            server.encoding, server.encoding_error_handler
+                        )
+                        + b"\n"
+                        for message in batch
+                    )
+                    await process.stdin.send(data)
+        except (anyio.ClosedResourceError, anyio.BrokenResourceError):
+            await anyio.lowlevel.checkpoint()
+
+    async with anyio.create_task_group() as tg, process:
+        tg.start_soon(stdout_reader)
+        tg.start_soon(stdin_writer)
+        try:
+            yield read_stream, write_stream
+        finally:
+            # Encerramento do MCP stdio: fecha o stdin, espera, depois SIGTERM/SIGKILL
+            try:
+                await process.stdin.aclose()
+            except Exception:
+                pass
+            with anyio.move_on_after(TERMINATION_TIMEOUT) as scope:
+                await process.wait()
+            if scope.cancelled_caught:
+                process.terminate()
+                with anyio.move_on_after(TERMINATION_TIMEOUT) as scope:
+                    await process.wait()
+                if scope.cancelled_caught:
+                    process.kill()
+            await read_stream.aclose()
+            await write_stream.aclose()
+            await read_writer.aclose()
+            await write_reader.aclose()
@@ -0,0 +1,87 @@
+"""
+Streaming de eventos dos agentes (tokens e ferramentas) e formatação SSE
+
+`agent_events` traduz o `astream_events` do LangChain (LangGraph ou
+AgentExecutor) em eventos simples:
+
+    {"type": "token", "text": "..."}
+    {"type": "tool_start", "tool": "add", "input": {...}}
+    {"type": "tool_end", "tool": "add", "output": "8"}
+    {"type": "final", "answer": "...", "state": <saída bruta do agente>}
+
+Os agentes de terminal usam `print_agent_stream`; o gateway usa `sse` para
+enviar os mesmos eventos como text/event-stream.
+"""
+
+import json
+from typing import Any, AsyncIterator, Dict, Optional
+
+
+def message_text(content: Any) -> str:
+    """Texto de um conteúdo de mensagem (string ou lista de blocos)"""
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "".join(
+            block.get("text", "") if isinstance(block, dict) else str(block) for block in content
+        )
+    return str(content)
+
+
+def _final_answer(output: Any) -> str:
+    if isinstance(output, dict):
+        if "messages" in output:
+            return message_text(output["messages"][-1].content)
+        if "output" in output:
+            return message_text(output["output"])
+    return message_text(getattr(output, "content", output))
+
+
+async def agent_events(runnable, inputs: Dict[str, Any], config: Optional[dict] = None) -> AsyncIterator[Dict[str, Any]]:
+    """Eventos do agente à medida que acontecem"""
+    async for event in runnable.astream_events(inputs, config=config, version="v2"):
+        kind = event["event"]
+        data = event.get("data", {})
+        if kind == "on_chat_model_stream":
+            text = message_text(data["chunk"].content)
+            if text:
+                yield {"type": "token", "text": text}
+        elif kind == "on_tool_start":
+            yield {"type": "tool_start", "tool": event["name"], "input": data.get("input")}
+        elif kind == "on_tool_end":
+            output = data.get("output")
+            yield {"type": "tool_end", "tool": event["name"], "output": message_text(getattr(output, "content", output))}
+        elif kind == "on_chain_end" and not event.get("parent_ids"):
+            output = data.get("output")
+            yield {"type": "final", "answer": _final_answer(output), "state": output}
+
+
+async def print_agent_stream(runnable, inputs: Dict[str, Any], config: Optional[dict] = None) -> Dict[str, Any]:
+    """Imprime os tokens e as ferramentas do agente em tempo real
+
+    Devolve o evento final (resposta completa e saída bruta do agente).
+    """
+    final: Dict[str, Any] = {"answer": "", "state": None}
+    streamed = False
+    async for event in agent_events(runnable, inputs, config):
+        if event["type"] == "token":
+            print(event["text"], end="", flush=True)
+            streamed = True
+        elif event["type"] == "tool_start":
+            print(f"\n🔧 {event['tool']}({json.dumps(event['input'], ensure_ascii=False, default=str)})", flush=True)
+        elif event["type"] == "tool_end":
+            print(f"   ↳ {event['output']}", flush=True)
+        elif event["type"] == "final":
+            final = event
+    if not streamed:
+        # Modelos sem streaming de tokens: imprime a resposta inteira no fim
+        print(final["answer"], end="")
+    print()
+    return final
+
+
+def sse(event: Dict[str, Any]) -> str:
+    """Formata um evento como mensagem Server-Sent Events"""
+    payload = {k: v for k, v in event.items() if k not in ("type", "state")}
+    data = json.dumps(payload, ensure_ascii=False, default=str)
+    return f"event: {event['type']}\ndata: {data}\n\n"
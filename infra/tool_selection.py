@@ -0,0 +1,213 @@
+"""
+Seleção das ferramentas relevantes antes de cada chamada ao LLM
+
+Com todas as ferramentas de todos os servidores ligadas ao modelo, o bloco de
+schemas vai inteiro em toda chamada: mais tokens de entrada e mais tempo até o
+primeiro token, que crescem junto com o catálogo. `ToolSelector` indexa nome,
+descrição e parâmetros de cada ferramenta (BM25, local) e, a cada chamada,
+liga ao modelo só:
+
+- as `top_k` ferramentas mais relevantes para a última pergunta do usuário;
+- as já usadas neste turno e no anterior (continuações como "e agora
+  multiplique por 3");
+- as devolvidas por `find_tools`, a meta-ferramenta de descoberta que fica
+  sempre disponível para o caso de a seleção ter deixado algo de fora.
+
+O `ToolNode` do grafo continua com o catálogo inteiro, então qualquer
+ferramenta pedida pelo modelo é executada.
+
+A seleção vem desligada por padrão (`TOOL_SELECTION=1` liga): um conjunto
+diferente a cada turno muda os bytes do início do prompt e perde o cache de
+prompt do provedor (`infra/prompt_prefix.py`). Só compensa quando o catálogo
+é tão grande que o schema inteiro custa mais do que o cache economiza.
+
+    selector = ToolSelector.from_env(tools)
+    agent = create_react_agent(selector.bind(model), selector.tools)
+"""
+
+import json
+import math
+import os
+import re
+import unicodedata
+from collections import Counter as TermCounter, OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from infra.metrics import REGISTRY, MetricsRegistry
+
+DISCOVERY_TOOL = "find_tools"
+
+# Palavras que não distinguem ferramentas (números costumam ser argumentos)
+_STOPWORDS = frozenset(
+    "a o as os e de da do das dos em no na nos nas um uma para por com que se ao "
+    "quanto qual quais the of to and or in on for with by is what how".split()
+)
+
+# Modelos já ligados a um conjunto de ferramentas (bind_tools converte os schemas)
+_BOUND_CACHE = 64
+
+
+def _tokens(text: str) -> List[str]:
+    """Palavras sem acento (snake_case/camelCase separados), mais um radical de 5 letras"""
+    text = re.sub(r"([a-z])([A-Z])", r"\1 \2", text)
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    folded = "".join(c for c in decomposed if not unicodedata.combining(c))
+    words = [word for word in re.findall(r"[a-z0-9]+", folded) if word not in _STOPWORDS and not word.isdigit()]
+    # "subtrair"/"subtraia"/"subtract" compartilham o radical
+    return words + [word[:5] for word in words if len(word) > 5]
+
+
+def tool_schema(tool: Any) -> Dict[str, Any]:
+    """Schema no formato de function calling (o que de fato vai no prompt)"""
+    from langchain_core.utils.function_calling import convert_to_openai_tool
+
+    return convert_to_openai_tool(tool)["function"]
+
+
+def _document(schema: Dict[str, Any]) -> List[str]:
+    parts = [schema["name"], schema["name"], schema.get("description", "")]
+    for name, spec in schema.get("parameters", {}).get("properties", {}).items():
+        parts += [name, spec.get("description", "")]
+    return _tokens(" ".join(parts))
+
+
+class ToolIndex:
+    """Índice BM25 das ferramentas (nome com peso dobrado, descrição e parâmetros)"""
+
+    def __init__(self, schemas: Sequence[Dict[str, Any]], k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.names = [schema["name"] for schema in schemas]
+        self.terms = [TermCounter(_document(schema)) for schema in schemas]
+        self.lengths = [sum(terms.values()) for terms in self.terms]
+        self.average = sum(self.lengths) / len(self.lengths) if self.lengths else 0.0
+        frequency = TermCounter(term for terms in self.terms for term in terms)
+        total = len(schemas)
+        self.idf = {term: math.log(1 + (total - n + 0.5) / (n + 0.5)) for term, n in frequency.items()}
+
+    def search(self, query: str, limit: int) -> List[Tuple[str, float]]:
+        """Nomes das ferramentas mais relevantes, com a pontuação (só as que casam)"""
+        query_terms = set(_tokens(query))
+        scores = []
+        for name, terms, length in zip(self.names, self.terms, self.lengths):
+            score = 0.0
+            for term in query_terms & terms.keys():
+                tf = terms[term]
+                norm = self.k1 * (1 - self.b + self.b * length / self.average)
+                score += self.idf[term] * tf * (self.k1 + 1) / (tf + norm)
+            if score > 0:
+                scores.append((name, score))
+        scores.sort(key=lambda item: -item[1])
+        return scores[:limit]
+
+
+def _message_type(message: Any) -> str:
+    return getattr(message, "type", "")
+
+
+class ToolSelector:
+    """Liga ao modelo, a cada chamada, só as ferramentas relevantes para o turno"""
+
+    def __init__(
+        self,
+        tools: Sequence[Any],
+        top_k: int = 8,
+        always: Iterable[str] = (),
+        registry: MetricsRegistry = REGISTRY,
+    ):
+        from langchain_core.tools import StructuredTool
+
+        self.catalog = list(tools)
+        self.top_k = top_k
+        self.always = set(always)
+        self.schemas = {tool.name: tool_schema(tool) for tool in self.catalog}
+        self.index = ToolIndex(list(self.schemas.values()))
+        self._sizes = {name: len(json.dumps(schema)) for name, schema in self.schemas.items()}
+        self._bound: "OrderedDict[Tuple[int, Tuple[str, ...]], Any]" = OrderedDict()
+        self.schema_chars = registry.counter(
+            "tool_schema_chars_total",
+            "Caracteres de schema de ferramentas por chamada ao LLM (bound = enviados; catalog = sem seleção)",
+            ("kind",),
+        )
+
+        def find_tools(query: str, limit: int = 5) -> str:
+            hits = self.index.search(query, limit)
+            return json.dumps(
+                [
+                    {"name": name, "description": self.schemas[name].get("description", ""),
+                     "parameters": list(self.schemas[name].get("parameters", {}).get("properties", {}))}
+                    for name, _ in hits
+                ],
+                ensure_ascii=False,
+            )
+
+        self.discovery = StructuredTool.from_function(
+            find_tools,
+            name=DISCOVERY_TOOL,
+            description=(
+                "Procura outras ferramentas pelo que fazem (nome, descrição ou parâmetros), "
+                "quando nenhuma das disponíveis serve. As encontradas ficam disponíveis "
+                "na próxima resposta."
+            ),
+        )
+
+    @classmethod
+    def from_env(cls, tools: Sequence[Any], always: Iterable[str] = ()) -> Optional["ToolSelector"]:
+        """Configurado por TOOL_SELECTION (1 liga; padrão desligado) e TOOL_SELECTION_TOP_K"""
+        if os.getenv("TOOL_SELECTION", "0") != "1":
+            return None
+        return cls(tools, top_k=int(os.getenv("TOOL_SELECTION_TOP_K", "8")), always=always)
+
+    @property
+    def tools(self) -> List[Any]:
+        """Catálogo completo para o ToolNode, mais a meta-ferramenta de descoberta"""
+        return [*self.catalog, self.discovery]
+
+    def select(self, messages: Sequence[Any]) -> List[str]:
+        """Ferramentas para a próxima chamada, na ordem do catálogo"""
+        humans = [i for i, message in enumerate(messages) if _message_type(message) == "human"]
+        # Catálogo pequeno: não há o que economizar, e nada fica de fora
+        if not humans or len(self.catalog) <= self.top_k:
+            return [tool.name for tool in self.catalog]
+        query = messages[humans[-1]].content
+        if not isinstance(query, str):
+            query = " ".join(part.get("text", "") for part in query if isinstance(part, dict))
+
+        wanted: Set[str] = set(self.always)
+        wanted.update(name for name, _ in self.index.search(query, self.top_k))
+        # Turno atual e o anterior: ferramentas chamadas e as achadas por find_tools
+        start = humans[-2] if len(humans) > 1 else humans[-1]
+        for message in messages[start:]:
+            for call in getattr(message, "tool_calls", None) or ():
+                wanted.add(call["name"])
+            if _message_type(message) == "tool" and getattr(message, "name", None) == DISCOVERY_TOOL:
+                try:
+                    wanted.update(hit["name"] for hit in json.loads(message.content))
+                except (TypeError, ValueError, KeyError):
+                    pass
+        # A ordem fixa do catálogo mantém o prefixo do prompt estável entre chamadas
+        return [tool.name for tool in self.catalog if tool.name in wanted]
+
+    def bind(self, model: Any):
+        """Modelo dinâmico para o `create_react_agent`: `(state, runtime) -> modelo com ferramentas`"""
+
+        def select_model(state: Any, runtime: Any = None):
+            messages = state["messages"] if isinstance(state, dict) else state.messages
+            # Nada da seleção fica na instância: o seletor é compartilhado por
+            # conversas simultâneas (o gateway e o runtime atendem várias)
+            names = self.select(messages)
+            self.schema_chars.inc(sum(self._sizes[name] for name in names), kind="bound")
+            self.schema_chars.inc(sum(self._sizes.values()), kind="catalog")
+            key = (id(model), tuple(names))
+            bound = self._bound.get(key)
+            if bound is None:
+                chosen = [tool for tool in self.catalog if tool.name in names]
+                bound = model.bind_tools([*chosen, self.discovery])
+                self._bound[key] = bound
+                if len(self._bound) > _BOUND_CACHE:
+                    self._bound.popitem(last=False)
+            else:
+                self._bound.move_to_end(key)
+            return bound
+
+        return select_model
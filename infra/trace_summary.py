@@ -0,0 +1,169 @@
+"""
+Resumo de traces: caminho crítico de cada turno
+
+Lê os spans exportados pelo FileExporter (JSON Lines, um arquivo por processo
+ou todos no mesmo arquivo) e imprime, para cada trace, o caminho crítico e o
+tempo gasto por categoria (llm, tool, graph, mcp.client, mcp.server, ...).
+
+Uso (a partir da raiz do repositório):
+
+    python -m infra.trace_summary traces.jsonl [outro.jsonl ...] [--slowest 5]
+"""
+
+import argparse
+import json
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
+
+
+@dataclass
+class SpanRecord:
+    trace_id: str
+    span_id: str
+    parent_id: str
+    name: str
+    service: str
+    category: str
+    start: int
+    end: int
+    children: List["SpanRecord"] = field(default_factory=list)
+
+    @property
+    def duration(self) -> float:
+        return (self.end - self.start) / 1e9
+
+
+def _category(record: dict) -> str:
+    category = (record.get("attributes") or {}).get("category")
+    if category:
+        return category
+    return record.get("name", "?").split(" ")[0].split(".")[0]
+
+
+def load_spans(paths: Iterable[str]) -> Dict[str, List[SpanRecord]]:
+    """Agrupa os spans por trace id"""
+    traces: Dict[str, List[SpanRecord]] = defaultdict(list)
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                record = json.loads(line)
+                if not record.get("endTimeUnixNano"):
+                    continue
+                traces[record["traceId"]].append(
+                    SpanRecord(
+                        trace_id=record["traceId"],
+                        span_id=record["spanId"],
+                        parent_id=record.get("parentSpanId") or "",
+                        name=record["name"],
+                        service=(record.get("resource") or {}).get("service.name", "?"),
+                        category=_category(record),
+                        start=int(record["startTimeUnixNano"]),
+                        end=int(record["endTimeUnixNano"]),
+                    )
+                )
+    return traces
+
+
+def build_tree(spans: List[SpanRecord]) -> List[SpanRecord]:
+    """Liga filhos aos pais e devolve as raízes (spans sem pai conhecido)"""
+    by_id = {span.span_id: span for span in spans}
+    roots = []
+    for span in spans:
+        parent = by_id.get(span.parent_id)
+        if parent is None:
+            roots.append(span)
+        else:
+            parent.children.append(span)
+    for span in spans:
+        _nest_contained(span)
+    return sorted(roots, key=lambda s: s.start)
+
+
+def _nest_contained(span: SpanRecord) -> None:
+    """Aninha irmãos contidos no intervalo de outro irmão
+
+    O LangGraph reporta o modelo (RunnableSequence) como irmão do nó
+    `call_model` que o executa; sem isso o LLM sumiria do caminho crítico.
+    """
+    children = sorted(span.children, key=lambda c: (c.start, -c.end))
+    kept: List[SpanRecord] = []
+    for child in children:
+        container = None
+        for other in kept:
+            if other.start <= child.start and child.end <= other.end:
+                if container is None or other.duration <= container.duration:
+                    container = other
+        if container is None:
+            kept.append(child)
+        else:
+            container.children.append(child)
+            _nest_contained(container)
+    span.children = kept
+
+
+def critical_path(span: SpanRecord, depth: int = 0) -> List[tuple]:
+    """Caminho crítico: a cadeia de filhos que determina quando o span termina
+
+    Devolve tuplas (profundidade, span, tempo próprio no caminho crítico).
+    """
+    chain = []
+    cursor = span.end
+    for child in sorted(span.children, key=lambda c: c.end, reverse=True):
+        if child.end <= cursor and child.start >= span.start:
+            chain.append(child)
+            cursor = child.start
+    chain.reverse()
+
+    covered = sum(min(child.end, span.end) - max(child.start, span.start) for child in chain)
+    self_time = max(0, (span.end - span.start) - covered) / 1e9
+
+    path = [(depth, span, self_time)]
+    for child in chain:
+        path.extend(critical_path(child, depth + 1))
+    return path
+
+
+def summarize_trace(root: SpanRecord, max_depth: Optional[int] = None) -> str:
+    path = critical_path(root)
+    total = root.duration or 1e-9
+    lines = [f"Trace {root.trace_id[:8]} — {root.name} ({root.service}) {root.duration:.3f}s"]
+    lines.append("  Caminho crítico:")
+    for depth, span, _ in path:
+        if max_depth is not None and depth > max_depth:
+            continue
+        lines.append(f"    {'  ' * depth}{span.duration * 1000:9.1f}ms  {span.name} [{span.service}]")
+
+    by_category: Dict[str, float] = defaultdict(float)
+    for _, span, self_time in path:
+        by_category[span.category] += self_time
+    lines.append("  Tempo no caminho crítico por categoria:")
+    for category, seconds in sorted(by_category.items(), key=lambda item: -item[1]):
+        lines.append(f"    {category:<12} {seconds * 1000:9.1f}ms  {seconds / total:6.1%}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resumo do caminho crítico dos traces")
+    parser.add_argument("files", nargs="+", help="Arquivos JSON Lines gerados com TRACE_EXPORTER=file")
+    parser.add_argument("--slowest", type=int, default=0, help="Mostra apenas os N traces mais lentos")
+    parser.add_argument("--depth", type=int, default=None, help="Profundidade máxima exibida")
+    args = parser.parse_args()
+
+    roots = []
+    for spans in load_spans(args.files).values():
+        roots.extend(build_tree(spans)[:1])
+    roots.sort(key=lambda s: s.start)
+    if args.slowest:
+        roots = sorted(roots, key=lambda s: s.duration, reverse=True)[: args.slowest]
+
+    for root in roots:
+        print(summarize_trace(root, args.depth))
+        print()
+
+
+if __name__ == "__main__":
+    main()
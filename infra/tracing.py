@@ -0,0 +1,249 @@
+"""
+Rastreamento distribuído compatível com OpenTelemetry
+
+Os spans seguem o modelo do OpenTelemetry (trace id de 16 bytes, span id de
+8 bytes, propagação W3C `traceparent`) e são exportados em JSON Lines com os
+mesmos nomes de campos do OTLP/JSON, o que permite processá-los offline ou
+reenviá-los a um coletor.
+
+Configuração por variáveis de ambiente:
+
+    TRACE_EXPORTER=console|file|none   (padrão: none)
+    TRACE_FILE=traces.jsonl            (usado pelo exportador "file")
+
+O contexto é propagado entre processos pelo cabeçalho HTTP `traceparent` e
+pelo campo `_meta` das requisições MCP (chave `traceparent`).
+"""
+
+import json
+import os
+import secrets
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, MutableMapping, Optional
+
+TRACEPARENT = "traceparent"
+
+
+@dataclass(frozen=True)
+class SpanContext:
+    """Identificadores que ligam um span ao seu trace"""
+
+    trace_id: str
+    span_id: str
+    sampled: bool = True
+
+    def to_traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    @classmethod
+    def from_traceparent(cls, value: Optional[str]) -> Optional["SpanContext"]:
+        if not value:
+            return None
+        parts = value.strip().split("-")
+        if len(parts) < 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+            return None
+        try:
+            int(parts[1], 16), int(parts[2], 16), int(parts[3], 16)
+        except ValueError:
+            return None
+        return cls(parts[1], parts[2], bool(int(parts[3], 16) & 1))
+
+
+@dataclass
+class Span:
+    """Operação cronometrada dentro de um trace"""
+
+    name: str
+    context: SpanContext
+    parent_span_id: Optional[str]
+    service: str
+    kind: str = "internal"
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    start_ns: int = field(default_factory=time.time_ns)
+    end_ns: Optional[int] = None
+    status: str = "unset"
+    status_message: str = ""
+    _tracer: Optional["Tracer"] = field(default=None, repr=False)
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def record_exception(self, exc: BaseException) -> None:
+        self.status = "error"
+        self.status_message = f"{type(exc).__name__}: {exc}"
+
+    def end(self) -> None:
+        if self.end_ns is not None:
+            return
+        self.end_ns = time.time_ns()
+        if self.status == "unset":
+            self.status = "ok"
+        if self._tracer is not None:
+            self._tracer.exporter.export(self)
+
+    @property
+    def duration(self) -> float:
+        end = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end - self.start_ns) / 1e9
+
+    def to_otlp(self) -> Dict[str, Any]:
+        return {
+            "traceId": self.context.trace_id,
+            "spanId": self.context.span_id,
+            "parentSpanId": self.parent_span_id or "",
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": self.start_ns,
+            "endTimeUnixNano": self.end_ns,
+            "attributes": self.attributes,
+            "status": {"code": self.status, "message": self.status_message},
+            "resource": {"service.name": self.service},
+        }
+
+
+class SpanExporter:
+    """Descarta os spans (exportador padrão)"""
+
+    def export(self, span: Span) -> None:
+        pass
+
+
+class ConsoleExporter(SpanExporter):
+    """Imprime um resumo por span em stderr (stdout pode ser o canal MCP stdio)"""
+
+    def export(self, span: Span) -> None:
+        parent = span.parent_span_id or "-"
+        print(
+            f"[trace {span.context.trace_id[:8]}] {span.service} {span.name} "
+            f"{span.duration * 1000:.1f}ms span={span.context.span_id} parent={parent} "
+            f"status={span.status}",
+            file=sys.stderr,
+        )
+
+
+class FileExporter(SpanExporter):
+    """Acrescenta os spans em JSON Lines (um objeto OTLP/JSON por linha)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        line = json.dumps(span.to_otlp(), ensure_ascii=False, default=str)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def activate(span: Optional[Span]) -> Optional[Span]:
+    """Torna `span` o span corrente e devolve o anterior (para `activate` de volta)
+
+    Útil quando início e fim acontecem em funções diferentes (callbacks),
+    onde o token de `ContextVar.reset` não pode ser usado.
+    """
+    previous = _current_span.get()
+    _current_span.set(span)
+    return previous
+
+
+class Tracer:
+    """Cria spans de um serviço e os entrega ao exportador configurado"""
+
+    def __init__(self, service: str, exporter: Optional[SpanExporter] = None):
+        self.service = service
+        self.exporter = exporter or SpanExporter()
+
+    def start_span(
+        self,
+        name: str,
+        kind: str = "internal",
+        attributes: Optional[Dict[str, Any]] = None,
+        parent: Optional[SpanContext] = None,
+    ) -> Span:
+        """Inicia um span sem ativá-lo; o chamador deve chamar `span.end()`"""
+        if parent is None:
+            active = _current_span.get()
+            parent = active.context if active else None
+        trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        return Span(
+            name=name,
+            context=SpanContext(trace_id, secrets.token_hex(8)),
+            parent_span_id=parent.span_id if parent else None,
+            service=self.service,
+            kind=kind,
+            attributes=dict(attributes or {}),
+            _tracer=self,
+        )
+
+    @contextmanager
+    def span(
+        self,
+        name: str,
+        kind: str = "internal",
+        attributes: Optional[Dict[str, Any]] = None,
+        parent: Optional[SpanContext] = None,
+    ) -> Iterator[Span]:
+        """Context manager que inicia, ativa e encerra um span"""
+        span = self.start_span(name, kind, attributes, parent)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as exc:
+            span.record_exception(exc)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end()
+
+
+def exporter_from_env() -> SpanExporter:
+    kind = os.getenv("TRACE_EXPORTER", "none").lower()
+    if kind == "console":
+        return ConsoleExporter()
+    if kind == "file":
+        return FileExporter(os.getenv("TRACE_FILE", "traces.jsonl"))
+    return SpanExporter()
+
+
+_tracers: Dict[str, Tracer] = {}
+
+
+def get_tracer(service: str) -> Tracer:
+    """Devolve o tracer do serviço, com o exportador definido pelo ambiente"""
+    tracer = _tracers.get(service)
+    if tracer is None:
+        tracer = _tracers[service] = Tracer(service, exporter_from_env())
+    return tracer
+
+
+def inject(carrier: MutableMapping[str, Any], span: Optional[Span] = None) -> MutableMapping[str, Any]:
+    """Grava o contexto do span (ou do span corrente) em cabeçalhos ou `_meta`"""
+    span = span or _current_span.get()
+    if span is not None:
+        carrier[TRACEPARENT] = span.context.to_traceparent()
+    return carrier
+
+
+def extract(carrier: Optional[Any]) -> Optional[SpanContext]:
+    """Lê o contexto propagado de cabeçalhos HTTP, dict ou `_meta` do MCP"""
+    if carrier is None:
+        return None
+    if hasattr(carrier, "get"):
+        value = carrier.get(TRACEPARENT)
+    else:
+        value = getattr(carrier, TRACEPARENT, None)
+        if value is None and hasattr(carrier, "model_extra"):
+            value = (carrier.model_extra or {}).get(TRACEPARENT)
+    return SpanContext.from_traceparent(value)
@@ -0,0 +1,163 @@
+"""
+Aquecimento e prontidão (liveness vs. readiness)
+
+Um processo recém-iniciado ainda não tem sessões abertas nem caches
+carregados, e as primeiras requisições pagariam esse custo. O aquecimento:
+
+1. abre o pool de sessões e carrega o catálogo de ferramentas;
+2. executa tarefas extras (ex.: compilar o grafo do agente);
+3. opcionalmente, faz rodadas de chamadas sintéticas a cada ferramenta, em
+   todas as sessões, até o p99 de uma rodada não piorar mais que
+   `tolerance` em relação à anterior (regime estável).
+
+`READINESS` guarda o estado do processo: `/healthz` responde enquanto o
+processo estiver vivo; `/readyz` só responde 200 depois do aquecimento (o
+processo nasce em "starting" e volta a 503 durante o desligamento), para o
+balanceador só enviar tráfego a workers prontos. Um aquecimento que falha é
+tentado de novo com espera exponencial; esgotadas as tentativas, a exceção
+sobe (com vários workers, o supervisor recria o processo).
+"""
+
+import asyncio
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+
+class Readiness:
+    """Estado de prontidão do processo"""
+
+    def __init__(self):
+        # Não pronto até alguém marcar: o aquecimento ou, sem ele, a aplicação
+        self.state = "starting"
+        self.detail: Dict[str, Any] = {}
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    @property
+    def warming(self) -> bool:
+        return self.state == "warming"
+
+    def begin(self) -> None:
+        self.state = "warming"
+        self.detail = {"started": self.detail.get("started", time.time())}
+
+    def mark_ready(self, **detail: Any) -> None:
+        self.detail.update(detail)
+        self.state = "ready"
+
+    def mark_failed(self, error: BaseException, attempts: int = 1) -> None:
+        self.detail.update(error=str(error), attempts=attempts)
+        self.state = "failed"
+
+    def mark_draining(self) -> None:
+        self.state = "draining"
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"status": self.state, **self.detail}
+
+
+READINESS = Readiness()
+
+
+def synthetic_arguments(schema: Dict[str, Any]) -> Dict[str, Any]:
+    """Argumentos válidos e baratos a partir do inputSchema da ferramenta"""
+    samples = {"integer": 1, "number": 1.0, "string": "a", "boolean": False, "array": [], "object": {}}
+    arguments = {}
+    for name, spec in (schema.get("properties") or {}).items():
+        if "default" in spec:
+            arguments[name] = spec["default"]
+        else:
+            arguments[name] = samples.get(spec.get("type"), 1)
+    return arguments
+
+
+def _p99(latencies: List[float]) -> float:
+    ordered = sorted(latencies)
+    return ordered[min(len(ordered) - 1, int(0.99 * len(ordered)))] if ordered else 0.0
+
+
+async def synthetic_round(pool) -> List[float]:
+    """Chama cada ferramenta uma vez em cada sessão do pool; devolve as latências"""
+    latencies: List[float] = []
+
+    async def exercise():
+        async with pool.acquire() as session:
+            for tool in pool.tools:
+                start = time.perf_counter()
+                try:
+                    await session.call_tool(tool.name, synthetic_arguments(tool.inputSchema or {}))
+                except Exception:
+                    # Erro da ferramenta com argumentos sintéticos não impede o aquecimento
+                    pass
+                latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(exercise() for _ in range(pool.size)))
+    return latencies
+
+
+async def warm_up(
+    pool,
+    readiness: Readiness = READINESS,
+    extra: Optional[List[Callable[[], Awaitable[Any]]]] = None,
+    synthetic: bool = True,
+    max_rounds: int = 5,
+    tolerance: float = 0.2,
+    max_attempts: int = 0,
+    retry_backoff: float = 1.0,
+    max_retry_backoff: float = 30.0,
+) -> None:
+    """Aquece o pool (e o que mais for pedido) e marca o processo como pronto
+
+    Falhas são tentadas de novo, esperando `retry_backoff` segundos (dobrando
+    até `max_retry_backoff`); com `max_attempts` > 0, a última falha sobe.
+    """
+    start = time.perf_counter()
+    attempt = 0
+    while True:
+        attempt += 1
+        readiness.begin()
+        try:
+            await pool.start()
+            for task in extra or []:
+                await task()
+            rounds: List[float] = []
+            if synthetic and pool.tools:
+                for _ in range(max_rounds):
+                    rounds.append(_p99(await synthetic_round(pool)))
+                    # Estável: a rodada não ficou mais lenta que a anterior (com folga)
+                    if len(rounds) >= 2 and rounds[-1] <= rounds[-2] * (1 + tolerance):
+                        break
+            break
+        except Exception as exc:
+            readiness.mark_failed(exc, attempts=attempt)
+            if max_attempts and attempt >= max_attempts:
+                raise
+            delay = min(retry_backoff * 2 ** (attempt - 1), max_retry_backoff)
+            print(f"⚠️ Aquecimento falhou (tentativa {attempt}): {exc}; tentando de novo em {delay:.1f}s", flush=True)
+            await asyncio.sleep(delay)
+    readiness.mark_ready(
+        warmup_seconds=round(time.perf_counter() - start, 3),
+        attempts=attempt,
+        tools=len(pool.tools),
+        sessions=pool.size,
+        synthetic_p99_ms=[round(p99 * 1000, 2) for p99 in rounds],
+    )
+
+
+def warm_up_from_env(
+    pool, readiness: Readiness = READINESS, extra=None, max_attempts: int = 0
+) -> Awaitable[None]:
+    """`warm_up` configurado por WARMUP_* (WARMUP_SYNTHETIC=0 pula as chamadas sintéticas)"""
+    return warm_up(
+        pool,
+        readiness,
+        extra=extra,
+        synthetic=os.getenv("WARMUP_SYNTHETIC", "1") != "0",
+        max_rounds=int(os.getenv("WARMUP_MAX_ROUNDS", "5")),
+        tolerance=float(os.getenv("WARMUP_TOLERANCE", "0.2")),
+        max_attempts=int(os.getenv("WARMUP_MAX_ATTEMPTS", str(max_attempts))),
+        retry_backoff=float(os.getenv("WARMUP_RETRY_BACKOFF", "1")),
+    )
@@ -0,0 +1,287 @@
+"""
+Controle de admissão para o gateway HTTP
+
+Cada requisição ao gateway abre um processo filho do math_server.py. Sem
+limite, um pico de tráfego cria centenas de interpretadores e derruba a
+máquina. Este módulo limita a concorrência global e por ferramenta, mantém
+uma fila de espera limitada e descarta cedo (503 + Retry-After) as
+requisições que não conseguiriam ser atendidas antes do prazo.
+
+O limite global é adaptativo (AIMD): cresce devagar enquanto a latência
+está saudável e encolhe rápido quando ela degrada ou ocorrem erros.
+Trabalhos longos (um turno inteiro do agente) usam limitadores isolados, de
+tamanho fixo, que não passam pelo global nem alimentam o AIMD: a latência
+deles não diz nada sobre a saúde das chamadas rápidas.
+"""
+
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict, Optional
+
+
+class Overloaded(Exception):
+    """Requisição rejeitada por sobrecarga (deve virar HTTP 503)"""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class AIMDLimit:
+    """Limite de concorrência adaptativo (aumento aditivo, redução multiplicativa)
+
+    A latência alvo pode ser fixa (target_latency) ou derivada da menor
+    latência observada multiplicada por uma tolerância, no estilo gradiente.
+    """
+
+    def __init__(
+        self,
+        initial: int,
+        min_limit: int = 1,
+        max_limit: int = 64,
+        target_latency: Optional[float] = None,
+        tolerance: float = 2.0,
+        backoff: float = 0.9,
+    ):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.target_latency = target_latency
+        self.tolerance = tolerance
+        self.backoff = backoff
+        self._limit = float(min(max(initial, min_limit), max_limit))
+        self._min_latency: Optional[float] = None
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    def threshold(self) -> Optional[float]:
+        """Latência a partir da qual o sistema é considerado congestionado"""
+        if self.target_latency is not None:
+            return self.target_latency
+        if self._min_latency is None:
+            return None
+        return self._min_latency * self.tolerance
+
+    def update(self, latency: Optional[float], ok: bool, inflight: int) -> None:
+        """Ajusta o limite após o término de uma requisição"""
+        if latency is not None:
+            if self._min_latency is None or latency < self._min_latency:
+                self._min_latency = latency
+
+        threshold = self.threshold()
+        congested = not ok or (
+            latency is not None and threshold is not None and latency > threshold
+        )
+
+        if congested:
+            self._limit = max(self.min_limit, self._limit * self.backoff)
+        elif inflight + 1 >= self.limit:
+            # Só cresce quando o limite atual está de fato sendo usado
+            self._limit = min(self.max_limit, self._limit + 1.0 / self._limit)
+
+
+class ConcurrencyLimiter:
+    """Semáforo com fila limitada e descarte consciente de prazo"""
+
+    def __init__(self, name: str, limit, max_queue: int = 32):
+        self.name = name
+        self._limit = limit if isinstance(limit, AIMDLimit) else None
+        self._fixed_limit = None if self._limit else int(limit)
+        self.max_queue = max_queue
+        self.inflight = 0
+        self.rejected = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._avg_latency: Optional[float] = None
+
+    @property
+    def limit(self) -> int:
+        return self._limit.limit if self._limit else self._fixed_limit
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def estimated_wait(self, position: int) -> float:
+        """Tempo estimado até a posição `position` da fila ser atendida"""
+        if self._avg_latency is None:
+            return 0.0
+        return position * self._avg_latency / max(1, self.limit)
+
+    def _reject(self, reason: str, position: int) -> Overloaded:
+        self.rejected += 1
+        return Overloaded(
+            f"{self.name}: {reason}", retry_after=self.estimated_wait(position)
+        )
+
+    async def acquire(self, deadline: float) -> None:
+        """Obtém uma vaga ou espera na fila até o prazo (monotonic)"""
+        if self.inflight < self.limit and not self._waiters:
+            self.inflight += 1
+            return
+
+        position = len(self._waiters) + 1
+        if position > self.max_queue:
+            raise self._reject("fila de espera cheia", position)
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0 or self.estimated_wait(position) > remaining:
+            raise self._reject("prazo insuficiente para aguardar na fila", position)
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), remaining)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as exc:
+            if waiter.done() and not waiter.cancelled():
+                # A vaga foi concedida no mesmo instante do timeout: devolve
+                self._release_slot()
+            else:
+                waiter.cancel()
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+            if isinstance(exc, asyncio.CancelledError):
+                raise
+            raise self._reject("tempo de espera na fila esgotado", position)
+
+    def release(self, latency: Optional[float], ok: bool) -> None:
+        """Devolve a vaga e alimenta o algoritmo adaptativo"""
+        if latency is not None:
+            if self._avg_latency is None:
+                self._avg_latency = latency
+            else:
+                self._avg_latency = 0.8 * self._avg_latency + 0.2 * latency
+        if self._limit:
+            self._limit.update(latency, ok, self.inflight)
+        self._release_slot()
+
+    def _release_slot(self) -> None:
+        self.inflight -= 1
+        while self._waiters and self.inflight < self.limit:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.inflight += 1
+                waiter.set_result(None)
+
+    def snapshot(self) -> Dict[str, float]:
+        return {
+            "limit": self.limit,
+            "inflight": self.inflight,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "avg_latency": self._avg_latency or 0.0,
+        }
+
+
+class AdmissionController:
+    """Combina o limite global adaptativo com limites fixos por ferramenta
+
+    Nomes em `isolated_limits` têm só o próprio limite fixo: não reservam
+    vaga no global e não entram no cálculo do AIMD.
+    """
+
+    def __init__(
+        self,
+        global_limit: int = 8,
+        max_global_limit: int = 64,
+        tool_limits: Optional[Dict[str, int]] = None,
+        default_tool_limit: Optional[int] = None,
+        max_queue: int = 32,
+        queue_timeout: float = 5.0,
+        target_latency: Optional[float] = None,
+        isolated_limits: Optional[Dict[str, int]] = None,
+    ):
+        self.queue_timeout = queue_timeout
+        self.max_queue = max_queue
+        self.default_tool_limit = default_tool_limit
+        self.global_limiter = ConcurrencyLimiter(
+            "global",
+            AIMDLimit(
+                global_limit,
+                max_limit=max_global_limit,
+                target_latency=target_latency,
+            ),
+            max_queue=max_queue,
+        )
+        self.tool_limiters: Dict[str, ConcurrencyLimiter] = {
+            name: ConcurrencyLimiter(name, limit, max_queue=max_queue)
+            for name, limit in (tool_limits or {}).items()
+        }
+        self.isolated_limiters: Dict[str, ConcurrencyLimiter] = {
+            name: ConcurrencyLimiter(name, limit, max_queue=max_queue)
+            for name, limit in (isolated_limits or {}).items()
+        }
+
+    def _tool_limiter(self, tool_name: str) -> Optional[ConcurrencyLimiter]:
+        limiter = self.tool_limiters.get(tool_name)
+        if limiter is None and self.default_tool_limit:
+            limiter = ConcurrencyLimiter(
+                tool_name, self.default_tool_limit, max_queue=self.max_queue
+            )
+            self.tool_limiters[tool_name] = limiter
+        return limiter
+
+    @asynccontextmanager
+    async def admit(self, tool_name: str, deadline: Optional[float] = None):
+        """Reserva vagas (ferramenta e global) durante a execução do bloco
+
+        A espera na fila vai até `queue_timeout` ou até `deadline` (instante
+        do relógio monotônico em que a requisição expira), o que vier antes.
+        """
+        queue_deadline = time.monotonic() + self.queue_timeout
+        deadline = queue_deadline if deadline is None else min(deadline, queue_deadline)
+
+        isolated = self.isolated_limiters.get(tool_name)
+        if isolated:
+            await isolated.acquire(deadline)
+            start = time.monotonic()
+            ok = False
+            try:
+                yield
+                ok = True
+            finally:
+                isolated.release(time.monotonic() - start, ok)
+            return
+
+        tool_limiter = self._tool_limiter(tool_name)
+        if tool_limiter:
+            await tool_limiter.acquire(deadline)
+        try:
+            await self.global_limiter.acquire(deadline)
+        except BaseException:
+            if tool_limiter:
+                tool_limiter.release(None, ok=True)
+            raise
+
+        start = time.monotonic()
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            latency = time.monotonic() - start
+            self.global_limiter.release(latency, ok)
+            if tool_limiter:
+                tool_limiter.release(latency, ok)
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        snapshot = {"global": self.global_limiter.snapshot()}
+        for name, limiter in {**self.tool_limiters, **self.isolated_limiters}.items():
+            snapshot[name] = limiter.snapshot()
+        return snapshot
+
+
+def parse_tool_limits(spec: Optional[str]) -> Dict[str, int]:
+    """Converte "add=4,subtract=2" em {"add": 4, "subtract": 2}"""
+    limits = {}
+    for item in (spec or "").split(","):
+        if "=" in item:
+            name, value = item.split("=", 1)
+            limits[name.strip()] = int(value)
+    return limits
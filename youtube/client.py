@@ -1,45 +1,61 @@
-from mcp import ClientSession, StdioServerParameters
-from mcp.client.stdio import stdio_client
-from langchain_openai import AzureChatOpenAI
-from pydantic import SecretStr
-from langchain_mcp_adapters.tools import load_mcp_tools
-from langgraph.prebuilt import create_react_agent
 import asyncio
 import os
+import sys
 from dotenv import load_dotenv
 
+# Permite importar o pacote infra/ da raiz do repositório
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from infra.agent_callbacks import TurnTimingCallback
+from infra.agent_runtime import AgentRuntime
+from infra.checkpointer import SQLiteCheckpointer, session_id
+from infra.llm import create_chat_model
+from infra.streaming import print_agent_stream
+
 
 load_dotenv()
 
-# Carrega variáveis de ambiente
-azure_endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
-azure_api_key = os.getenv("AZURE_OPENAI_API_KEY")
-azure_deployment = os.getenv("AZURE_OPENAI_CHAT_DEPLOYMENT_NAME") or os.getenv("AZURE_MODEL_NAME")
-azure_api_version = os.getenv("OPENAI_API_VERSION")
-
-model = AzureChatOpenAI(
-    azure_endpoint=azure_endpoint,
-    azure_deployment=azure_deployment,
-    api_key=SecretStr(azure_api_key) if azure_api_key else None,
-    api_version=azure_api_version,
-)
-
-server_params = StdioServerParameters(
-    command="python",
-    args=["math_server.py"]
-)
-async def run_agent():
-    # Inicia o cliente MCP com os parâmetros do servidor
-    async with stdio_client(server_params) as (read, write):
-        async with ClientSession(read, write) as session:
-            await session.initialize()
-            tools = await load_mcp_tools(session)
-            agent = create_react_agent(model, tools)
-            agent_response = await agent.ainvoke({"messages": ["Qual é a soma de 5 e 3?"]})
-           
-            # Retorna apenas o conteúdo da resposta da IA
-            return agent_response["messages"][-1].content
+# Modelo LLM (LLM_BACKEND=azure|scripted|replay)
+model = create_chat_model()
+
+# Servidor MCP (processo math_server.py aberto uma única vez por execução)
+connections = {
+    "math": {
+        "transport": "stdio",
+        "command": "python",
+        "args": ["math_server.py"],
+    }
+}
+
+timing = TurnTimingCallback("youtube_client")
+
+# Conversa persistida em disco (CHECKPOINT=0 desativa); AGENT_SESSION=<id> retoma
+checkpointer = SQLiteCheckpointer.from_env(".checkpoints.sqlite")
+thread = {"configurable": {"thread_id": session_id()}}
+
+async def run_agent(runtime: AgentRuntime, question: str):
+    # Sessão, ferramentas e grafo vêm prontos do runtime: nada é recriado por pergunta
+    agent = await runtime.get_agent()
+    timing.start_turn()
+    # Imprime os tokens e as chamadas de ferramenta à medida que chegam
+    final = await print_agent_stream(
+        agent,
+        {"messages": [question]},
+        config={**thread, "callbacks": [timing]},
+    )
+    print(timing.finish_turn().format())
+   
+    # Retorna apenas o conteúdo da resposta da IA
+    return final["answer"]
+
+async def main(questions):
+    async with AgentRuntime(connections, model, checkpointer=checkpointer) as runtime:
+        if checkpointer:
+            print(f"💾 Sessão {thread['configurable']['thread_id']} (AGENT_SESSION=<id> para continuar)")
+        for question in questions:
+            print(f"❓ {question}")
+            await run_agent(runtime, question)
 
 if __name__ == "__main__":
-    response = asyncio.run(run_agent())
-    print(response)
+    # Perguntas pela linha de comando; sem argumentos, usa o exemplo padrão
+    asyncio.run(main(sys.argv[1:] or ["Qual é a soma de 5 e 3?"]))
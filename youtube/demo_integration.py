@@ -11,24 +11,26 @@ Arquitetura:
 3. LLM usa as ferramentas para responder perguntas em linguagem natural
 """
 
+import argparse
+import asyncio
 import requests
 import json
-from langchain_openai import AzureChatOpenAI
-from pydantic import SecretStr
-from langchain_core.tools import tool
-from langgraph.prebuilt import create_react_agent
 import os
+import sys
 from dotenv import load_dotenv
+
+# Permite importar o pacote infra/ da raiz do repositório
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from infra.agent_callbacks import TurnTimingCallback
+from infra.batch_eval import evaluate_file
+from infra.llm import create_chat_model
+from infra.memory import OUTPUT_TOOL, ConversationMemory
+from infra.tool_selection import ToolSelector
 from typing import Dict, Any, List
 
 load_dotenv()
 
-# Configuração do Azure OpenAI
-azure_endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
-azure_api_key = os.getenv("AZURE_OPENAI_API_KEY")
-azure_deployment = os.getenv("AZURE_OPENAI_CHAT_DEPLOYMENT_NAME") or os.getenv("AZURE_MODEL_NAME")
-azure_api_version = os.getenv("OPENAI_API_VERSION")
-
 # URL do servidor HTTP MCP
 SERVER_URL = "http://localhost:8000"
 
@@ -128,7 +130,9 @@ mcp_client = MCPHTTPClient(SERVER_URL)
 
 def create_llm_tools() -> List:
     """Cria ferramentas LangChain que consomem o servidor MCP via HTTP"""
-    
+    # Import adiado: a descoberta e o teste de conexão não precisam do LangChain
+    from langchain_core.tools import tool
+
     @tool
     def discover_available_tools() -> str:
         """Descobre e lista todas as ferramentas matemáticas disponíveis no servidor MCP."""
@@ -199,24 +203,35 @@ def create_llm_tools() -> List:
     
     return [discover_available_tools, add_numbers, subtract_numbers]
 
-def setup_llm_agent():
-    """Configura o agente LLM com as ferramentas MCP"""
-    # Configuração do modelo Azure OpenAI
-    model = AzureChatOpenAI(
-        azure_endpoint=azure_endpoint,
-        azure_deployment=azure_deployment,
-        api_key=SecretStr(azure_api_key) if azure_api_key else None,
-        api_version=azure_api_version,
-    )
+def setup_llm_agent(memory: ConversationMemory = None):
+    """Configura o agente LLM com as ferramentas MCP
+
+    Com `memory`, o agente ganha `resolve_output` para recuperar as saídas
+    grandes que a memória guardou fora do contexto.
+    """
+    from langgraph.prebuilt import create_react_agent
+
+    # Configuração do modelo (LLM_BACKEND=azure|scripted|replay)
+    model = create_chat_model()
     
     # Cria ferramentas que consomem o servidor MCP
     tools = create_llm_tools()
+    if memory is not None:
+        tools.append(memory.resolve_tool())
     
-    # Cria agente React
-    agent = create_react_agent(model, tools)
+    # Cria agente React; com a seleção (TOOL_SELECTION=1 liga), cada
+    # chamada ao LLM leva só as ferramentas relevantes, e a de descoberta sempre
+    selector = ToolSelector.from_env(tools, always=("discover_available_tools", OUTPUT_TOOL))
+    if selector:
+        agent = create_react_agent(selector.bind(model), selector.tools)
+    else:
+        agent = create_react_agent(model, tools)
     
     return agent
 
+# Mede o tempo de cada pergunta: LLM vs. ferramentas vs. overhead
+turn_timing = TurnTimingCallback("demo_integration")
+
 def demo_automatic_discovery():
     """Demonstra a descoberta automática de ferramentas"""
     print("\n" + "="*60)
@@ -276,9 +291,11 @@ def demo_llm_integration():
             print("   Resposta: ", end="")
             
             try:
-                response = agent.invoke({"messages": [query]})
+                turn_timing.start_turn()
+                response = agent.invoke({"messages": [query]}, config={"callbacks": [turn_timing]})
                 answer = response["messages"][-1].content
                 print(answer)
+                print(f"   {turn_timing.finish_turn().format()}")
             except Exception as e:
                 print(f"❌ Erro: {e}")
         
@@ -302,7 +319,9 @@ def interactive_demo():
     print("\nDigite 'sair' para encerrar.\n")
     
     try:
-        agent = setup_llm_agent()
+        # Histórico da conversa com resumo dos turnos antigos
+        memory = ConversationMemory.from_env()
+        agent = setup_llm_agent(memory)
         
         while True:
             user_input = input("🧑 Você: ").strip()
@@ -317,9 +336,13 @@ def interactive_demo():
             print("🤖 LLM: ", end="")
             
             try:
-                response = agent.invoke({"messages": [user_input]})
+                turn_timing.start_turn()
+                messages = memory.context(user_input)
+                response = agent.invoke({"messages": messages}, config={"callbacks": [turn_timing]})
+                memory.add_turn(response["messages"][len(messages) - 1:])
                 answer = response["messages"][-1].content
-                print(answer + "\n")
+                print(answer)
+                print(turn_timing.finish_turn().format() + "\n")
             except Exception as e:
                 print(f"❌ Erro: {e}\n")
                 
@@ -378,5 +401,24 @@ def main():
         
         input("\nPressione Enter para continuar...")
 
+def run_batch_file(path: str, output: str = None, concurrency: int = None):
+    """Avalia um arquivo de perguntas em paralelo (as mesmas ferramentas dos casos de teste)"""
+    agent = setup_llm_agent()
+
+    async def answer(question: str, callbacks) -> str:
+        response = await agent.ainvoke({"messages": [question]}, config={"callbacks": callbacks})
+        return response["messages"][-1].content
+
+    asyncio.run(evaluate_file(answer, path, output, concurrency, agent="demo_integration"))
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Demo LLM + servidor HTTP MCP")
+    parser.add_argument("--batch", help="Arquivo de perguntas (uma por linha ou JSONL) para avaliar em lote")
+    parser.add_argument("--output", help="JSONL de resultados e retomada (padrão: <arquivo>.results.jsonl)")
+    parser.add_argument("--concurrency", type=int, help="Perguntas em paralelo (padrão: BATCH_CONCURRENCY ou 8)")
+    args = parser.parse_args()
+
+    if args.batch:
+        run_batch_file(args.batch, args.output, args.concurrency)
+    else:
+        main()
\ No newline at end of file
@@ -1,12 +1,59 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
-from mcp import ClientSession, StdioServerParameters
-from mcp.client.stdio import stdio_client
+from mcp import StdioServerParameters
+from contextlib import AsyncExitStack, asynccontextmanager, contextmanager
+from functools import lru_cache
 import asyncio
+import os
+import sys
+import time
 import uvicorn
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
-app = FastAPI(title="MCP Math Server HTTP API", version="1.0.0")
+# Permite importar o pacote infra/ da raiz do repositório
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from admission import AdmissionController, Overloaded, parse_tool_limits
+from infra.agent_runtime import AgentRuntime
+from infra.deadlines import ClientDisconnected, Deadline, DeadlineExceeded, run_until_deadline
+from infra.mcp_calls import call_tool
+from infra.llm import create_chat_model
+from infra.metrics import CONTENT_TYPE, REGISTRY, ToolMetrics, render_metrics
+from infra.payloads import ACCEPT_META, Payload, result_payload
+from infra.serve import serve
+from infra.session_pool import SessionPool
+from infra.streaming import agent_events, sse
+from infra.tracing import extract, get_tracer
+from infra.warmup import READINESS, warm_up_from_env
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Aquecimento em segundo plano: /healthz responde já, /readyz só no fim
+    extra = [lambda: agent_runtime().start()] if os.getenv("WARMUP_AGENT") == "1" else []
+    # Já "warming" antes da primeira requisição, não quando a tarefa começar
+    READINESS.begin()
+    # Com vários workers, depois de 3 tentativas o worker sai e o supervisor o
+    # recria; sozinho, o processo tenta até conseguir
+    multi_worker = os.getenv("WORKER_ID") is not None
+    warmup = asyncio.create_task(
+        warm_up_from_env(session_pool, extra=extra, max_attempts=3 if multi_worker else 0)
+    )
+    if multi_worker:
+        # Com vários workers (infra/serve.py) os outros atendem enquanto este
+        # aquece: ele só passa a aceitar conexões do socket compartilhado pronto
+        await warmup
+    yield
+    READINESS.mark_draining()
+    if not warmup.done():
+        warmup.cancel()
+    await asyncio.gather(warmup, return_exceptions=True)
+    # Fecha a sessão MCP do agente compartilhado, se chegou a ser aberta
+    if agent_runtime.cache_info().currsize:
+        await agent_runtime().close()
+    await session_pool.close()
+
+app = FastAPI(title="MCP Math Server HTTP API", version="1.0.0", lifespan=lifespan)
 
 # Modelos Pydantic para requisições
 class MathOperation(BaseModel):
@@ -19,30 +66,220 @@ class GenericQuery(BaseModel):
 # Parâmetros do servidor MCP
 server_params = StdioServerParameters(
     command="python",
-    args=["math_server.py"]
+    args=["math_server.py"],
+    # O filho só herda um ambiente mínimo: repassa a configuração de
+    # observabilidade, da implementação do servidor e dos resultados binários
+    env={
+        k: v
+        for k, v in os.environ.items()
+        if k.startswith(("TRACE_", "MCP_METRICS", "MCP_SERVER_IMPL", "MCP_BINARY"))
+    },
+)
+
+# Sessões com o math_server.py abertas na partida e reaproveitadas; cada uma
+# leva até MCP_POOL_MAX_IN_FLIGHT chamadas em pipeline no mesmo stdio. O
+# catálogo de ferramentas é carregado junto
+session_pool = SessionPool(
+    server_params,
+    size=int(os.getenv("MCP_POOL_SIZE", "4")),
+    name="math",
+    max_in_flight=int(os.getenv("MCP_POOL_MAX_IN_FLIGHT", "8")),
+)
+
+# Controle de admissão: limita a concorrência global (adaptativa) e por
+# ferramenta antes de disputar as sessões do pool. Os streams do agente têm
+# limite fixo próprio, fora do AIMD (um turno leva segundos, não milissegundos)
+admission = AdmissionController(
+    global_limit=int(os.getenv("MCP_MAX_CONCURRENCY", "8")),
+    max_global_limit=int(os.getenv("MCP_MAX_CONCURRENCY_CEILING", "32")),
+    tool_limits=parse_tool_limits(os.getenv("MCP_TOOL_CONCURRENCY")),
+    default_tool_limit=int(os.getenv("MCP_DEFAULT_TOOL_CONCURRENCY", "0")) or None,
+    max_queue=int(os.getenv("MCP_ADMISSION_QUEUE", "32")),
+    queue_timeout=float(os.getenv("MCP_ADMISSION_TIMEOUT", "5")),
+    isolated_limits={"agent": int(os.getenv("GATEWAY_AGENT_CONCURRENCY", "4"))},
 )
 
-async def call_mcp_tool(tool_name: str, arguments: Dict[str, Any]):
-    """Função auxiliar para chamar ferramentas do MCP server"""
+# Métricas: chamadas, erros e latência por ferramenta, decompostas nas fases
+# queue (fila de admissão), session_acquire, backend e serialization
+tool_metrics = ToolMetrics(REGISTRY, "gateway")
+
+def _admission_gauge(field: str):
+    return lambda: {(name,): snap[field] for name, snap in admission.snapshot().items()}
+
+def _admission_utilization():
+    return {
+        (name,): snap["inflight"] / snap["limit"] if snap["limit"] else 0.0
+        for name, snap in admission.snapshot().items()
+    }
+
+for _field in ("inflight", "limit", "queued", "rejected"):
+    REGISTRY.gauge(
+        f"gateway_admission_{_field}",
+        f"Controle de admissão: {_field} por limitador",
+        ("limiter",),
+        _admission_gauge(_field),
+    )
+REGISTRY.gauge(
+    "gateway_admission_utilization",
+    "Fração das vagas de backend em uso (inflight / limit)",
+    ("limiter",),
+    _admission_utilization,
+)
+
+# Prazo padrão de cada chamada; o cliente pode pedir menos com o cabeçalho
+# X-Request-Timeout (segundos). O prazo segue no _meta até o math_server.py
+REQUEST_TIMEOUT = float(os.getenv("GATEWAY_REQUEST_TIMEOUT", "30"))
+
+# Rastreamento: o contexto chega pelo cabeçalho traceparent e segue para o
+# math_server.py no _meta de cada chamada MCP
+tracer = get_tracer("mcp-gateway")
+
+class TraceRequests:
+    """Abre um span de servidor por requisição HTTP
+
+    Middleware ASGI puro: o `@app.middleware("http")` (BaseHTTPMiddleware)
+    esconde do endpoint o aviso de desconexão do cliente, e sem ele
+    `request.is_disconnected()` nunca fica verdadeiro.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        request = Request(scope)
+        attributes = {
+            "category": "http.server",
+            "http.method": request.method,
+            "http.route": request.url.path,
+        }
+        with tracer.span(
+            f"HTTP {request.method} {request.url.path}",
+            kind="server",
+            attributes=attributes,
+            parent=extract(request.headers),
+        ) as span:
+
+            async def send_with_trace(message):
+                if message["type"] == "http.response.start":
+                    status = message["status"]
+                    span.set_attribute("http.status_code", status)
+                    if status >= 500:
+                        span.status = "error"
+                    headers = list(message.get("headers", []))
+                    headers.append((b"traceparent", span.context.to_traceparent().encode("latin-1")))
+                    message = {**message, "headers": headers}
+                await send(message)
+
+            await self.app(scope, receive, send_with_trace)
+
+app.add_middleware(TraceRequests)
+
+@contextmanager
+def _phase(call, name: str):
+    """Mede uma fase da chamada em métricas e em um span"""
+    with call.phase(name), tracer.span(f"gateway.{name}", attributes={"category": "gateway"}):
+        yield
+
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, exc: Overloaded):
+    """Responde rápido com 503 quando o gateway está sobrecarregado"""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": f"Servidor sobrecarregado: {exc.reason}"},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+def _require_ready():
+    """Antes do fim do aquecimento (ou durante o desligamento) responde 503"""
+    if not READINESS.ready:
+        raise Overloaded(f"servidor não está pronto ({READINESS.state})", retry_after=1)
+
+async def call_mcp_tool(tool_name: str, arguments: Dict[str, Any], request: Optional[Request] = None):
+    """Função auxiliar para chamar ferramentas do MCP server
+
+    A chamada (inclusive a espera na fila de admissão) é cancelada quando o
+    prazo acaba ou o cliente desconecta, liberando a vaga e a sessão.
+    """
+    deadline = Deadline.from_headers(request.headers if request is not None else {}, REQUEST_TIMEOUT)
+    disconnected = request.is_disconnected if request is not None else None
     try:
-        async with stdio_client(server_params) as (read, write):
-            async with ClientSession(read, write) as session:
-                await session.initialize()
-                
-                # Lista as ferramentas disponíveis
-                tools = await session.list_tools()
-                
-                # Verifica se a ferramenta existe
-                tool_exists = any(tool.name == tool_name for tool in tools.tools)
-                if not tool_exists:
-                    raise HTTPException(status_code=404, detail=f"Tool '{tool_name}' not found")
-                
-                # Chama a ferramenta
-                result = await session.call_tool(tool_name, arguments)
-                return result.content[0].text if result.content else "No result"
-                
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        return await run_until_deadline(_call_mcp_tool(tool_name, arguments, deadline), deadline, disconnected)
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except ClientDisconnected:
+        # Ninguém vai ler a resposta: 499 (convenção do nginx) só aparece nos logs
+        raise HTTPException(status_code=499, detail="Cliente desconectou")
+
+async def _call_mcp_tool(tool_name: str, arguments: Dict[str, Any], deadline: Deadline):
+    _require_ready()
+    # O catálogo vem do pool: não é preciso listar as ferramentas a cada chamada
+    if not any(tool.name == tool_name for tool in session_pool.tools):
+        raise HTTPException(status_code=404, detail=f"Tool '{tool_name}' not found")
+    
+    with tool_metrics.track(tool_name) as call:
+        queue_span = tracer.start_span("gateway.queue", attributes={"category": "gateway"})
+        try:
+            # A fila não espera além do prazo da requisição (deadline.at é None sem prazo)
+            async with admission.admit(tool_name, deadline.at):
+                queue_span.end()
+                call.record("queue", queue_span.duration)
+                try:
+                    async with AsyncExitStack() as stack:
+                        with _phase(call, "session_acquire"):
+                            session = await stack.enter_async_context(session_pool.acquire())
+                        
+                        with _phase(call, "backend"):
+                            # Chama a ferramenta (o trace segue no _meta); resultados
+                            # grandes podem voltar em binário (infra/payloads.py)
+                            result = await call_tool(
+                                session,
+                                tool_name,
+                                arguments,
+                                meta={ACCEPT_META: True},
+                                tracer=tracer,
+                                deadline=deadline,
+                            )
+                        
+                        with _phase(call, "serialization"):
+                            payload = result_payload(result)
+                            if payload is not None:
+                                return payload
+                            return result.content[0].text if result.content else "No result"
+                            
+                except Exception as e:
+                    if deadline.expired:
+                        raise DeadlineExceeded(f"Prazo esgotado em {tool_name}") from e
+                    raise HTTPException(status_code=500, detail=str(e))
+        except Overloaded as exc:
+            queue_span.record_exception(exc)
+            if deadline.expired:
+                # O prazo da requisição acabou na fila: é timeout (504), não sobrecarga
+                raise DeadlineExceeded(f"Prazo esgotado na fila de {tool_name}") from exc
+            raise
+        finally:
+            queue_span.end()
+
+def _math_response(request: Request, operation: str, values: MathOperation, result):
+    """Resposta JSON, ou os bytes do resultado binário se o cliente aceitar o formato
+
+    Com `Accept: application/x-mcp-int` (ou `application/octet-stream`) o
+    memoryview recebido do servidor MCP vai direto para o corpo da resposta.
+    """
+    if isinstance(result, Payload):
+        accept = request.headers.get("accept", "")
+        if result.mime in accept or "application/octet-stream" in accept:
+            return Response(content=result.data, media_type=result.mime)
+        value = result.value()
+        try:
+            str(value)
+        except ValueError:
+            # Inteiro grande demais para virar número JSON: vai como texto
+            value = result.text()
+    else:
+        value = int(result)
+    return {"operation": operation, "a": values.a, "b": values.b, "result": value}
 
 @app.get("/")
 async def root():
@@ -53,52 +290,61 @@ async def root():
         "endpoints": {
             "/add": "POST - Soma dois números",
             "/subtract": "POST - Subtrai dois números",
-            "/tools": "GET - Lista todas as ferramentas disponíveis"
+            "/calculate/stream": "POST - Pergunta em linguagem natural, resposta em streaming (SSE)",
+            "/tools": "GET - Lista todas as ferramentas disponíveis",
+            "/healthz": "GET - Processo vivo (liveness)",
+            "/readyz": "GET - Pronto para receber tráfego (readiness)",
+            "/admission": "GET - Estado do controle de admissão",
+            "/metrics": "GET - Métricas no formato Prometheus"
         }
     }
 
 @app.get("/tools")
 async def list_tools():
-    """Lista todas as ferramentas disponíveis no MCP server"""
-    try:
-        async with stdio_client(server_params) as (read, write):
-            async with ClientSession(read, write) as session:
-                await session.initialize()
-                tools = await session.list_tools()
-                return {
-                    "tools": [
-                        {
-                            "name": tool.name,
-                            "description": tool.description,
-                            "inputSchema": tool.inputSchema
-                        }
-                        for tool in tools.tools
-                    ]
-                }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    """Lista todas as ferramentas disponíveis no MCP server (catálogo do pool)"""
+    _require_ready()
+    return {
+        "tools": [
+            {
+                "name": tool.name,
+                "description": tool.description,
+                "inputSchema": tool.inputSchema
+            }
+            for tool in session_pool.tools
+        ]
+    }
+
+@app.get("/healthz")
+async def healthz():
+    """Liveness: o processo está de pé e o event loop responde"""
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness: 200 só depois do aquecimento (pool, catálogo e chamadas sintéticas)"""
+    return JSONResponse(READINESS.snapshot(), status_code=200 if READINESS.ready else 503)
+
+@app.get("/metrics")
+async def metrics():
+    """Métricas no formato de exposição do Prometheus (somadas entre os workers)"""
+    return Response(render_metrics(), media_type=CONTENT_TYPE)
+
+@app.get("/admission")
+async def admission_status():
+    """Estado atual do controle de admissão (limites, fila e rejeições)"""
+    return admission.snapshot()
 
 @app.post("/add")
-async def add_numbers(operation: MathOperation):
+async def add_numbers(operation: MathOperation, request: Request):
     """Endpoint para somar dois números"""
-    result = await call_mcp_tool("add", {"a": operation.a, "b": operation.b})
-    return {
-        "operation": "addition",
-        "a": operation.a,
-        "b": operation.b,
-        "result": int(result)
-    }
+    result = await call_mcp_tool("add", {"a": operation.a, "b": operation.b}, request)
+    return _math_response(request, "addition", operation, result)
 
 @app.post("/subtract")
-async def subtract_numbers(operation: MathOperation):
+async def subtract_numbers(operation: MathOperation, request: Request):
     """Endpoint para subtrair dois números"""
-    result = await call_mcp_tool("subtract", {"a": operation.a, "b": operation.b})
-    return {
-        "operation": "subtraction",
-        "a": operation.a,
-        "b": operation.b,
-        "result": int(result)
-    }
+    result = await call_mcp_tool("subtract", {"a": operation.a, "b": operation.b}, request)
+    return _math_response(request, "subtraction", operation, result)
 
 @app.post("/calculate")
 async def generic_calculation(query: GenericQuery):
@@ -112,7 +358,63 @@ async def generic_calculation(query: GenericQuery):
         "note": "Atualmente, apenas operações aritméticas são suportadas"
     }
 
+@lru_cache(maxsize=1)
+def agent_runtime() -> AgentRuntime:
+    """Agente compartilhado por todas as perguntas, criado só na primeira
+
+    A sessão com o math_server.py, as ferramentas e o grafo compilado vivem
+    enquanto o gateway estiver no ar (LLM_BACKEND=azure|scripted|replay).
+    """
+    connection = {
+        "transport": "stdio",
+        "command": server_params.command,
+        "args": server_params.args,
+        "env": server_params.env,
+    }
+    return AgentRuntime({"math": connection}, create_chat_model())
+
+@app.post("/calculate/stream")
+async def calculate_stream(query: GenericQuery):
+    """Responde a pergunta com um agente LLM sobre as ferramentas MCP, via SSE
+
+    Eventos: token, tool_start, tool_end, final e error. O primeiro token
+    chega assim que o modelo começa a responder, sem esperar o fim do agente.
+    """
+    _require_ready()
+
+    async def events():
+        # A vaga é reservada e liberada dentro do stream: se o corpo nunca
+        # começar (cliente desconectou antes) ou for fechado no meio, nada fica preso
+        try:
+            async with admission.admit("agent"):
+                agent = await agent_runtime().get_agent()
+                async for event in agent_events(agent, {"messages": [query.query]}):
+                    yield sse(event)
+        except Overloaded as e:
+            yield sse({"type": "error", "detail": f"Servidor sobrecarregado: {e.reason}", "retry_after": e.retry_after})
+        except Exception as e:
+            yield sse({"type": "error", "detail": str(e)})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 if __name__ == "__main__":
     print("Iniciando servidor HTTP na porta 8000...")
     print("Documentação da API disponível em: http://localhost:8000/docs")
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    workers = int(os.getenv("GATEWAY_WORKERS", "1"))
+    if workers > 1:
+        # Um processo por núcleo, cada um com o seu pool de sessões e caches
+        sys.exit(serve(
+            "http_server:app",
+            host="0.0.0.0",
+            port=8000,
+            workers=workers,
+            reuse_port=os.getenv("GATEWAY_REUSE_PORT") == "1",
+            graceful_timeout=float(os.getenv("GATEWAY_GRACEFUL_TIMEOUT", "30")),
+            app_dir=os.path.dirname(os.path.abspath(__file__)),
+        ))
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file